@@ -0,0 +1,111 @@
+"""Per-user auth epochs that decide whether a token's claims can be trusted.
+
+Access tokens issued with claims carry the user's role, approval and
+active flags plus the user's epoch at login, so ``get_current_user`` can
+build the principal without touching Mongo. Whenever something those
+claims describe changes (an approval, a role change, a deactivation) the
+user's epoch is bumped in ``auth_epochs``; tokens from an older epoch no
+longer pass the fast path and go through the user lookup instead.
+
+Epochs only decide which path authenticates a token; they never reject or
+revoke one. A token with stale claims is still accepted if the stored user
+passes the lookup, exactly as a token without claims would be.
+
+Every worker keeps the whole table in memory (only users that were ever
+bumped have a row). Bumps reach other workers through the event bus right
+away and through a full reload every ``refresh_interval`` seconds, in case
+a pub/sub message was missed. Until the first load succeeds nothing is
+trusted from claims.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+
+logger = logging.getLogger(__name__)
+
+
+class AuthEpochs:
+    def __init__(self, db, refresh_interval: float = 30.0):
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self._epochs: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.ready = False
+        self.bumps = 0
+        self.reloads = 0
+        self.reload_failures = 0
+        self.fast_path = 0
+        self.stale_claims = 0
+
+    def current(self, user_id: str) -> int:
+        return self._epochs.get(user_id, 0)
+
+    def trusts(self, user_id: str, epoch: Any) -> bool:
+        """Whether claims issued at ``epoch`` still describe the user"""
+        if self.ready and epoch == self.current(user_id):
+            self.fast_path += 1
+            return True
+        self.stale_claims += 1
+        return False
+
+    def apply(self, user_id: str, epoch: int):
+        """Record a bump made by another worker; epochs never move backwards"""
+        if epoch > self._epochs.get(user_id, 0):
+            self._epochs[user_id] = epoch
+
+    async def bump(self, user_id: str) -> int:
+        document = await self.db.auth_epochs.find_one_and_update(
+            {"user_id": user_id},
+            {"$inc": {"epoch": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self.apply(user_id, document["epoch"])
+        self.bumps += 1
+        return document["epoch"]
+
+    async def load(self) -> int:
+        documents = await self.db.auth_epochs.find({}, {"_id": 0, "user_id": 1, "epoch": 1}).to_list(None)
+        for document in documents:
+            self.apply(document["user_id"], document["epoch"])
+        self.ready = True
+        self.reloads += 1
+        return len(documents)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.load()
+            except PyMongoError:
+                self.reload_failures += 1
+                logger.exception("Auth epoch reload failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "users": len(self._epochs),
+            "bumps": self.bumps,
+            "reloads": self.reloads,
+            "reload_failures": self.reload_failures,
+            "fast_path": self.fast_path,
+            "stale_claims": self.stale_claims,
+        }
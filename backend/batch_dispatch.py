@@ -0,0 +1,318 @@
+"""Periodic batch matching of unassigned tow requests to available drivers.
+
+Greedy dispatch hands every request its closest driver the moment it
+arrives, so at peak an early request can take the only driver near a later
+one. Every ``interval`` seconds the batch dispatcher instead collects the
+unassigned requests and the drivers around them, solves a min-cost
+assignment over pickup (deadhead) miles with the Hungarian algorithm, and
+writes all offers with one bulk_write. Each round also prices the greedy
+assignment on the same matrix. The two can match different requests, so
+the reported saving only counts requests both assignments matched, and
+miles per assigned request are reported next to the counts.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import ASCENDING, UpdateOne
+
+from geo import KM_PER_MILE, DistanceUnit, haversine_many
+
+
+logger = logging.getLogger(__name__)
+
+UNREACHABLE = 1e9  # Cost of a pair that must not be matched; finite so the potentials stay numeric
+
+
+def hungarian(cost: Sequence[Sequence[float]]) -> List[Tuple[int, int]]:
+    """Minimum-cost assignment of (row, column) pairs, one per row or column, whichever is fewer"""
+    rows = len(cost)
+    if rows == 0 or len(cost[0]) == 0:
+        return []
+
+    transposed = rows > len(cost[0])
+    if transposed:
+        cost = [list(column) for column in zip(*cost)]
+    n, m = len(cost), len(cost[0])
+
+    # Shortest augmenting paths with row/column potentials, O(n^2 m)
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    owner = [0] * (m + 1)  # owner[j]: 1-based row matched to column j
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        owner[0] = i
+        j0 = 0
+        minv = [float("inf")] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = owner[j0]
+            row = cost[i0 - 1]
+            ui0 = u[i0]
+            delta = float("inf")
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    reduced = row[j - 1] - ui0 - v[j]
+                    if reduced < minv[j]:
+                        minv[j] = reduced
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[owner[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+
+    pairs = [(owner[j] - 1, j - 1) for j in range(1, m + 1) if owner[j]]
+    if transposed:
+        pairs = [(column, row) for row, column in pairs]
+    return sorted(pairs)
+
+
+def greedy_assignment(cost: Sequence[Sequence[float]]) -> List[Tuple[int, int]]:
+    """Rows in order each take their cheapest free column, as one-at-a-time dispatch does"""
+    taken = set()
+    pairs = []
+    for i, row in enumerate(cost):
+        best = None
+        for j, value in enumerate(row):
+            if j not in taken and value < UNREACHABLE and (best is None or value < row[best]):
+                best = j
+        if best is not None:
+            taken.add(best)
+            pairs.append((i, best))
+    return pairs
+
+
+def feasible(cost: Sequence[Sequence[float]], pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    return [(i, j) for i, j in pairs if cost[i][j] < UNREACHABLE]
+
+
+def total_cost(cost: Sequence[Sequence[float]], pairs: List[Tuple[int, int]]) -> float:
+    return sum(cost[i][j] for i, j in pairs)
+
+
+def compare_assignments(cost: Sequence[Sequence[float]], batch: List[Tuple[int, int]],
+                        greedy: List[Tuple[int, int]]) -> Tuple[int, float, float]:
+    """(requests both assignments matched, batch miles, greedy miles) over just those requests"""
+    batch_rows = dict(batch)
+    greedy_rows = dict(greedy)
+    common = batch_rows.keys() & greedy_rows.keys()
+    return (
+        len(common),
+        sum(cost[i][batch_rows[i]] for i in common),
+        sum(cost[i][greedy_rows[i]] for i in common),
+    )
+
+
+def cost_matrix(pickups: Sequence[Tuple[float, float]], drivers: Sequence[Tuple[float, float]],
+                max_miles: float, blocked: Optional[Sequence[set]] = None) -> List[List[float]]:
+    """Pickup miles from every driver to every request; too far or blocked pairs cost UNREACHABLE"""
+    if not drivers:
+        return [[] for _ in pickups]
+    driver_lats = [lat for lat, _ in drivers]
+    driver_lngs = [lng for _, lng in drivers]
+    matrix = []
+    for i, (lat, lng) in enumerate(pickups):
+        miles = haversine_many(lat, lng, driver_lats, driver_lngs, DistanceUnit.MILES)
+        row = [float(value) if value <= max_miles else UNREACHABLE for value in miles]
+        if blocked:
+            for j in blocked[i]:
+                row[j] = UNREACHABLE
+        matrix.append(row)
+    return matrix
+
+
+class BatchDispatcher:
+    def __init__(self, db, search, dispatch, quote: Callable[[Dict[str, Any], str], Awaitable[Dict[str, Any]]],
+                 on_assigned: Callable[[Dict[str, Any], Dict[str, Any], Dict[str, Any]], Awaitable[Any]],
+                 interval: float = 10.0, max_requests: int = 50, max_radius_km: float = 80,
+                 offer_minutes: int = 5):
+        self.db = db
+        self.search = search  # A driver_search engine (DRIVER_SEARCH_ENGINE)
+        self.dispatch = dispatch  # DispatchEngine, for company policies and controls
+        self.quote = quote
+        self.on_assigned = on_assigned
+        self.interval = interval
+        self.max_requests = max_requests
+        self.max_radius_km = max_radius_km
+        self.offer_minutes = offer_minutes
+        self._task: Optional[asyncio.Task] = None
+        self.rounds = 0
+        self.failures = 0
+        self.assigned = 0
+        self.lost_races = 0
+        self.planned = 0
+        self.greedy_assigned = 0
+        self.deadhead_miles = 0.0
+        self.planned_deadhead_miles = 0.0
+        self.greedy_deadhead_miles = 0.0
+        self.compared = 0
+        self.compared_miles = 0.0
+        self.greedy_compared_miles = 0.0
+        self.last_round_ms = 0.0
+
+    @staticmethod
+    def unassigned_query() -> Dict[str, Any]:
+        return {
+            "status": "pending",
+            "current_driver_id": None,
+            "negotiation_status": {"$in": ["awaiting_dispatch", "no_drivers_available"]},
+        }
+
+    async def collect(self):
+        requests = await self.db.tow_requests.find(
+            self.unassigned_query(),
+            {"_id": 0, "id": 1, "pickup_lat": 1, "pickup_lng": 1, "dropoff_lat": 1, "dropoff_lng": 1,
+             "candidate_driver_ids": 1, "candidate_cursor": 1, "created_at": 1}
+        ).sort("created_at", ASCENDING).limit(self.max_requests).to_list(self.max_requests)
+
+        drivers = {}
+        for request in requests:
+            for candidate in await self.search.within(request["pickup_lat"], request["pickup_lng"], self.max_radius_km):
+                user_id = candidate["driver"]["id"]
+                if user_id not in drivers and self.dispatch.auto_dispatchable(candidate["profile"]):
+                    drivers[user_id] = candidate
+        return requests, list(drivers.values())
+
+    async def run_once(self) -> int:
+        started = time.perf_counter()
+        requests, drivers = await self.collect()
+        if not requests or not drivers:
+            return 0
+
+        # Drivers already offered a request (before its cursor) are not offered it again
+        columns = {candidate["driver"]["id"]: j for j, candidate in enumerate(drivers)}
+        blocked = []
+        for request in requests:
+            candidate_ids = request.get("candidate_driver_ids") or []
+            offered = candidate_ids[:request.get("candidate_cursor", len(candidate_ids))]
+            blocked.append({columns[user_id] for user_id in offered if user_id in columns})
+
+        cost = cost_matrix(
+            [(request["pickup_lat"], request["pickup_lng"]) for request in requests],
+            [(candidate["profile"]["current_location_lat"], candidate["profile"]["current_location_lng"])
+             for candidate in drivers],
+            self.max_radius_km / KM_PER_MILE,
+            blocked
+        )
+        pairs = feasible(cost, hungarian(cost))
+        greedy = greedy_assignment(cost)
+        if not pairs:
+            return 0
+
+        now = datetime.now(timezone.utc)
+        offer_expires_at = now + timedelta(minutes=self.offer_minutes)
+        operations = []
+        offers = []
+        for i, j in pairs:
+            request, driver_id = requests[i], drivers[j]["driver"]["id"]
+            price = await self.quote(request, driver_id)
+            candidate_ids = request.get("candidate_driver_ids") or []
+            cursor = request.get("candidate_cursor", len(candidate_ids))
+            # Keep "everything before the cursor was offered" true for move_to_next_driver
+            candidate_ids = candidate_ids[:cursor] + [driver_id] + [
+                user_id for user_id in candidate_ids[cursor:] if user_id != driver_id
+            ]
+            operations.append(UpdateOne(
+                {"id": request["id"], **self.unassigned_query()},
+                {"$set": {
+                    "current_driver_id": driver_id,
+                    "candidate_driver_ids": candidate_ids,
+                    "candidate_cursor": cursor + 1,
+                    "calculated_price": price["total_price"],
+                    "distance_miles": price["distance_miles"],
+                    "estimated_duration_hours": price.get("duration_hours"),
+                    "negotiation_status": "awaiting_driver",
+                    "offer_expires_at": offer_expires_at,
+                    "updated_at": now,
+                }}
+            ))
+            offers.append((request, drivers[j], price, cost[i][j]))
+
+        result = await self.db.tow_requests.bulk_write(operations, ordered=False)
+        if result.modified_count == len(operations):
+            won = offers
+        else:
+            # Some requests were accepted or cancelled since collect(); only notify real winners
+            current = await self.db.tow_requests.find(
+                {"id": {"$in": [request["id"] for request, *_ in offers]}},
+                {"_id": 0, "id": 1, "current_driver_id": 1}
+            ).to_list(None)
+            holders = {doc["id"]: doc.get("current_driver_id") for doc in current}
+            won = [offer for offer in offers if holders.get(offer[0]["id"]) == offer[1]["driver"]["id"]]
+            self.lost_races += len(offers) - len(won)
+
+        for request, candidate, price, miles in won:
+            candidate = {**candidate, "distance_km": round(miles * KM_PER_MILE, 2)}
+            await self.on_assigned({**request, "offer_expires_at": offer_expires_at}, candidate, price)
+
+        self.rounds += 1
+        self.assigned += len(won)
+        self.deadhead_miles += sum(miles for *_, miles in won)
+        # The comparison is between the two plans for this round; lost races are not the matching's fault
+        compared, compared_miles, greedy_compared_miles = compare_assignments(cost, pairs, greedy)
+        self.planned += len(pairs)
+        self.planned_deadhead_miles += total_cost(cost, pairs)
+        self.greedy_assigned += len(greedy)
+        self.greedy_deadhead_miles += total_cost(cost, greedy)
+        self.compared += compared
+        self.compared_miles += compared_miles
+        self.greedy_compared_miles += greedy_compared_miles
+        self.last_round_ms = (time.perf_counter() - started) * 1000
+        return len(won)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception:
+                self.failures += 1
+                logger.exception("Batch dispatch round failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval,
+            "rounds": self.rounds,
+            "failures": self.failures,
+            "assigned": self.assigned,
+            "lost_races": self.lost_races,
+            "deadhead_miles": round(self.deadhead_miles, 2),
+            "planned": self.planned,
+            "miles_per_planned": round(self.planned_deadhead_miles / self.planned, 2) if self.planned else None,
+            "greedy_assigned": self.greedy_assigned,
+            "greedy_miles_per_assigned": (
+                round(self.greedy_deadhead_miles / self.greedy_assigned, 2) if self.greedy_assigned else None
+            ),
+            "compared_requests": self.compared,
+            "deadhead_miles_saved": round(self.greedy_compared_miles - self.compared_miles, 2),
+            "last_round_ms": round(self.last_round_ms, 2),
+        }
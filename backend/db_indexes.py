@@ -0,0 +1,230 @@
+"""Index provisioning and query-plan checks for the collections server.py uses.
+
+``ensure_indexes`` runs on API startup and is idempotent. Running this
+module directly creates the indexes and then explains every query shape the
+API issues, exiting non-zero if any of them would scan a whole collection:
+
+    cd backend && python db_indexes.py
+"""
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, IndexModel
+from pymongo.errors import OperationFailure
+
+from pagination import KEYSET_SORT
+
+
+logger = logging.getLogger(__name__)
+
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("role", ASCENDING), ("is_approved", ASCENDING), ("is_active", ASCENDING)], name="role_approval"),
+    ],
+    "driver_profiles": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+        IndexModel([("location", GEOSPHERE)], name="location_2dsphere"),
+    ],
+    "tow_requests": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_id"),
+        IndexModel(
+            [("client_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="client_created_id"
+        ),
+        IndexModel(
+            [("current_driver_id", ASCENDING), ("status", ASCENDING), ("negotiation_status", ASCENDING)],
+            name="current_driver_status"
+        ),
+        IndexModel([("assigned_driver_id", ASCENDING), ("status", ASCENDING)], name="assigned_driver_status"),
+        IndexModel(
+            [("status", ASCENDING), ("negotiation_status", ASCENDING), ("offer_expires_at", ASCENDING)],
+            name="status_offer_expiry"
+        ),
+    ],
+    "price_offers": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("tow_request_id", ASCENDING), ("created_at", DESCENDING)], name="request_created"),
+    ],
+    "tow_company_profiles": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "driver_pricing": [
+        IndexModel([("driver_user_id", ASCENDING)], name="driver_user_id_unique", unique=True),
+    ],
+    "pricing_config": [
+        IndexModel([("created_at", DESCENDING)], name="created_desc"),
+    ],
+    "auth_epochs": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "location_history": [
+        IndexModel([("driver_user_id", ASCENDING), ("bucket_start", ASCENDING)], name="driver_bucket_unique", unique=True),
+        IndexModel([("bucket_end", ASCENDING)], name="bucket_end"),
+    ],
+}
+
+
+class QueryShape(NamedTuple):
+    name: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[List[Any]] = None
+    allow_collscan: bool = False  # Deliberate full listings
+
+
+_SAMPLE_ID = "00000000-0000-0000-0000-000000000000"
+_NOW = datetime.now(timezone.utc)
+
+# One entry per distinct filter/sort server.py sends; values are placeholders
+QUERY_SHAPES: List[QueryShape] = [
+    QueryShape("user by id", "users", {"id": _SAMPLE_ID}),
+    QueryShape("user by email", "users", {"email": "someone@example.com"}),
+    QueryShape("all drivers", "users", {"role": "driver"}, allow_collscan=True),
+    QueryShape("pending approvals", "users", {"is_approved": False, "role": {"$in": ["tow_company", "driver"]}}),
+    QueryShape("driver profile", "driver_profiles", {"user_id": _SAMPLE_ID}),
+    QueryShape("all driver profiles", "driver_profiles", {}, allow_collscan=True),
+    QueryShape("tow request by id", "tow_requests", {"id": _SAMPLE_ID}),
+    QueryShape("client requests page", "tow_requests", {"client_id": _SAMPLE_ID}, KEYSET_SORT),
+    QueryShape("driver visible requests", "tow_requests", {
+        "$or": [{"assigned_driver_id": _SAMPLE_ID}, {"status": "pending"}]
+    }, KEYSET_SORT),
+    QueryShape("driver open offers", "tow_requests", {
+        "current_driver_id": _SAMPLE_ID,
+        "status": "pending",
+        "negotiation_status": {"$in": ["awaiting_driver", "negotiating"]},
+    }),
+    QueryShape("driver missions", "tow_requests", {
+        "assigned_driver_id": _SAMPLE_ID,
+        "status": {"$in": ["accepted", "on_mission"]},
+    }),
+    QueryShape("open offer windows", "tow_requests", {
+        "status": "pending",
+        "negotiation_status": {"$in": ["awaiting_driver", "negotiating"]},
+        "offer_expires_at": {"$ne": None},
+    }),
+    QueryShape("expired offer claim", "tow_requests", {
+        "id": _SAMPLE_ID,
+        "status": "pending",
+        "negotiation_status": {"$in": ["awaiting_driver", "negotiating"]},
+        "offer_expires_at": {"$lte": _NOW},
+    }),
+    QueryShape("unassigned for batch dispatch", "tow_requests", {
+        "status": "pending",
+        "current_driver_id": None,
+        "negotiation_status": {"$in": ["awaiting_dispatch", "no_drivers_available"]},
+    }, [("created_at", ASCENDING)]),
+    QueryShape("all requests page", "tow_requests", {}, KEYSET_SORT),
+    QueryShape("all requests after cursor", "tow_requests", {"$or": [
+        {"created_at": {"$lt": _NOW}},
+        {"created_at": _NOW, "id": {"$lt": _SAMPLE_ID}},
+    ]}, KEYSET_SORT),
+    QueryShape("offer by id", "price_offers", {"id": _SAMPLE_ID}),
+    QueryShape("latest offer", "price_offers", {"tow_request_id": _SAMPLE_ID}, [("created_at", DESCENDING)]),
+    QueryShape("pending offers", "price_offers", {"tow_request_id": _SAMPLE_ID, "status": "pending"}),
+    QueryShape("company dispatch policies", "tow_company_profiles", {}, allow_collscan=True),
+    QueryShape("driver pricing", "driver_pricing", {"driver_user_id": _SAMPLE_ID}),
+    QueryShape("latest pricing config", "pricing_config", {}, [("created_at", DESCENDING)]),
+    QueryShape("auth epoch by user", "auth_epochs", {"user_id": _SAMPLE_ID}),
+    QueryShape("all auth epochs", "auth_epochs", {}, allow_collscan=True),
+    QueryShape("driver location buckets", "location_history", {
+        "driver_user_id": _SAMPLE_ID,
+        "bucket_start": {"$lte": _NOW},
+        "bucket_end": {"$gt": _NOW},
+    }, [("bucket_start", ASCENDING)]),
+    QueryShape("location buckets to compact", "location_history", {
+        "bucket_end": {"$lt": _NOW},
+        "$or": [
+            {"resolution_seconds": {"$exists": False}},
+            {"bucket_end": {"$lt": _NOW}, "resolution_seconds": {"$lt": 30}},
+        ],
+    }),
+]
+
+
+async def ensure_indexes(db) -> List[str]:
+    """Create every declared index; failures (e.g. duplicate data) are logged, not fatal"""
+    failed = []
+    for collection, models in INDEXES.items():
+        for model in models:
+            name = model.document["name"]
+            try:
+                await db[collection].create_indexes([model])
+            except OperationFailure as exc:
+                failed.append(f"{collection}.{name}")
+                logger.error(f"Could not create index {collection}.{name}: {exc}")
+    return failed
+
+
+def _stages(plan: Any) -> Iterator[str]:
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+
+def explain_query_shapes(db) -> List[Dict[str, Any]]:
+    """Winning-plan stages for each shape, using a synchronous pymongo database"""
+    report = []
+    for shape in QUERY_SHAPES:
+        cursor = db[shape.collection].find(shape.filter)
+        if shape.sort:
+            cursor = cursor.sort(shape.sort)
+        plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        stages = list(_stages(plan))
+        report.append({
+            "shape": shape.name,
+            "collection": shape.collection,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+            "allowed": shape.allow_collscan,
+        })
+    return report
+
+
+def main() -> int:
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv(Path(__file__).parent / ".env")
+    db = MongoClient(os.environ["MONGO_URL"])[os.environ["DB_NAME"]]
+
+    failed = []
+    for collection, models in INDEXES.items():
+        for model in models:
+            try:
+                db[collection].create_indexes([model])
+            except OperationFailure as exc:
+                failed.append(f"{collection}.{model.document['name']}: {exc}")
+
+    offenders = []
+    for row in explain_query_shapes(db):
+        marker = "OK  "
+        if row["collscan"]:
+            marker = "SCAN" if row["allowed"] else "FAIL"
+            if not row["allowed"]:
+                offenders.append(row["shape"])
+        print(f"{marker} {row['collection']:<16} {row['shape']:<26} {' > '.join(row['stages'])}")
+
+    for message in failed:
+        print(f"INDEX ERROR {message}")
+    if offenders or failed:
+        print(f"\n{len(offenders)} query shape(s) scan a whole collection, {len(failed)} index(es) failed")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
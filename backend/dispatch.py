@@ -0,0 +1,271 @@
+"""Automatic driver selection honoring tow company dispatch policies.
+
+Independent drivers compete on distance. A driver that belongs to a tow
+company is offered work according to its company's auto_assign_policy:
+
+``manual``   never auto-dispatched, the company assigns its own drivers
+``nearest``  competes on distance like an independent driver
+``rotation`` when the company's closest driver is the best candidate, the
+             company's in-range driver that has waited longest gets the job
+
+Driver controls set by the company (can_receive_calls, force_assigned_only,
+is_active_by_company) are checked on every candidate. Policies and rotation
+turns live in memory; policies are reloaded from tow_company_profiles every
+``refresh_interval`` seconds. ``candidates`` ranks once per tow request; the
+request then walks that list as drivers reject or let offers expire.
+
+A decision costs time in the drivers inside the search radius, not in the
+fleet: the radius starts at ``first_radius_km`` and only doubles while too
+few drivers qualify, and ranking stops at ``limit``. Rotation turns are
+heap operations, O(log m) in a company's m drivers.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pymongo.errors import PyMongoError
+
+
+logger = logging.getLogger(__name__)
+
+
+class DispatchPolicy:
+    MANUAL = "manual"
+    NEAREST = "nearest"
+    ROTATION = "rotation"
+
+
+Candidate = Dict[str, Any]  # {"driver", "profile", "distance_km"} as returned by driver_search
+
+
+def accepts_direct_calls(profile: Dict[str, Any]) -> bool:
+    """Company controls that keep a driver out of automatic dispatch"""
+    return bool(
+        profile.get("can_receive_calls", True) and
+        profile.get("is_active_by_company", True) and
+        not profile.get("force_assigned_only", False)
+    )
+
+
+class RotationQueue:
+    """A company's drivers ordered by the turn they were last offered a job on.
+
+    Turns sit in a heap; a driver served again gets a new entry and the old
+    one is skipped (and eventually compacted away) instead of being removed.
+    """
+
+    def __init__(self):
+        self._turns: Dict[str, int] = {}
+        self._heap: List[Tuple[int, str]] = []
+
+    def __len__(self):
+        return len(self._turns)
+
+    def order(self, user_ids: Iterable[str]) -> Iterator[str]:
+        """The given drivers in rotation order, produced lazily without popping the heap"""
+        wanted = set(user_ids)
+        # Drivers never offered a job yet go first
+        yield from sorted(user_id for user_id in wanted if user_id not in self._turns)
+
+        frontier = [(self._heap[0], 0)] if self._heap else []
+        while frontier:
+            (turn, user_id), i = heapq.heappop(frontier)
+            if user_id in wanted and self._turns[user_id] == turn:
+                yield user_id
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(self._heap):
+                    heapq.heappush(frontier, (self._heap[child], child))
+
+    def served(self, user_id: str, turn: int):
+        self._turns[user_id] = turn
+        heapq.heappush(self._heap, (turn, user_id))
+        if len(self._heap) > 2 * len(self._turns) + 16:
+            self._heap = [(turn, user_id) for user_id, turn in self._turns.items()]
+            heapq.heapify(self._heap)
+
+
+class ManualPolicy:
+    name = DispatchPolicy.MANUAL
+
+    def pick(self, engine: "DispatchEngine", company_id: str, candidate: Candidate,
+             ranked: List[Candidate], state: Dict[str, Any]) -> Optional[Candidate]:
+        return None
+
+
+class NearestPolicy:
+    name = DispatchPolicy.NEAREST
+
+    def pick(self, engine: "DispatchEngine", company_id: str, candidate: Candidate,
+             ranked: List[Candidate], state: Dict[str, Any]) -> Optional[Candidate]:
+        return candidate
+
+
+class RotationPolicy:
+    """Each of the company's slots in distance order goes to its next driver in rotation"""
+
+    name = DispatchPolicy.ROTATION
+
+    def pick(self, engine: "DispatchEngine", company_id: str, candidate: Candidate,
+             ranked: List[Candidate], state: Dict[str, Any]) -> Optional[Candidate]:
+        if not state:
+            # One pass groups every company's in-range drivers for this decision
+            state["in_range"] = {}
+            state["queues"] = {}
+            for item in ranked:
+                item_company = item["profile"].get("tow_company_id")
+                if item_company and engine.is_candidate(item):
+                    state["in_range"].setdefault(item_company, {})[item["driver"]["id"]] = item
+
+        queues = state["queues"]
+        if company_id not in queues:
+            members = state["in_range"].get(company_id, {})
+            queues[company_id] = (members[user_id] for user_id in engine.rotation_queue(company_id).order(members))
+        return next(queues[company_id], None)
+
+
+class DispatchEngine:
+    """Chooses the driver a new offer goes to, given candidates ranked by distance"""
+
+    def __init__(self, search, policies=(ManualPolicy, NearestPolicy, RotationPolicy),
+                 first_radius_km: float = 10, refresh_interval: float = 60.0):
+        self.search = search  # A driver_search engine
+        self.first_radius_km = first_radius_km
+        self.refresh_interval = refresh_interval
+        self.policies = {policy.name: policy() for policy in policies}
+        self._company_policies: Dict[str, str] = {}
+        self._rotations: Dict[str, RotationQueue] = {}
+        self._turns = itertools.count(1)
+        self.decisions = 0
+        self.unassigned = 0
+        self.by_policy: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.reloads = 0
+        self.reload_failures = 0
+
+    # Company policies
+    def set_company_policy(self, company: Dict[str, Any]):
+        """Register a tow company profile; drivers may reference it by profile id or user id"""
+        policy = company.get("auto_assign_policy") or DispatchPolicy.MANUAL
+        if policy not in self.policies:
+            policy = DispatchPolicy.MANUAL
+        for key in (company.get("id"), company.get("user_id")):
+            if key:
+                self._company_policies[key] = policy
+                if policy != DispatchPolicy.ROTATION:
+                    self._rotations.pop(key, None)
+
+    def policy_for(self, company_id: str) -> str:
+        # Same default as TowCompanyProfile.auto_assign_policy
+        return self._company_policies.get(company_id, DispatchPolicy.MANUAL)
+
+    def rotation_queue(self, company_id: str) -> RotationQueue:
+        return self._rotations.setdefault(company_id, RotationQueue())
+
+    def next_turn(self) -> int:
+        return next(self._turns)
+
+    async def load(self, db) -> int:
+        """Apply the stored company policies; rotation turns survive unless a company leaves rotation"""
+        companies = await db.tow_company_profiles.find(
+            {}, {"_id": 0, "id": 1, "user_id": 1, "auto_assign_policy": 1}
+        ).to_list(None)
+        for company in companies:
+            self.set_company_policy(company)
+
+        known = {key for company in companies for key in (company.get("id"), company.get("user_id")) if key}
+        for key in set(self._company_policies) - known:
+            del self._company_policies[key]
+            self._rotations.pop(key, None)
+        self.reloads += 1
+        return len(companies)
+
+    async def _run(self, db):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.load(db)
+            except PyMongoError:
+                self.reload_failures += 1
+                logger.exception("Dispatch policy reload failed")
+
+    def start(self, db):
+        """Reload company policies every refresh_interval seconds, so edits made anywhere take effect"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(db))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # Decisions
+    def is_candidate(self, candidate: Candidate) -> bool:
+        return accepts_direct_calls(candidate["profile"])
+
+    def auto_dispatchable(self, profile: Dict[str, Any]) -> bool:
+        """Whether a driver may be matched automatically at all (manual companies assign their own)"""
+        company_id = profile.get("tow_company_id")
+        return accepts_direct_calls(profile) and (
+            not company_id or self.policy_for(company_id) != DispatchPolicy.MANUAL
+        )
+
+    def rank(self, ranked: List[Candidate], limit: Optional[int] = None) -> List[Candidate]:
+        """Order in which offers should go out, given candidates sorted by distance"""
+        ordered = []
+        state: Dict[str, Dict[str, Any]] = {}
+        for candidate in ranked:
+            if limit is not None and len(ordered) >= limit:
+                break
+            if not self.is_candidate(candidate):
+                continue
+
+            company_id = candidate["profile"].get("tow_company_id")
+            if not company_id:
+                ordered.append(candidate)
+                continue
+
+            policy = self.policy_for(company_id)
+            chosen = self.policies[policy].pick(self, company_id, candidate, ranked, state.setdefault(policy, {}))
+            if chosen:
+                ordered.append(chosen)
+        return ordered
+
+    async def candidates(self, lat: float, lng: float, max_radius_km: float = 80,
+                         limit: int = 20) -> List[Candidate]:
+        """Up to limit drivers in offer order, widening the search until enough qualify"""
+        self.decisions += 1
+        radius_km = min(self.first_radius_km, max_radius_km)
+        while True:
+            ordered = self.rank(await self.search.within(lat, lng, radius_km), limit)
+            if len(ordered) >= limit or radius_km >= max_radius_km:
+                break
+            radius_km = min(max_radius_km, radius_km * 2)
+
+        if not ordered:
+            self.unassigned += 1
+        return ordered
+
+    def offered(self, candidate: Candidate):
+        """Record that a driver was sent an offer, advancing its company's rotation"""
+        company_id = candidate["profile"].get("tow_company_id")
+        policy = self.policy_for(company_id) if company_id else "independent"
+        if policy == DispatchPolicy.ROTATION:
+            self.rotation_queue(company_id).served(candidate["driver"]["id"], self.next_turn())
+        self.by_policy[policy] = self.by_policy.get(policy, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "decisions": self.decisions,
+            "unassigned": self.unassigned,
+            "by_policy": dict(self.by_policy),
+            "companies": len(self._company_policies),
+            "rotation_queues": len(self._rotations),
+            "reloads": self.reloads,
+            "reload_failures": self.reload_failures,
+        }
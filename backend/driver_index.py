@@ -0,0 +1,200 @@
+"""In-memory spatial index of dispatchable drivers.
+
+Drivers are bucketed into a fixed lat/lng grid so radius and k-nearest
+queries only look at the handful of cells around the pickup point instead
+of every driver in Mongo. Cells hold DriverTable slots, and distances are
+computed over the table's coordinate arrays.
+"""
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from driver_table import DriverTable
+from geo import DistanceUnit, haversine_many
+
+
+KM_PER_DEGREE = 111.195  # Great-circle km per degree of latitude
+
+
+@dataclass
+class IndexedDriver:
+    user_id: str
+    lat: float
+    lng: float
+    driver: Dict[str, Any]  # users document
+    profile: Dict[str, Any]  # driver_profiles document
+
+
+def is_eligible(user: Optional[Dict[str, Any]], profile: Optional[Dict[str, Any]]) -> bool:
+    """Approved, active and available, whether or not a location is known yet"""
+    return bool(
+        user and profile and
+        user.get("role") == "driver" and
+        user.get("is_approved", True) and
+        user.get("is_active", True) and
+        profile.get("status") == "available"
+    )
+
+
+def is_dispatchable(user: Optional[Dict[str, Any]], profile: Optional[Dict[str, Any]]) -> bool:
+    """A driver is indexed only while eligible and located"""
+    return bool(
+        is_eligible(user, profile) and
+        profile.get("current_location_lat") is not None and
+        profile.get("current_location_lng") is not None
+    )
+
+
+class DriverIndex:
+    """Grid index over the available, approved and active rows of a DriverTable
+
+    Every driver has a table row; eligible ones also keep their documents
+    here (returned with search results) and, once located, their slot sits
+    in a grid cell. Positions live only in the table.
+    """
+
+    def __init__(self, cell_size_deg: float = 0.25, table: Optional[DriverTable] = None):
+        self.cell_size_deg = cell_size_deg
+        self.table = table if table is not None else DriverTable()
+        self._cells: Dict[Tuple[int, int], Set[int]] = {}  # cell -> table slots
+        self._located: Dict[str, Tuple[int, int]] = {}  # driver id -> its cell
+        # Eligible drivers' users/driver_profiles documents, located or waiting for their first ping
+        self._documents: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+
+    def __len__(self):
+        return len(self._located)
+
+    def __contains__(self, user_id):
+        return user_id in self._located
+
+    def _entry(self, user_id: str, slot: int) -> IndexedDriver:
+        user, profile = self._documents[user_id]
+        return IndexedDriver(user_id, float(self.table.lat[slot]), float(self.table.lng[slot]), user, profile)
+
+    def get(self, user_id: str) -> Optional[IndexedDriver]:
+        if user_id not in self._located:
+            return None
+        return self._entry(user_id, self.table.slot(user_id))
+
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self.cell_size_deg), math.floor(lng / self.cell_size_deg))
+
+    # Mutations
+    def _place(self, user_id: str, lat: float, lng: float):
+        slot = self.table.slot(user_id)
+        cell = self._cell(lat, lng)
+        old_cell = self._located.get(user_id)
+        if old_cell != cell:
+            if old_cell is not None:
+                self._discard_from_cell(old_cell, slot)
+            self._cells.setdefault(cell, set()).add(slot)
+            self._located[user_id] = cell
+
+    def _unplace(self, user_id: str):
+        cell = self._located.pop(user_id, None)
+        if cell is not None:
+            self._discard_from_cell(cell, self.table.slot(user_id))
+
+    def move(self, user_id: str, lat: float, lng: float) -> bool:
+        """Update a driver's position in memory; True if the driver is eligible for dispatch"""
+        if not self.table.move(user_id, lat, lng):
+            return False
+        documents = self._documents.get(user_id)
+        if documents is None:
+            return False
+        user, profile = documents
+        self._documents[user_id] = (user, {**profile, "current_location_lat": lat, "current_location_lng": lng})
+        self._place(user_id, lat, lng)
+        return True
+
+    def remove(self, user_id: str, status: Optional[str] = None):
+        """Take a driver out of the index; its table row stays, with the new status if given"""
+        self._unplace(user_id)
+        self._documents.pop(user_id, None)
+        if status is not None:
+            self.table.set_status(user_id, status)
+
+    def forget(self, user_id: str):
+        """Drop every trace of a driver, e.g. once its documents are deleted"""
+        self.remove(user_id)
+        self.table.remove(user_id)
+
+    def sync(self, user: Optional[Dict[str, Any]], profile: Optional[Dict[str, Any]], user_id: Optional[str] = None):
+        """Mirror a driver's current documents into the table, then index or drop it"""
+        user_id = user_id or (user or {}).get("id") or (profile or {}).get("user_id")
+        self._unplace(user_id)
+        self.table.sync(user, profile, user_id)
+        if not is_eligible(user, profile):
+            self._documents.pop(user_id, None)
+            return
+
+        self._documents[user_id] = (
+            {k: v for k, v in user.items() if k not in ("_id", "hashed_password")},
+            {k: v for k, v in profile.items() if k != "_id"},
+        )
+        if is_dispatchable(user, profile):
+            self._place(user_id, float(profile["current_location_lat"]), float(profile["current_location_lng"]))
+
+    def clear(self):
+        self._cells.clear()
+        self._located.clear()
+        self._documents.clear()
+        self.table.clear()
+
+    def _discard_from_cell(self, cell, slot):
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(slot)
+            if not members:
+                del self._cells[cell]
+
+    # Queries
+    def counts(self) -> Dict[str, int]:
+        return {
+            **self.table.counts(),
+            "indexed": len(self._located),
+            "awaiting_location": len(self._documents) - len(self._located),
+        }
+
+    def _candidates(self, lat, lng, radius_km):
+        lat_span = radius_km / KM_PER_DEGREE
+        max_abs_lat = min(89.9, abs(lat) + lat_span)
+        lng_span = min(180.0, radius_km / (KM_PER_DEGREE * math.cos(math.radians(max_abs_lat))))
+
+        row_lo, col_lo = self._cell(lat - lat_span, lng - lng_span)
+        row_hi, col_hi = self._cell(lat + lat_span, lng + lng_span)
+
+        # A sparse index is cheaper to walk than a large empty window
+        if (row_hi - row_lo + 1) * (col_hi - col_lo + 1) > len(self._cells):
+            for (row, col), members in self._cells.items():
+                if row_lo <= row <= row_hi and col_lo <= col <= col_hi:
+                    yield from members
+            return
+
+        for row in range(row_lo, row_hi + 1):
+            for col in range(col_lo, col_hi + 1):
+                members = self._cells.get((row, col))
+                if members:
+                    yield from members
+
+    def within(self, lat: float, lng: float, radius_km: float) -> List[Tuple[IndexedDriver, float]]:
+        """Drivers within radius_km of a point, closest first"""
+        slots = np.fromiter(self._candidates(lat, lng, radius_km), dtype=np.intp)
+        if not len(slots):
+            return []
+
+        distances = haversine_many(lat, lng, self.table.lat[slots], self.table.lng[slots], DistanceUnit.KM)
+        inside = (distances <= radius_km).nonzero()[0]
+        order = inside[distances[inside].argsort(kind="stable")]
+        return [(self._entry(self.table.ids[slots[i]], slots[i]), float(distances[i])) for i in order]
+
+    def nearest(self, lat: float, lng: float, k: int = 1, max_radius_km: float = 80) -> List[Tuple[IndexedDriver, float]]:
+        """k closest drivers within max_radius_km, growing the search window as needed"""
+        radius_km = min(max_radius_km, self.cell_size_deg * KM_PER_DEGREE)
+        while True:
+            results = self.within(lat, lng, radius_km)
+            if len(results) >= k or radius_km >= max_radius_km:
+                return results[:k]
+            radius_km = min(max_radius_km, radius_km * 2)
@@ -0,0 +1,76 @@
+"""WebSocket push channel for drivers.
+
+Each driver may hold several sockets (phone, tablet). State-changing
+handlers publish small events naming the tow request that changed and the
+driver's client refetches only then, instead of polling
+/api/tow-requests/nearby.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Set
+
+from fastapi import WebSocket
+
+
+logger = logging.getLogger(__name__)
+
+
+class DriverEvent:
+    ASSIGNMENT = "assignment"  # A request is now waiting on this driver
+    OFFER = "offer"  # Client made or raised an offer
+    COUNTER_OFFER = "counter_offer"  # Driver's counter-offer was recorded
+    OFFER_ACCEPTED = "offer_accepted"  # Client accepted the driver's counter-offer
+    OFFER_REJECTED = "offer_rejected"  # Client rejected the driver's counter-offer
+    EXPIRY = "expiry"  # Request moved on to another driver
+
+
+class DriverPushHub:
+    def __init__(self):
+        self._sockets: Dict[str, Set[WebSocket]] = {}
+        self.events_published = 0
+        self.messages_sent = 0
+        self.send_failures = 0
+
+    async def connect(self, user_id: str, websocket: WebSocket):
+        await websocket.accept()
+        self._sockets.setdefault(user_id, set()).add(websocket)
+
+    def disconnect(self, user_id: str, websocket: WebSocket):
+        sockets = self._sockets.get(user_id)
+        if sockets is not None:
+            sockets.discard(websocket)
+            if not sockets:
+                del self._sockets[user_id]
+
+    def is_connected(self, user_id: str) -> bool:
+        return user_id in self._sockets
+
+    async def publish(self, user_id: str, event_type: str, tow_request_id: str, **data: Any):
+        """Send an event to every socket of one driver; dead sockets are dropped"""
+        if not user_id:
+            return
+
+        self.events_published += 1
+        message = {
+            "type": event_type,
+            "tow_request_id": tow_request_id,
+            "sent_at": datetime.now(timezone.utc).isoformat(),
+            **data,
+        }
+        for websocket in list(self._sockets.get(user_id, ())):
+            try:
+                await websocket.send_json(message)
+                self.messages_sent += 1
+            except Exception:
+                self.send_failures += 1
+                logger.info(f"Dropping push socket for driver {user_id}")
+                self.disconnect(user_id, websocket)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected_drivers": len(self._sockets),
+            "connections": sum(len(sockets) for sockets in self._sockets.values()),
+            "events_published": self.events_published,
+            "messages_sent": self.messages_sent,
+            "send_failures": self.send_failures,
+        }
@@ -0,0 +1,118 @@
+"""Pluggable driver proximity search engines.
+
+``index`` answers from the in-process DriverIndex, ``geonear`` pushes the
+whole query down to Mongo as a single $geoNear aggregation over GeoJSON
+points on driver_profiles. Select one with DRIVER_SEARCH_ENGINE.
+"""
+from typing import Any, Dict, Optional
+
+from driver_index import DriverIndex
+
+
+def geojson_point(lat: float, lng: float) -> Dict[str, Any]:
+    """GeoJSON points are [lng, lat]"""
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+
+class IndexDriverSearch:
+    """Answers from the process-resident grid index"""
+
+    name = "index"
+
+    def __init__(self, index: DriverIndex):
+        self.index = index
+
+    async def prepare(self):
+        return None
+
+    async def within(self, lat: float, lng: float, radius_km: float, limit: Optional[int] = None):
+        results = self.index.within(lat, lng, radius_km)
+        if limit is not None:
+            results = results[:limit]
+        return [
+            {"driver": entry.driver, "profile": entry.profile, "distance_km": round(distance, 2)}
+            for entry, distance in results
+        ]
+
+    async def nearest(self, lat: float, lng: float, max_radius_km: float):
+        results = self.index.nearest(lat, lng, k=1, max_radius_km=max_radius_km)
+        if not results:
+            return None
+        entry, distance = results[0]
+        return {"driver": entry.driver, "profile": entry.profile, "distance_km": round(distance, 2)}
+
+
+class GeoNearDriverSearch:
+    """Answers with one $geoNear aggregation against driver_profiles.location"""
+
+    name = "geonear"
+
+    def __init__(self, db):
+        self.db = db
+
+    async def prepare(self):
+        """Backfill GeoJSON points for older profiles (the 2dsphere index is declared in db_indexes)"""
+        await self.db.driver_profiles.update_many(
+            {
+                "location": {"$exists": False},
+                "current_location_lat": {"$type": "number"},
+                "current_location_lng": {"$type": "number"},
+            },
+            [{"$set": {"location": {
+                "type": "Point",
+                "coordinates": ["$current_location_lng", "$current_location_lat"],
+            }}}]
+        )
+
+    def pipeline(self, lat: float, lng: float, radius_km: float, limit: Optional[int] = None):
+        stages = [
+            {"$geoNear": {
+                "near": geojson_point(lat, lng),
+                "key": "location",
+                "distanceField": "distance_m",
+                "maxDistance": radius_km * 1000,
+                "spherical": True,
+                "query": {"status": "available"},
+            }},
+            {"$lookup": {
+                "from": "users",
+                "localField": "user_id",
+                "foreignField": "id",
+                "as": "driver",
+            }},
+            {"$unwind": "$driver"},
+            # Missing flags count as set, as in driver_index.is_eligible, so both engines agree
+            {"$match": {
+                "driver.role": "driver",
+                "driver.is_approved": {"$ne": False},
+                "driver.is_active": {"$ne": False},
+            }},
+        ]
+        if limit is not None:
+            stages.append({"$limit": limit})
+        stages.append({"$project": {"_id": 0, "driver._id": 0, "driver.hashed_password": 0}})
+        return stages
+
+    async def within(self, lat: float, lng: float, radius_km: float, limit: Optional[int] = None):
+        docs = await self.db.driver_profiles.aggregate(self.pipeline(lat, lng, radius_km, limit)).to_list(None)
+
+        results = []
+        for doc in docs:
+            driver = doc.pop("driver")
+            distance_km = doc.pop("distance_m") / 1000
+            results.append({"driver": driver, "profile": doc, "distance_km": round(distance_km, 2)})
+        return results
+
+    async def nearest(self, lat: float, lng: float, max_radius_km: float):
+        results = await self.within(lat, lng, max_radius_km, limit=1)
+        return results[0] if results else None
+
+
+def create_driver_search(engine: str, db, index: DriverIndex):
+    engines = {
+        IndexDriverSearch.name: lambda: IndexDriverSearch(index),
+        GeoNearDriverSearch.name: lambda: GeoNearDriverSearch(db),
+    }
+    if engine not in engines:
+        raise ValueError(f"Unknown driver search engine '{engine}', expected one of {sorted(engines)}")
+    return engines[engine]()
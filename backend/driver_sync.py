@@ -0,0 +1,259 @@
+"""Keeps the in-process driver state in step with Mongo across API workers.
+
+Each worker subscribes to one change stream over ``users`` and
+``driver_profiles`` and applies every change to its DriverIndex and the
+DriverTable under it (id, position, status and eligibility flags of every
+driver), so a driver going available, being approved or moving is seen by
+all workers without re-querying Mongo on dispatch. Change streams need a replica set; against a
+standalone mongod the subscriber falls back to reloading the whole state
+every ``poll_interval`` seconds. ``mode="polling"`` skips the change stream
+entirely (e.g. tests against an in-memory Mongo).
+
+A reload is applied as a diff against the documents last seen per driver,
+so unchanged drivers are left alone, and a driver written locally after the
+reload started reading keeps the newer local state.
+
+Handlers in this worker call ``sync``/``move``/``remove`` directly so their
+own writes are visible immediately; the stream then confirms them. Every
+move, local or streamed, is also passed to ``on_move`` (live tracking), and
+every other change of a driver to ``on_change`` (cached profile responses;
+position pings are too frequent to drop those on).
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from driver_index import DriverIndex
+
+
+logger = logging.getLogger(__name__)
+
+LOCATION_FIELDS = {"current_location_lat", "current_location_lng", "location"}
+
+_WATCH_PIPELINE = [{"$match": {"ns.coll": {"$in": ["users", "driver_profiles"]}}}]
+
+CHANGE_STREAM_HISTORY_LOST = 286
+
+
+def _location_only(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> bool:
+    """Whether two profile documents differ in their location fields alone"""
+    if before is None or after is None:
+        return False
+    changed = {field for field in before.keys() | after.keys() if before.get(field) != after.get(field)}
+    return changed <= LOCATION_FIELDS and after.get("current_location_lat") is not None
+
+
+class DriverStateSync:
+    def __init__(self, db, index: DriverIndex,
+                 overlay: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+                 poll_interval: float = 5.0, mode: str = "auto",
+                 on_move: Optional[Callable[[str, float, float], Any]] = None,
+                 on_change: Optional[Callable[[str], Any]] = None):
+        self.db = db
+        self.index = index
+        self.overlay = overlay  # e.g. LocationIngestor.overlay, for pings not flushed yet
+        self.poll_interval = poll_interval
+        self.requested_mode = mode  # "auto" (change stream, polling fallback) or "polling"
+        self.on_move = on_move
+        self.on_change = on_change
+        self.mode = "idle"
+        self._object_ids: Dict[Any, str] = {}  # Mongo _id -> driver user id, to resolve deletes
+        self._documents: Dict[str, Tuple[Dict[str, Any], Optional[Dict[str, Any]]]] = {}  # Last seen per driver
+        self._writes = 0
+        self._written: Dict[str, int] = {}  # Driver user id -> sequence number of its last write here
+        self._resume_token = None
+        self._task: Optional[asyncio.Task] = None
+        self.events = 0
+        self.reloads = 0
+        self.errors = 0
+        self.last_event_at: Optional[float] = None
+
+    def _changed(self, user_id: Optional[str]):
+        if self.on_change is not None and user_id:
+            self.on_change(user_id)
+
+    def _wrote(self, user_id: Optional[str]):
+        self._writes += 1
+        self._written[user_id] = self._writes
+
+    # Local writes
+    def sync(self, user: Optional[Dict[str, Any]], profile: Optional[Dict[str, Any]], user_id: Optional[str] = None):
+        user_id = user_id or (user or {}).get("id") or (profile or {}).get("user_id")
+        if user and user.get("role") == "driver":
+            # Stored as the reload reads them (no _id), so unchanged drivers compare equal
+            self._documents[user_id] = (
+                {k: v for k, v in user.items() if k not in ("_id", "hashed_password")},
+                None if profile is None else {k: v for k, v in profile.items() if k != "_id"},
+            )
+        else:
+            self._documents.pop(user_id, None)
+        if profile is not None and self.overlay:
+            profile = self.overlay(profile)
+        self.index.sync(user, profile, user_id)
+        self._wrote(user_id)
+        self._changed(user_id)
+
+    def move(self, user_id: str, lat: float, lng: float):
+        known = self._documents.get(user_id)
+        if known is not None and known[1] is not None:
+            self._documents[user_id] = (known[0], {**known[1], "current_location_lat": lat, "current_location_lng": lng})
+        self.index.move(user_id, lat, lng)
+        if self.on_move is not None:
+            self.on_move(user_id, lat, lng)
+        self._wrote(user_id)
+
+    def remove(self, user_id: str, status: str = "on_mission"):
+        """Take a driver out of dispatch; status is what its profile was just set to"""
+        known = self._documents.get(user_id)
+        if known is not None and known[1] is not None:
+            self._documents[user_id] = (known[0], {**known[1], "status": status})
+        self.index.remove(user_id, status)
+        self._wrote(user_id)
+        self._changed(user_id)
+
+    def _forget(self, user_id: str):
+        self._documents.pop(user_id, None)
+        self.index.forget(user_id)
+        self._wrote(user_id)
+        self._changed(user_id)
+
+    # Full load
+    async def load(self) -> int:
+        started = self._writes
+        users = await self.db.users.find({"role": "driver"}, {"hashed_password": 0}).to_list(None)
+        profiles = await self.db.driver_profiles.find({}).to_list(None)
+        profiles_by_user = {profile["user_id"]: profile for profile in profiles}
+
+        object_ids = {}
+        for user in users:
+            user_id = user["id"]
+            object_ids[user.pop("_id", None)] = user_id
+            profile = profiles_by_user.get(user_id)
+            if profile is not None:
+                object_ids[profile.pop("_id", None)] = user_id
+            if self._written.get(user_id, 0) > started:
+                continue  # Written here while the reload was reading; that state is newer
+
+            known = self._documents.get(user_id)
+            if known == (user, profile):
+                continue
+            if known is not None and known[0] == user and _location_only(known[1], profile):
+                self.move(user_id, profile["current_location_lat"], profile["current_location_lng"])
+            else:
+                self.sync(user, profile, user_id)
+
+        loaded = set(object_ids.values())
+        for user_id in list(self._documents):
+            if user_id not in loaded and self._written.get(user_id, 0) <= started:
+                self._forget(user_id)
+
+        self._object_ids = object_ids
+        self._written = {user_id: write for user_id, write in self._written.items() if write > started}
+        self.reloads += 1
+        return len(self._documents)
+
+    # Change stream
+    async def apply_change(self, change: Dict[str, Any]):
+        self.events += 1
+        self.last_event_at = time.time()
+        collection = change["ns"]["coll"]
+        operation = change["operationType"]
+
+        if operation == "delete":
+            user_id = self._object_ids.pop(change["documentKey"]["_id"], None)
+            if user_id:
+                self._forget(user_id)
+            return
+
+        document = change.get("fullDocument")
+        if document is None:
+            return  # Deleted again before the update lookup ran
+
+        if collection == "driver_profiles":
+            user_id = document["user_id"]
+            self._object_ids[document.pop("_id", None)] = user_id
+            # Location flushes are by far the most common change and need no lookup
+            updated = set((change.get("updateDescription") or {}).get("updatedFields", {}))
+            if operation == "update" and updated and updated <= LOCATION_FIELDS:
+                self.move(user_id, document["current_location_lat"], document["current_location_lng"])
+                return
+            user = await self.db.users.find_one({"id": user_id}, {"_id": 0, "hashed_password": 0})
+            self.sync(user, document, user_id)
+        else:
+            if document.get("role") != "driver":
+                return
+            user_id = document["id"]
+            self._object_ids[document.pop("_id", None)] = user_id
+            document.pop("hashed_password", None)
+            profile = await self.db.driver_profiles.find_one({"user_id": user_id}, {"_id": 0})
+            self.sync(document, profile, user_id)
+
+    async def _watch(self):
+        async with self.db.watch(
+            _WATCH_PIPELINE, full_document="updateLookup", resume_after=self._resume_token
+        ) as stream:
+            self.mode = "change_stream"
+            async for change in stream:
+                self._resume_token = stream.resume_token
+                try:
+                    await self.apply_change(change)
+                except Exception:
+                    self.errors += 1
+                    logger.exception("Could not apply driver change")
+
+    async def _poll(self):
+        self.mode = "polling"
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.load()
+            except PyMongoError:
+                self.errors += 1
+                logger.exception("Driver state reload failed")
+
+    async def _run(self):
+        if self.requested_mode == "polling":
+            await self._poll()
+        while True:
+            try:
+                await self._watch()
+            except OperationFailure as exc:
+                if exc.code == CHANGE_STREAM_HISTORY_LOST:
+                    # Too far behind to resume: start a fresh stream from a full reload
+                    self._resume_token = None
+                    await self.load()
+                    continue
+                logger.info(f"Driver change stream unavailable ({exc}); polling every {self.poll_interval}s")
+                await self._poll()
+            except NotImplementedError:
+                await self._poll()
+            except PyMongoError:
+                self.errors += 1
+                logger.exception("Driver change stream interrupted; resuming")
+                await asyncio.sleep(1)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "events": self.events,
+            "reloads": self.reloads,
+            "errors": self.errors,
+            "last_event_at": self.last_event_at,
+            **self.index.counts(),
+        }
@@ -0,0 +1,169 @@
+"""Compact, array-backed table of every driver's live state.
+
+One row per driver: position in two float64 arrays, status as an int8
+code and the eligibility switches packed into a uint8 bitmask. Rows are
+addressed through an id -> slot map and freed slots are reused, so the
+table stays dense. It is the one copy of driver positions in a worker:
+DriverIndex buckets slots into its grid and measures distances straight
+from these arrays, and fleet-wide counts are single vectorized passes.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+STATUS_CODES = {"offline": 0, "available": 1, "on_mission": 2}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+NO_STATUS = -1
+
+FLAG_APPROVED = 1
+FLAG_ACTIVE = 2
+FLAG_RECEIVES_CALLS = 4
+FLAG_FORCE_ASSIGNED_ONLY = 8
+FLAG_ACTIVE_BY_COMPANY = 16
+
+DISPATCH_FLAGS = FLAG_APPROVED | FLAG_ACTIVE | FLAG_RECEIVES_CALLS | FLAG_ACTIVE_BY_COMPANY
+
+
+def driver_flags(user: Optional[Dict[str, Any]], profile: Optional[Dict[str, Any]]) -> int:
+    user = user or {}
+    profile = profile or {}
+    flags = 0
+    if user.get("is_approved", True):
+        flags |= FLAG_APPROVED
+    if user.get("is_active", True):
+        flags |= FLAG_ACTIVE
+    if profile.get("can_receive_calls", True):
+        flags |= FLAG_RECEIVES_CALLS
+    if profile.get("force_assigned_only", False):
+        flags |= FLAG_FORCE_ASSIGNED_ONLY
+    if profile.get("is_active_by_company", True):
+        flags |= FLAG_ACTIVE_BY_COMPANY
+    return flags
+
+
+class DriverTable:
+    def __init__(self, capacity: int = 1024):
+        self.ids: List[Optional[str]] = [None] * capacity
+        self.lat = np.full(capacity, np.nan)
+        self.lng = np.full(capacity, np.nan)
+        self.status = np.full(capacity, NO_STATUS, dtype=np.int8)
+        self.flags = np.zeros(capacity, dtype=np.uint8)
+        self._slots: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._used = 0  # High-water mark; rows past it were never handed out
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, user_id):
+        return user_id in self._slots
+
+    def _grow(self):
+        capacity = len(self.ids) * 2
+        self.ids.extend([None] * (capacity - len(self.ids)))
+        self.lat = np.concatenate([self.lat, np.full(capacity - len(self.lat), np.nan)])
+        self.lng = np.concatenate([self.lng, np.full(capacity - len(self.lng), np.nan)])
+        self.status = np.concatenate([self.status, np.full(capacity - len(self.status), NO_STATUS, dtype=np.int8)])
+        self.flags = np.concatenate([self.flags, np.zeros(capacity - len(self.flags), dtype=np.uint8)])
+
+    def _slot(self, user_id: str) -> int:
+        slot = self._slots.get(user_id)
+        if slot is not None:
+            return slot
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._used == len(self.ids):
+                self._grow()
+            slot = self._used
+            self._used += 1
+        self._slots[user_id] = slot
+        self.ids[slot] = user_id
+        return slot
+
+    # Mutations
+    def sync(self, user: Optional[Dict[str, Any]], profile: Optional[Dict[str, Any]], user_id: Optional[str] = None):
+        """Mirror a driver's users/driver_profiles documents; non-drivers are dropped"""
+        user_id = user_id or (user or {}).get("id") or (profile or {}).get("user_id")
+        if not user or user.get("role") != "driver":
+            self.remove(user_id)
+            return
+
+        slot = self._slot(user_id)
+        profile = profile or {}
+        lat = profile.get("current_location_lat")
+        lng = profile.get("current_location_lng")
+        self.lat[slot] = np.nan if lat is None else lat
+        self.lng[slot] = np.nan if lng is None else lng
+        self.status[slot] = STATUS_CODES.get(profile.get("status"), NO_STATUS)
+        self.flags[slot] = driver_flags(user, profile)
+
+    def move(self, user_id: str, lat: float, lng: float) -> bool:
+        slot = self._slots.get(user_id)
+        if slot is None:
+            return False
+        self.lat[slot] = lat
+        self.lng[slot] = lng
+        return True
+
+    def set_status(self, user_id: str, status: str) -> bool:
+        slot = self._slots.get(user_id)
+        if slot is None:
+            return False
+        self.status[slot] = STATUS_CODES.get(status, NO_STATUS)
+        return True
+
+    def remove(self, user_id: Optional[str]):
+        slot = self._slots.pop(user_id, None)
+        if slot is None:
+            return
+        self.ids[slot] = None
+        self.lat[slot] = np.nan
+        self.lng[slot] = np.nan
+        self.status[slot] = NO_STATUS
+        self.flags[slot] = 0
+        self._free.append(slot)
+
+    def clear(self):
+        for user_id in list(self._slots):
+            self.remove(user_id)
+
+    # Queries
+    def slot(self, user_id: str) -> Optional[int]:
+        return self._slots.get(user_id)
+
+    def row(self, user_id: str) -> Optional[Dict[str, Any]]:
+        slot = self._slots.get(user_id)
+        if slot is None:
+            return None
+        flags = int(self.flags[slot])
+        return {
+            "user_id": user_id,
+            "lat": None if np.isnan(self.lat[slot]) else float(self.lat[slot]),
+            "lng": None if np.isnan(self.lng[slot]) else float(self.lng[slot]),
+            "status": STATUS_NAMES.get(int(self.status[slot])),
+            "is_approved": bool(flags & FLAG_APPROVED),
+            "is_active": bool(flags & FLAG_ACTIVE),
+            "can_receive_calls": bool(flags & FLAG_RECEIVES_CALLS),
+            "force_assigned_only": bool(flags & FLAG_FORCE_ASSIGNED_ONLY),
+            "is_active_by_company": bool(flags & FLAG_ACTIVE_BY_COMPANY),
+        }
+
+    def dispatchable_mask(self) -> np.ndarray:
+        """Rows that are available, located, and cleared by every eligibility flag"""
+        used = slice(0, self._used)
+        flags = self.flags[used]
+        return (
+            (self.status[used] == STATUS_CODES["available"]) &
+            ((flags & DISPATCH_FLAGS) == DISPATCH_FLAGS) &
+            ((flags & FLAG_FORCE_ASSIGNED_ONLY) == 0) &
+            ~np.isnan(self.lat[used])
+        )
+
+    def counts(self) -> Dict[str, int]:
+        used = self.status[:self._used]
+        counts = {name: int((used == code).sum()) for name, code in STATUS_CODES.items()}
+        counts["dispatchable"] = int(self.dispatchable_mask().sum())
+        counts["drivers"] = len(self)
+        return counts
@@ -0,0 +1,134 @@
+"""Live position of the assigned driver, fanned out to a request's viewers.
+
+Every viewer of a tow request (client app, dealer dashboard, admin) shares
+one channel per request. Driver moves reach the channel from the location
+path (``publish``), and a single pump per channel forwards the newest
+position to all viewers at most once every ``min_interval`` seconds; moves
+in between are coalesced. Each viewer holds a one-slot queue, so a slow
+reader skips to the latest position instead of building a backlog.
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Set
+
+
+END = {"type": "end"}  # Final message once tracking of a request stops
+
+
+class _Channel:
+    def __init__(self, tow_request_id: str, driver_id: str):
+        self.tow_request_id = tow_request_id
+        self.driver_id = driver_id
+        self.viewers: Set[asyncio.Queue] = set()
+        self.latest: Optional[Dict[str, Any]] = None
+        self.changed = asyncio.Event()
+        self.sent_at = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+
+class DriverTracker:
+    def __init__(self, min_interval: float = 2.0):
+        self.min_interval = min_interval
+        self._channels: Dict[str, _Channel] = {}
+        self._by_driver: Dict[str, Set[str]] = {}  # driver id -> tracked tow request ids
+        self.positions_received = 0
+        self.frames_sent = 0
+        self.frames_coalesced = 0
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, message: Dict[str, Any]):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(message)
+
+    def _message(self, channel: _Channel, lat: float, lng: float) -> Dict[str, Any]:
+        return {
+            "type": "position",
+            "tow_request_id": channel.tow_request_id,
+            "driver_id": channel.driver_id,
+            "lat": lat,
+            "lng": lng,
+            "sent_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    def publish(self, driver_id: str, lat: float, lng: float):
+        """Record a driver move; cheap no-op unless someone is tracking that driver"""
+        request_ids = self._by_driver.get(driver_id)
+        if not request_ids:
+            return
+        self.positions_received += 1
+        for tow_request_id in request_ids:
+            channel = self._channels[tow_request_id]
+            if channel.changed.is_set():
+                self.frames_coalesced += 1
+            channel.latest = self._message(channel, lat, lng)
+            channel.changed.set()
+
+    async def _pump(self, channel: _Channel):
+        while True:
+            await channel.changed.wait()
+            wait = self.min_interval - (time.monotonic() - channel.sent_at)
+            if wait > 0:
+                await asyncio.sleep(wait)  # Moves meanwhile just replace channel.latest
+            channel.changed.clear()
+            for queue in channel.viewers:
+                self._offer(queue, channel.latest)
+            channel.sent_at = time.monotonic()
+            self.frames_sent += 1
+
+    def subscribe(self, tow_request_id: str, driver_id: str,
+                  position: Optional[Dict[str, Any]] = None) -> asyncio.Queue:
+        """Join a request's channel, opening it on the first viewer; position seeds this viewer"""
+        channel = self._channels.get(tow_request_id)
+        if channel is None:
+            channel = _Channel(tow_request_id, driver_id)
+            channel.task = asyncio.create_task(self._pump(channel))
+            self._channels[tow_request_id] = channel
+            self._by_driver.setdefault(driver_id, set()).add(tow_request_id)
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        seed = channel.latest
+        if seed is None and position and position.get("lat") is not None:
+            seed = self._message(channel, position["lat"], position["lng"])
+        if seed is not None:
+            queue.put_nowait(seed)
+        channel.viewers.add(queue)
+        return queue
+
+    def _drop(self, channel: _Channel):
+        self._channels.pop(channel.tow_request_id, None)
+        request_ids = self._by_driver.get(channel.driver_id)
+        if request_ids is not None:
+            request_ids.discard(channel.tow_request_id)
+            if not request_ids:
+                del self._by_driver[channel.driver_id]
+        if channel.task is not None:
+            channel.task.cancel()
+
+    def unsubscribe(self, tow_request_id: str, queue: asyncio.Queue):
+        channel = self._channels.get(tow_request_id)
+        if channel is None:
+            return
+        channel.viewers.discard(queue)
+        if not channel.viewers:
+            self._drop(channel)
+
+    def close(self, tow_request_id: str):
+        """Stop tracking a request (completed or cancelled); every viewer gets END"""
+        channel = self._channels.get(tow_request_id)
+        if channel is None:
+            return
+        for queue in channel.viewers:
+            self._offer(queue, END)
+        self._drop(channel)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tracked_requests": len(self._channels),
+            "viewers": sum(len(channel.viewers) for channel in self._channels.values()),
+            "min_interval_seconds": self.min_interval,
+            "positions_received": self.positions_received,
+            "frames_sent": self.frames_sent,
+            "frames_coalesced": self.frames_coalesced,
+        }
@@ -0,0 +1,239 @@
+"""Typed event bus that keeps every API worker's in-process state coherent.
+
+Mutation handlers publish an event instead of touching caches or sockets
+directly. Handlers subscribed in this worker run before ``publish`` returns,
+so the publishing worker sees its own change at once; with a Redis backend
+the event is also sent over pub/sub and replayed on every other worker.
+
+Pub/sub delivery is at most once: a worker that is disconnected when an
+event is sent misses it, which is why the caches behind these events still
+expire on a TTL. ``LocalPubSub`` is an in-process stand-in for the Redis
+client so several buses can be wired together without a server.
+"""
+import asyncio
+import inspect
+import json
+import logging
+import uuid
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Type
+
+
+logger = logging.getLogger(__name__)
+
+
+# Events
+class PricingConfigChanged(NamedTuple):
+    pass
+
+
+class DriverPricingChanged(NamedTuple):
+    driver_user_id: str
+
+
+class UserChanged(NamedTuple):
+    user_id: str
+    auth_epoch: int = 0  # The user's auth epoch after the change (0: not bumped)
+
+
+class DriverNotified(NamedTuple):
+    driver_id: str
+    event: str  # A DriverEvent
+    tow_request_id: str
+    data: Dict[str, Any]
+
+
+class OfferClosed(NamedTuple):
+    tow_request_id: str
+
+
+class RequestClosed(NamedTuple):
+    tow_request_id: str
+
+
+EVENT_TYPES: Dict[str, Type[NamedTuple]] = {
+    event_type.__name__: event_type
+    for event_type in (PricingConfigChanged, DriverPricingChanged, UserChanged, DriverNotified, OfferClosed, RequestClosed)
+}
+
+
+def encode_event(event: NamedTuple, origin: str) -> str:
+    return json.dumps({"type": type(event).__name__, "origin": origin, "fields": event._asdict()})
+
+
+def decode_event(payload) -> Optional[tuple]:
+    """(origin, event) from a wire message; None for unknown event types"""
+    message = json.loads(payload)
+    event_type = EVENT_TYPES.get(message.get("type"))
+    if event_type is None:
+        return None
+    return message.get("origin"), event_type(**message.get("fields", {}))
+
+
+class InMemoryEventBus:
+    """Single-worker bus: events only reach this process's subscribers"""
+    name = "memory"
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex
+        self._handlers: Dict[Type, List[Callable[[Any], Any]]] = {}
+        self.published = 0
+        self.received = 0
+        self.handler_errors = 0
+
+    def subscribe(self, event_type: Type, handler: Callable[[Any], Any]):
+        self._handlers.setdefault(event_type, []).append(handler)
+
+    async def _dispatch(self, event):
+        for handler in self._handlers.get(type(event), ()):
+            try:
+                result = handler(event)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                self.handler_errors += 1
+                logger.exception(f"Handler for {type(event).__name__} failed")
+
+    async def _send(self, event):
+        pass
+
+    async def publish(self, event):
+        self.published += 1
+        await self._dispatch(event)
+        await self._send(event)
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "published": self.published,
+            "received": self.received,
+            "handler_errors": self.handler_errors,
+        }
+
+
+class RedisEventBus(InMemoryEventBus):
+    """Fans events out to every worker through one Redis pub/sub channel"""
+    name = "redis"
+
+    def __init__(self, url: Optional[str] = None, channel: str = "towfleets:events", client=None):
+        super().__init__()
+        if client is None:
+            try:
+                from redis import asyncio as redis_asyncio
+            except ImportError:
+                raise RuntimeError("EVENT_BUS_URL needs the 'redis' package: pip install redis")
+            client = redis_asyncio.from_url(url)
+        self.client = client
+        self.channel = channel
+        self._task: Optional[asyncio.Task] = None
+        self.send_failures = 0
+        self.reconnects = 0
+
+    async def _send(self, event):
+        try:
+            await self.client.publish(self.channel, encode_event(event, self.worker_id))
+        except Exception:
+            # Local subscribers already ran; remote caches fall back to their TTL
+            self.send_failures += 1
+            logger.exception(f"Could not send {type(event).__name__} to other workers")
+
+    async def _listen(self):
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(self.channel)
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                decoded = decode_event(message["data"])
+                if decoded is None:
+                    continue
+                origin, event = decoded
+                if origin == self.worker_id:
+                    continue  # Already dispatched locally by publish()
+                self.received += 1
+                await self._dispatch(event)
+        finally:
+            await pubsub.unsubscribe(self.channel)
+
+    async def _run(self):
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.reconnects += 1
+                logger.exception("Event bus subscription lost; resubscribing")
+                await asyncio.sleep(1)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "channel": self.channel,
+            "send_failures": self.send_failures,
+            "reconnects": self.reconnects,
+        }
+
+
+class LocalPubSub:
+    """The slice of the redis.asyncio client RedisEventBus uses, served in-process"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    async def publish(self, channel: str, message: str) -> int:
+        queues = self._subscribers.get(channel, set())
+        for queue in queues:
+            queue.put_nowait({"type": "message", "channel": channel, "data": message})
+        return len(queues)
+
+    def pubsub(self):
+        return _LocalSubscription(self)
+
+
+class _LocalSubscription:
+    def __init__(self, broker: LocalPubSub):
+        self.broker = broker
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.channels: Set[str] = set()
+
+    async def subscribe(self, *channels: str):
+        for channel in channels:
+            self.broker._subscribers.setdefault(channel, set()).add(self.queue)
+            self.channels.add(channel)
+            self.queue.put_nowait({"type": "subscribe", "channel": channel, "data": len(self.channels)})
+
+    async def unsubscribe(self, *channels: str):
+        for channel in channels or tuple(self.channels):
+            self.broker._subscribers.get(channel, set()).discard(self.queue)
+            self.channels.discard(channel)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+
+def create_event_bus(url: Optional[str]) -> InMemoryEventBus:
+    if not url:
+        return InMemoryEventBus()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisEventBus(url)
+    raise ValueError(f"Unsupported EVENT_BUS_URL '{url}', expected a redis:// URL or nothing for in-process only")
@@ -0,0 +1,65 @@
+"""Great-circle distance kernels.
+
+Every function takes an explicit unit so callers never have to guess
+whether a distance is in kilometers or miles. ``haversine_many`` computes
+one origin against arrays of points and ``haversine_pairs`` many
+origin/destination pairs, each in a single vectorized pass.
+"""
+import math
+from enum import Enum
+
+import numpy as np
+
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_MILE = 1.609344
+
+
+class DistanceUnit(str, Enum):
+    KM = "km"
+    MILES = "miles"
+
+
+def _radius(unit: DistanceUnit) -> float:
+    if unit == DistanceUnit.KM:
+        return EARTH_RADIUS_KM
+    if unit == DistanceUnit.MILES:
+        return EARTH_RADIUS_KM / KM_PER_MILE
+    raise ValueError(f"Unknown distance unit: {unit}")
+
+
+def haversine(lat1: float, lng1: float, lat2: float, lng2: float, unit: DistanceUnit) -> float:
+    """Distance between two points"""
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    dlat = lat2_rad - lat1_rad
+    dlng = math.radians(lng2 - lng1)
+
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlng / 2) ** 2
+    return 2 * _radius(unit) * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_many(lat: float, lng: float, lats, lngs, unit: DistanceUnit) -> np.ndarray:
+    """Distances from one origin to every (lats[i], lngs[i])"""
+    lats_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    lngs_rad = np.radians(np.asarray(lngs, dtype=np.float64))
+    lat_rad = math.radians(lat)
+
+    a = (
+        np.sin((lats_rad - lat_rad) * 0.5) ** 2 +
+        math.cos(lat_rad) * np.cos(lats_rad) * np.sin((lngs_rad - math.radians(lng)) * 0.5) ** 2
+    )
+    return 2 * _radius(unit) * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def haversine_pairs(lats1, lngs1, lats2, lngs2, unit: DistanceUnit) -> np.ndarray:
+    """Element-wise distances between (lats1[i], lngs1[i]) and (lats2[i], lngs2[i])"""
+    lats1_rad = np.radians(np.asarray(lats1, dtype=np.float64))
+    lats2_rad = np.radians(np.asarray(lats2, dtype=np.float64))
+    dlngs_rad = np.radians(np.asarray(lngs2, dtype=np.float64) - np.asarray(lngs1, dtype=np.float64))
+
+    a = (
+        np.sin((lats2_rad - lats1_rad) * 0.5) ** 2 +
+        np.cos(lats1_rad) * np.cos(lats2_rad) * np.sin(dlngs_rad * 0.5) ** 2
+    )
+    return 2 * _radius(unit) * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
@@ -0,0 +1,301 @@
+"""Driver location history in time-bucketed, delta-encoded documents.
+
+Every accepted ping is kept (the live ingestor only keeps the newest one) and
+written every ``flush_interval`` seconds as one ``$push`` per driver into
+that driver's document for the current bucket (``bucket_seconds`` long). A
+chunk is a packed varint stream: each point is (milliseconds, lat, lng)
+stored as zigzag-encoded deltas from the previous point, with coordinates in
+units of 1e-5 degrees (about 1 m), so a ping costs a handful of bytes
+instead of a document.
+
+Closed buckets are compacted into a single chunk; past ``thin_after_days``
+they are thinned to one point per ``thin_seconds``, and past
+``retention_days`` they are deleted.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import Binary
+from pymongo import ASCENDING, UpdateOne
+
+from geo import DistanceUnit, haversine_pairs
+
+
+logger = logging.getLogger(__name__)
+
+COORD_SCALE = 100_000  # Stored coordinate units per degree
+
+Point = Tuple[int, float, float]  # (epoch milliseconds, lat, lng)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) if value >= 0 else ((-value << 1) - 1)
+
+
+def _unzigzag(value: int) -> int:
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1)
+
+
+def encode_points(points: List[Point], origin_ms: int) -> bytes:
+    """Pack points as zigzag varint deltas; the first is relative to (origin_ms, 0, 0)"""
+    out = bytearray()
+    previous = (origin_ms, 0, 0)
+    for at_ms, lat, lng in points:
+        current = (at_ms, round(lat * COORD_SCALE), round(lng * COORD_SCALE))
+        for value, before in zip(current, previous):
+            value = _zigzag(value - before)
+            while value >= 0x80:
+                out.append((value & 0x7F) | 0x80)
+                value >>= 7
+            out.append(value)
+        previous = current
+    return bytes(out)
+
+
+def decode_points(data: bytes, origin_ms: int) -> List[Point]:
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(_unzigzag(value))
+            value = shift = 0
+
+    points = []
+    at_ms, lat, lng = origin_ms, 0, 0
+    for i in range(0, len(values) - 2, 3):
+        at_ms += values[i]
+        lat += values[i + 1]
+        lng += values[i + 2]
+        points.append((at_ms, lat / COORD_SCALE, lng / COORD_SCALE))
+    return points
+
+
+def thin(points: List[Point], min_gap_ms: int) -> List[Point]:
+    """Keep a point only if it is at least min_gap_ms after the last kept one; the last point always stays"""
+    kept = []
+    for point in points:
+        if not kept or point[0] - kept[-1][0] >= min_gap_ms:
+            kept.append(point)
+    if points and kept[-1] is not points[-1]:
+        kept.append(points[-1])
+    return kept
+
+
+def track_miles(points: List[Point]) -> float:
+    """Driven distance along a track, as the sum of its straight segments"""
+    if len(points) < 2:
+        return 0.0
+    lats = [lat for _, lat, _ in points]
+    lngs = [lng for _, _, lng in points]
+    return float(haversine_pairs(lats[:-1], lngs[:-1], lats[1:], lngs[1:], DistanceUnit.MILES).sum())
+
+
+def epoch_ms(moment: datetime) -> int:
+    """Milliseconds since the epoch; naive datetimes (as Mongo returns them) are UTC"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+def from_epoch_ms(at_ms: int) -> datetime:
+    return datetime.fromtimestamp(at_ms / 1000, tz=timezone.utc)
+
+
+class LocationHistory:
+    def __init__(self, db, bucket_seconds: int = 3600, flush_interval: float = 30.0, max_pending: int = 200000,
+                 retention_days: float = 90, thin_after_days: float = 7, thin_seconds: int = 30,
+                 compact_interval: float = 3600.0):
+        self.db = db
+        self.bucket_ms = bucket_seconds * 1000
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.retention_days = retention_days
+        self.thin_after_days = thin_after_days
+        self.thin_seconds = thin_seconds
+        self.compact_interval = compact_interval
+        self._pending: Dict[str, List[Point]] = {}
+        self._pending_points = 0
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.written_points = 0
+        self.written_bytes = 0
+        self.bucket_writes = 0
+        self.compacted_buckets = 0
+        self.deleted_buckets = 0
+
+    def record(self, user_id: str, lat: float, lng: float, at: float) -> bool:
+        """Buffer one ping (at is epoch seconds); False if the buffer is full"""
+        if self._pending_points >= self.max_pending:
+            self.dropped += 1
+            return False
+        self._pending.setdefault(user_id, []).append((int(at * 1000), lat, lng))
+        self._pending_points += 1
+        self.recorded += 1
+        return True
+
+    def _bucket_start_ms(self, at_ms: int) -> int:
+        return at_ms - at_ms % self.bucket_ms
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+
+        batch, self._pending = self._pending, {}
+        points_in_batch, self._pending_points = self._pending_points, 0
+
+        operations = []
+        written_bytes = 0
+        for user_id, points in batch.items():
+            buckets: Dict[int, List[Point]] = {}
+            for point in sorted(points):
+                buckets.setdefault(self._bucket_start_ms(point[0]), []).append(point)
+            for start_ms, bucket_points in buckets.items():
+                chunk = encode_points(bucket_points, start_ms)
+                written_bytes += len(chunk)
+                operations.append(UpdateOne(
+                    {"driver_user_id": user_id, "bucket_start": from_epoch_ms(start_ms)},
+                    {
+                        "$push": {"chunks": Binary(chunk)},
+                        "$inc": {"count": len(bucket_points), "bytes": len(chunk)},
+                        "$min": {"first_at": from_epoch_ms(bucket_points[0][0])},
+                        "$max": {"last_at": from_epoch_ms(bucket_points[-1][0])},
+                        "$setOnInsert": {"bucket_end": from_epoch_ms(start_ms + self.bucket_ms)},
+                    },
+                    upsert=True
+                ))
+
+        try:
+            await self.db.location_history.bulk_write(operations, ordered=False)
+        except Exception:
+            self.flush_failures += 1
+            logger.exception(f"Location history flush of {points_in_batch} points failed, requeueing")
+            for user_id, points in batch.items():
+                if self._pending_points + len(points) > self.max_pending:
+                    self.dropped += len(points)
+                    continue
+                self._pending[user_id] = points + self._pending.get(user_id, [])
+                self._pending_points += len(points)
+            return 0
+
+        self.flushes += 1
+        self.bucket_writes += len(operations)
+        self.written_points += points_in_batch
+        self.written_bytes += written_bytes
+        return points_in_batch
+
+    async def track(self, user_id: str, since: datetime, until: datetime) -> List[Point]:
+        """Every stored or still-buffered point of a driver in [since, until], oldest first"""
+        since_ms, until_ms = epoch_ms(since), epoch_ms(until)
+        buckets = await self.db.location_history.find(
+            {
+                "driver_user_id": user_id,
+                "bucket_start": {"$lte": until},
+                "bucket_end": {"$gt": since},
+            },
+            {"_id": 0, "bucket_start": 1, "chunks": 1}
+        ).sort("bucket_start", ASCENDING).to_list(None)
+
+        points = []
+        for bucket in buckets:
+            origin_ms = epoch_ms(bucket["bucket_start"])
+            for chunk in bucket.get("chunks", []):
+                points.extend(decode_points(chunk, origin_ms))
+        points.extend(self._pending.get(user_id, []))
+        # Chunks written by different flushes (or workers) can interleave
+        return sorted(point for point in points if since_ms <= point[0] <= until_ms)
+
+    async def compact(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Merge closed buckets into one chunk, thin old ones, drop expired ones"""
+        now = now or datetime.now(timezone.utc)
+        deleted = await self.db.location_history.delete_many(
+            {"bucket_end": {"$lt": now - timedelta(days=self.retention_days)}}
+        )
+
+        # A bucket is closed once no in-flight flush can still push into it
+        closed_before = now - timedelta(seconds=self.flush_interval * 2 + 60)
+        thin_before = now - timedelta(days=self.thin_after_days)
+        buckets = await self.db.location_history.find({
+            "bucket_end": {"$lt": closed_before},
+            "$or": [
+                {"resolution_seconds": {"$exists": False}},
+                {"bucket_end": {"$lt": thin_before}, "resolution_seconds": {"$lt": self.thin_seconds}},
+            ],
+        }, {"_id": 0, "driver_user_id": 1, "bucket_start": 1, "bucket_end": 1, "count": 1, "chunks": 1}).to_list(None)
+
+        operations = []
+        for bucket in buckets:
+            origin_ms = epoch_ms(bucket["bucket_start"])
+            points = sorted({point for chunk in bucket.get("chunks", []) for point in decode_points(chunk, origin_ms)})
+            resolution = 0
+            if epoch_ms(bucket["bucket_end"]) < epoch_ms(thin_before):
+                resolution = self.thin_seconds
+                points = thin(points, resolution * 1000)
+            chunk = encode_points(points, origin_ms)
+            operations.append(UpdateOne(
+                # A changed count means pings landed after we read it; the next pass retries
+                {"driver_user_id": bucket["driver_user_id"], "bucket_start": bucket["bucket_start"],
+                 "count": bucket.get("count")},
+                {"$set": {
+                    "chunks": [Binary(chunk)],
+                    "count": len(points),
+                    "bytes": len(chunk),
+                    "resolution_seconds": resolution,
+                }}
+            ))
+
+        compacted = 0
+        if operations:
+            result = await self.db.location_history.bulk_write(operations, ordered=False)
+            compacted = result.modified_count
+        self.compacted_buckets += compacted
+        self.deleted_buckets += deleted.deleted_count
+        return {"compacted": compacted, "deleted": deleted.deleted_count}
+
+    async def _run(self):
+        next_compaction = time.monotonic() + self.compact_interval
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if time.monotonic() >= next_compaction:
+                next_compaction = time.monotonic() + self.compact_interval
+                try:
+                    await self.compact()
+                except Exception:
+                    logger.exception("Location history compaction failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self._pending_points,
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+            "bucket_writes": self.bucket_writes,
+            "written_points": self.written_points,
+            "bytes_per_point": round(self.written_bytes / self.written_points, 2) if self.written_points else None,
+            "compacted_buckets": self.compacted_buckets,
+            "deleted_buckets": self.deleted_buckets,
+        }
@@ -0,0 +1,157 @@
+"""Batched driver location ingestion.
+
+PUT /api/drivers/location only records the ping in memory. Pings are
+coalesced per driver (the newest wins) and written to driver_profiles as a
+single unordered bulk_write every ``flush_interval`` seconds, or sooner once
+``max_batch`` drivers are waiting. Read paths call ``latest`` to see
+positions that have not been flushed yet; once a flush lands, Mongo is the
+source of truth again, so a worker never pins a driver to its own last ping
+after later pings went to another worker. Every accepted ping, coalesced
+or not, is also handed to ``history`` (a LocationHistory) when one is set.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from driver_search import geojson_point
+
+
+logger = logging.getLogger(__name__)
+
+
+class LocationIngestor:
+    def __init__(self, db, flush_interval: float = 1.0, max_batch: int = 500, max_pending: int = 50000,
+                 history=None):
+        self.db = db
+        self.history = history
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._pending: Dict[str, Tuple[float, float, float]] = {}  # user_id -> (lat, lng, received_at)
+        self._flushing: Dict[str, Tuple[float, float, float]] = {}  # Batch being written right now
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.received = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.flushed_pings = 0
+        self.last_batch_size = 0
+        self.max_batch_seen = 0
+        self.last_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def submit(self, user_id: str, lat: float, lng: float) -> bool:
+        """Buffer a ping; False if it had to be dropped because the buffer is full"""
+        self.received += 1
+        if user_id in self._pending:
+            self.coalesced += 1
+        elif len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+
+        ping = (lat, lng, time.time())
+        self._pending[user_id] = ping
+        if self.history is not None:
+            self.history.record(user_id, lat, lng, ping[2])
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+        return True
+
+    def latest(self, user_id: str) -> Optional[Tuple[float, float]]:
+        """Position of a ping not yet in Mongo; None once it has been written"""
+        ping = self._pending.get(user_id) or self._flushing.get(user_id)
+        return (ping[0], ping[1]) if ping else None
+
+    def overlay(self, profile: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Profile document with its location replaced by an unflushed ping, if any"""
+        if not profile:
+            return profile
+        position = self.latest(profile["user_id"])
+        if position:
+            profile = {**profile, "current_location_lat": position[0], "current_location_lng": position[1]}
+        return profile
+
+    async def flush(self):
+        if not self._pending:
+            return 0
+
+        batch, self._pending = self._pending, {}
+        self._flushing = batch
+        started = time.perf_counter()
+        try:
+            await self.db.driver_profiles.bulk_write([
+                UpdateOne(
+                    {"user_id": user_id},
+                    {"$set": {
+                        "current_location_lat": lat,
+                        "current_location_lng": lng,
+                        "location": geojson_point(lat, lng)
+                    }}
+                )
+                for user_id, (lat, lng, _) in batch.items()
+            ], ordered=False)
+        except Exception:
+            self.flush_failures += 1
+            logger.exception(f"Location flush of {len(batch)} drivers failed, requeueing")
+            # Keep newer pings that arrived while we were writing
+            for user_id, ping in batch.items():
+                if user_id not in self._pending:
+                    if len(self._pending) < self.max_pending:
+                        self._pending[user_id] = ping
+                    else:
+                        self.dropped += 1
+            return 0
+        finally:
+            self._flushing = {}
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self.flushed_pings += len(batch)
+        self.last_batch_size = len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        self.last_flush_ms = elapsed_ms
+        self.total_flush_ms += elapsed_ms
+        return len(batch)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+            "flushed_pings": self.flushed_pings,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size": self.max_batch_seen,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self.total_flush_ms / self.flushes, 2) if self.flushes else None,
+        }
@@ -0,0 +1,112 @@
+"""Fires a callback when a tow request's offer window (offer_expires_at) closes.
+
+Deadlines live in a min-heap; a single asyncio task sleeps until the
+earliest one. Rescheduling or cancelling a request just records its new
+deadline and stale heap entries are skipped when they surface, so no
+operation scans the tow_requests collection.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+def as_utc(value: datetime) -> datetime:
+    """Mongo hands back naive UTC datetimes"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+class OfferExpiryScheduler:
+    def __init__(self, on_expire: Callable[[str], Awaitable[Any]]):
+        self.on_expire = on_expire
+        self._heap: List[Tuple[float, int, str]] = []
+        self._deadlines: Dict[str, float] = {}
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.fired = 0
+        self.failures = 0
+
+    def schedule(self, request_id: str, expires_at: datetime):
+        deadline = as_utc(expires_at).timestamp()
+        self._deadlines[request_id] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._sequence), request_id))
+        # Only the earliest deadline matters to the sleeping task
+        if self._heap[0][2] == request_id:
+            self._wakeup.set()
+
+    def cancel(self, request_id: str):
+        self._deadlines.pop(request_id, None)
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    async def load(self, db):
+        """Schedule every open offer window, e.g. after a restart"""
+        open_requests = await db.tow_requests.find(
+            {
+                "status": "pending",
+                "negotiation_status": {"$in": ["awaiting_driver", "negotiating"]},
+                "offer_expires_at": {"$ne": None},
+            },
+            {"_id": 0, "id": 1, "offer_expires_at": 1}
+        ).to_list(None)
+        for request in open_requests:
+            self.schedule(request["id"], request["offer_expires_at"])
+        return len(open_requests)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            deadline, _, request_id = self._heap[0]
+            delay = deadline - datetime.now(timezone.utc).timestamp()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            if self._deadlines.get(request_id) != deadline:
+                continue  # Rescheduled or cancelled since this entry was pushed
+            del self._deadlines[request_id]
+
+            self.fired += 1
+            try:
+                await self.on_expire(request_id)
+            except Exception:
+                self.failures += 1
+                logger.exception(f"Offer expiry for tow request {request_id} failed")
+            # Give request handlers a turn between bursts of expiries
+            await asyncio.sleep(0)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "scheduled": len(self._deadlines),
+            "heap_entries": len(self._heap),
+            "fired": self.fired,
+            "failures": self.failures,
+        }
@@ -0,0 +1,49 @@
+"""Keyset pagination over (created_at, id), newest first.
+
+A cursor is an opaque url-safe token naming the last document of the
+previous page. Pages are fetched with an index range scan instead of
+skip/limit, so the cost of a page does not grow with its position.
+"""
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import DESCENDING
+
+
+KEYSET_SORT: List[Tuple[str, int]] = [("created_at", DESCENDING), ("id", DESCENDING)]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(document: Dict[str, Any]) -> str:
+    created_at = document["created_at"]
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    payload = json.dumps({"c": created_at.isoformat(), "i": document["id"]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["c"]), str(payload["i"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise InvalidCursor(str(exc))
+
+
+def keyset_filter(query: Dict[str, Any], cursor: Optional[str]) -> Dict[str, Any]:
+    """Restrict query to documents strictly after the cursor in KEYSET_SORT order"""
+    if not cursor:
+        return query
+
+    created_at, last_id = decode_cursor(cursor)
+    after_cursor = {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "id": {"$lt": last_id}},
+    ]}
+    return {"$and": [query, after_cursor]} if query else after_cursor
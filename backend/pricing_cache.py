@@ -0,0 +1,88 @@
+"""In-process cache of pricing configuration and per-driver rates.
+
+The latest admin ``pricing_config`` document is cached under its id, which
+acts as the config version. Resolved per-driver rates are cached under
+(config version, driver id), including drivers with no custom pricing, so
+a steady-state quote costs no database round trips. Entries expire after a
+TTL and are dropped explicitly when an admin or driver changes pricing.
+"""
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+DEFAULT_RATES = {
+    "price_per_mile": 2.50,
+    "price_per_hour": 60.00,
+    "pickup_fee": 25.00,
+}
+
+
+class PricingCache:
+    def __init__(self, db, ttl_seconds: float = 60.0, clock=time.monotonic):
+        self.db = db
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._config: Optional[Tuple[float, str, Dict[str, Any]]] = None  # (expires_at, version, rates)
+        self._driver_rates: Dict[str, Tuple[str, float, Dict[str, Any]]] = {}  # driver -> (version, expires_at, rates)
+        self.hits = 0
+        self.misses = 0
+
+    async def base_rates(self) -> Tuple[str, Dict[str, Any]]:
+        """(version, rates) of the latest admin pricing configuration"""
+        now = self.clock()
+        if self._config and self._config[0] > now:
+            self.hits += 1
+            return self._config[1], self._config[2]
+
+        self.misses += 1
+        config = await self.db.pricing_config.find_one({}, sort=[("created_at", -1)])
+        if config:
+            version = config["id"]
+            rates = {key: config.get(key, default) for key, default in DEFAULT_RATES.items()}
+        else:
+            version = "default"
+            rates = dict(DEFAULT_RATES)
+
+        self._config = (now + self.ttl_seconds, version, rates)
+        return version, rates
+
+    async def rates_for(self, driver_user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Rates a quote should use: the driver's custom pricing, else the admin base pricing"""
+        version, base = await self.base_rates()
+        if not driver_user_id:
+            return base
+
+        now = self.clock()
+        cached = self._driver_rates.get(driver_user_id)
+        if cached and cached[0] == version and cached[1] > now:
+            self.hits += 1
+            return cached[2]
+
+        self.misses += 1
+        driver_pricing = await self.db.driver_pricing.find_one({"driver_user_id": driver_user_id})
+        if driver_pricing and not driver_pricing.get("is_using_base_pricing", True):
+            rates = {
+                **base,
+                "price_per_mile": driver_pricing["price_per_mile"],
+                "pickup_fee": driver_pricing["pickup_fee"],
+            }
+        else:
+            rates = base
+
+        self._driver_rates[driver_user_id] = (version, now + self.ttl_seconds, rates)
+        return rates
+
+    def invalidate_config(self):
+        self._config = None
+        self._driver_rates.clear()
+
+    def invalidate_driver(self, driver_user_id: str):
+        self._driver_rates.pop(driver_user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "config_version": self._config[1] if self._config else None,
+            "cached_drivers": len(self._driver_rates),
+        }
@@ -0,0 +1,87 @@
+"""Short-lived cache of serialized GET responses, with ETags.
+
+Each entry is the response body exactly as it goes on the wire plus its
+ETag, so a poll that hits the cache costs neither a Mongo read nor model
+serialization, and a poll whose If-None-Match still matches gets a bodiless
+304. ETags come from a document version (``updated_at``, a pricing config
+id) when the caller has one, otherwise from a hash of the body. Writers drop
+entries through ``invalidate``; the TTL bounds how stale an entry can get
+when a change arrives by a path that does not invalidate.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Tuple
+
+
+class CachedResponse(NamedTuple):
+    etag: str
+    body: bytes
+
+
+def make_etag(key: Hashable, version: Any = None, body: Optional[bytes] = None) -> str:
+    source = f"{key!r}:{version!r}".encode() if version is not None else body
+    return '"' + hashlib.sha1(source).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison; weak validators match too (RFC 9110 weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 30.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, CachedResponse]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        cached = self._entries.get(key)
+        if cached is None:
+            self.misses += 1
+            return None
+
+        expires_at, entry = cached
+        if expires_at <= self.clock():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Hashable, body: bytes, version: Any = None) -> CachedResponse:
+        entry = CachedResponse(make_etag(key, version, body), body)
+        self._entries[key] = (self.clock() + self.ttl_seconds, entry)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def invalidate(self, key: Hashable):
+        if self._entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+        }
@@ -0,0 +1,342 @@
+"""Road distance and travel time over a local road graph.
+
+The graph is loaded once from a file: either an OpenStreetMap XML extract
+(``.osm`` / ``.osm.gz``) or the compact JSON this module writes
+(``.json`` / ``.json.gz``). Endpoints are snapped to the nearest road node
+and the fastest path is found with A*, using straight-line distance at
+the graph's top speed as the heuristic.
+
+Routes are cached in an LRU keyed on the grid cells of both endpoints, so
+a corridor that was already routed costs a dict lookup; two points in the
+same cell (``cell_deg``, about 500 m by default) share a route. Without a
+graph, or when an endpoint is too far from any road, distances fall back
+to haversine at ``fallback_speed_mph``; that duration is only an estimate,
+so such routes have no billable hours.
+
+Convert an extract once so API workers start fast:
+
+    cd backend && python routing.py miami.osm.gz miami-roads.json.gz
+"""
+import gzip
+import heapq
+import json
+import logging
+import math
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from driver_index import KM_PER_DEGREE
+from geo import KM_PER_MILE, DistanceUnit, haversine, haversine_pairs
+
+
+logger = logging.getLogger(__name__)
+
+# Free-flow speeds (km/h) for OSM highway classes without a usable maxspeed tag
+HIGHWAY_SPEEDS_KPH = {
+    "motorway": 100, "motorway_link": 60,
+    "trunk": 80, "trunk_link": 50,
+    "primary": 65, "primary_link": 45,
+    "secondary": 55, "secondary_link": 40,
+    "tertiary": 45, "tertiary_link": 35,
+    "unclassified": 40, "residential": 30,
+    "living_street": 10, "service": 20,
+}
+
+
+class Route(NamedTuple):
+    distance_miles: float
+    duration_hours: float
+    source: str  # "road" or "haversine"
+
+    @property
+    def billable_hours(self) -> float:
+        """Drive time worth charging for: only a road route's time is measured, not guessed"""
+        return self.duration_hours if self.source == "road" else 0.0
+
+
+def _open(path: str, mode: str = "rb"):
+    return gzip.open(path, mode) if path.endswith(".gz") else open(path, mode)
+
+
+def _maxspeed_kph(tag: Optional[str]) -> Optional[float]:
+    if not tag:
+        return None
+    value = tag.strip().lower()
+    try:
+        if value.endswith("mph"):
+            return float(value[:-3]) * KM_PER_MILE
+        return float(value)
+    except ValueError:
+        return None
+
+
+class RoadGraph:
+    def __init__(self, lats: List[float], lngs: List[float], edges: Sequence[Tuple[int, int, float, float]],
+                 snap_cell_deg: float = 0.01):
+        self.lats = lats
+        self.lngs = lngs
+        self.adjacency: List[List[Tuple[int, float, float]]] = [[] for _ in lats]  # (to, meters, seconds)
+        top_speed = 1.0
+        for source, target, meters, seconds in edges:
+            self.adjacency[source].append((target, meters, seconds))
+            if seconds > 0:
+                top_speed = max(top_speed, meters / seconds)
+        self.top_speed_mps = top_speed
+        self.edge_count = len(edges)
+
+        self.snap_cell_deg = snap_cell_deg
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+        for node, (lat, lng) in enumerate(zip(lats, lngs)):
+            if self.adjacency[node]:  # Only nodes a route can leave from
+                self._cells.setdefault(self._cell(lat, lng), []).append(node)
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self.snap_cell_deg), math.floor(lng / self.snap_cell_deg))
+
+    # Loading
+    @classmethod
+    def load(cls, path: str) -> "RoadGraph":
+        if path.endswith((".osm", ".osm.gz")):
+            return cls.from_osm(path)
+        with _open(path, "rt") as handle:
+            data = json.load(handle)
+        return cls(data["lats"], data["lngs"], [tuple(edge) for edge in data["edges"]])
+
+    @classmethod
+    def from_osm(cls, path: str) -> "RoadGraph":
+        """Drivable ways of an OSM XML extract; nodes are kept only where a road uses them"""
+        coordinates: Dict[str, Tuple[float, float]] = {}
+        ways: List[Tuple[List[str], float, str]] = []
+        with _open(path) as handle:
+            for _, element in ElementTree.iterparse(handle, events=("end",)):
+                if element.tag == "node":
+                    coordinates[element.get("id")] = (float(element.get("lat")), float(element.get("lon")))
+                    element.clear()
+                elif element.tag == "way":
+                    tags = {tag.get("k"): tag.get("v") for tag in element.iter("tag")}
+                    highway = tags.get("highway")
+                    if highway in HIGHWAY_SPEEDS_KPH:
+                        speed = _maxspeed_kph(tags.get("maxspeed")) or HIGHWAY_SPEEDS_KPH[highway]
+                        refs = [nd.get("ref") for nd in element.iter("nd")]
+                        ways.append((refs, speed, tags.get("oneway", "no")))
+                    element.clear()
+                elif element.tag == "relation":
+                    element.clear()
+
+        index: Dict[str, int] = {}
+        lats: List[float] = []
+        lngs: List[float] = []
+        edges: List[Tuple[int, int, float, float]] = []
+
+        def node_index(ref):
+            if ref not in index:
+                index[ref] = len(lats)
+                lat, lng = coordinates[ref]
+                lats.append(lat)
+                lngs.append(lng)
+            return index[ref]
+
+        for refs, speed_kph, oneway in ways:
+            refs = [ref for ref in refs if ref in coordinates]
+            if oneway == "-1":
+                refs.reverse()
+            speed_mps = speed_kph / 3.6
+            for a, b in zip(refs, refs[1:]):
+                u, v = node_index(a), node_index(b)
+                meters = haversine(lats[u], lngs[u], lats[v], lngs[v], DistanceUnit.KM) * 1000
+                edges.append((u, v, meters, meters / speed_mps))
+                if oneway not in ("yes", "true", "1", "-1"):
+                    edges.append((v, u, meters, meters / speed_mps))
+        return cls(lats, lngs, edges)
+
+    def save(self, path: str):
+        edges = [
+            [source, target, round(meters, 1), round(seconds, 1)]
+            for source, targets in enumerate(self.adjacency)
+            for target, meters, seconds in targets
+        ]
+        with _open(path, "wt") as handle:
+            json.dump({"lats": self.lats, "lngs": self.lngs, "edges": edges}, handle, separators=(",", ":"))
+
+    # Queries
+    def snap(self, lat: float, lng: float, max_km: float = 2.0) -> Optional[Tuple[int, float]]:
+        """Nearest road node within max_km as (node, km)"""
+        row, col = self._cell(lat, lng)
+        # Narrowest side of a cell, in km; ring r only holds nodes at least (r - 1) cells away
+        cell_km = self.snap_cell_deg * KM_PER_DEGREE * math.cos(math.radians(min(abs(lat), 89.0)))
+        rings = max(1, math.ceil(max_km / cell_km) + 1)
+        best = None
+        for ring in range(rings + 1):
+            for r in range(row - ring, row + ring + 1):
+                for c in range(col - ring, col + ring + 1):
+                    if max(abs(r - row), abs(c - col)) != ring:
+                        continue  # Inner rings were searched already
+                    for node in self._cells.get((r, c), ()):
+                        km = haversine(lat, lng, self.lats[node], self.lngs[node], DistanceUnit.KM)
+                        if best is None or km < best[1]:
+                            best = (node, km)
+            if best is not None and best[1] <= ring * cell_km:
+                break  # Every unsearched ring is farther away
+        if best is None or best[1] > max_km:
+            return None
+        return best
+
+    def shortest_path(self, source: int, target: int) -> Optional[Tuple[float, float]]:
+        """(meters, seconds) of the fastest path, by A*"""
+        if source == target:
+            return 0.0, 0.0
+        target_lat, target_lng = self.lats[target], self.lngs[target]
+
+        def heuristic(node):
+            km = haversine(self.lats[node], self.lngs[node], target_lat, target_lng, DistanceUnit.KM)
+            return km * 1000 / self.top_speed_mps
+
+        best_seconds = {source: 0.0}
+        meters_to = {source: 0.0}
+        frontier = [(heuristic(source), 0.0, source)]
+        while frontier:
+            _, seconds, node = heapq.heappop(frontier)
+            if node == target:
+                return meters_to[node], seconds
+            if seconds > best_seconds[node]:
+                continue  # Stale entry
+            for neighbor, edge_meters, edge_seconds in self.adjacency[node]:
+                candidate = seconds + edge_seconds
+                if candidate < best_seconds.get(neighbor, math.inf):
+                    best_seconds[neighbor] = candidate
+                    meters_to[neighbor] = meters_to[node] + edge_meters
+                    heapq.heappush(frontier, (candidate + heuristic(neighbor), candidate, neighbor))
+        return None
+
+
+class RoutingEngine:
+    def __init__(self, graph: Optional[RoadGraph] = None, cache_size: int = 100_000, cell_deg: float = 0.005,
+                 fallback_speed_mph: float = 30.0, max_snap_km: float = 2.0):
+        self.graph = graph
+        self.cache_size = cache_size
+        self.cell_deg = cell_deg
+        self.fallback_speed_mph = fallback_speed_mph
+        self.max_snap_km = max_snap_km
+        self._cache: "OrderedDict[Tuple[int, int, int, int], Route]" = OrderedDict()
+        self._lock = threading.Lock()  # route() runs in worker threads while cached() runs on the event loop
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        self.total_route_ms = 0.0
+
+    def load(self, path: str) -> int:
+        started = time.perf_counter()
+        graph = RoadGraph.load(path)
+        with self._lock:
+            self.graph = graph
+            self._cache.clear()
+        logger.info(
+            f"Road graph {path}: {len(self.graph)} nodes, {self.graph.edge_count} edges "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+        return len(self.graph)
+
+    def _key(self, lat1, lng1, lat2, lng2):
+        size = self.cell_deg
+        return (math.floor(lat1 / size), math.floor(lng1 / size), math.floor(lat2 / size), math.floor(lng2 / size))
+
+    def _straight_line(self, lat1, lng1, lat2, lng2) -> Route:
+        miles = haversine(lat1, lng1, lat2, lng2, DistanceUnit.MILES)
+        return Route(miles, miles / self.fallback_speed_mph, "haversine")
+
+    def _road(self, lat1, lng1, lat2, lng2) -> Optional[Route]:
+        start = self.graph.snap(lat1, lng1, self.max_snap_km)
+        end = self.graph.snap(lat2, lng2, self.max_snap_km)
+        if start is None or end is None:
+            return None
+        path = self.graph.shortest_path(start[0], end[0])
+        if path is None:
+            return None
+        meters, seconds = path
+        # Getting on and off the network is priced as straight-line driving at the fallback speed
+        access_miles = (start[1] + end[1]) / KM_PER_MILE
+        miles = meters / 1000 / KM_PER_MILE + access_miles
+        hours = seconds / 3600 + access_miles / self.fallback_speed_mph
+        return Route(miles, hours, "road")
+
+    def cached(self, lat1: float, lng1: float, lat2: float, lng2: float) -> Optional[Route]:
+        """A route answerable without a graph search, or None (callers may then search off the event loop)"""
+        if self.graph is None:
+            return self._straight_line(lat1, lng1, lat2, lng2)
+
+        key = self._key(lat1, lng1, lat2, lng2)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self.hits += 1
+                self._cache.move_to_end(key)
+        return cached
+
+    def route(self, lat1: float, lng1: float, lat2: float, lng2: float) -> Route:
+        cached = self.cached(lat1, lng1, lat2, lng2)
+        if cached is not None:
+            return cached
+
+        key = self._key(lat1, lng1, lat2, lng2)
+        started = time.perf_counter()
+        result = self._road(lat1, lng1, lat2, lng2)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if result is None:
+            result = self._straight_line(lat1, lng1, lat2, lng2)
+
+        with self._lock:
+            self.misses += 1
+            self.total_route_ms += elapsed_ms
+            if result.source != "road":
+                self.fallbacks += 1
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def routes(self, lats1, lngs1, lats2, lngs2) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(miles, hours, billable hours) arrays for many legs; one vectorized pass when there is no graph"""
+        if self.graph is None:
+            miles = haversine_pairs(lats1, lngs1, lats2, lngs2, DistanceUnit.MILES)
+            return miles, miles / self.fallback_speed_mph, np.zeros_like(miles)
+        legs = [self.route(*leg) for leg in zip(lats1, lngs1, lats2, lngs2)]
+        return (
+            np.array([leg.distance_miles for leg in legs]),
+            np.array([leg.duration_hours for leg in legs]),
+            np.array([leg.billable_hours for leg in legs]),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cached_routes = len(self._cache)
+        return {
+            "graph_nodes": len(self.graph) if self.graph else 0,
+            "cached_routes": cached_routes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "fallbacks": self.fallbacks,
+            "avg_route_ms": round(self.total_route_ms / self.misses, 3) if self.misses else None,
+        }
+
+
+def main() -> int:
+    if len(sys.argv) != 3:
+        print("Usage: python routing.py <extract.osm[.gz]> <graph.json[.gz]>")
+        return 2
+    graph = RoadGraph.load(sys.argv[1])
+    graph.save(sys.argv[2])
+    print(f"{len(graph)} nodes, {graph.edge_count} edges -> {sys.argv[2]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
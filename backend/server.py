@@ -1,20 +1,53 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Request
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Request, Response, Query, WebSocket, WebSocketDisconnect
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
+import asyncio
 import os
+import json
+import time
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
 from typing import List, Optional, Dict, Any
 import uuid
 from enum import Enum
-import math
+import numpy as np
+
+from auth_epochs import AuthEpochs
+from batch_dispatch import BatchDispatcher
+from db_indexes import ensure_indexes
+from dispatch import DispatchEngine
+from driver_index import DriverIndex
+from driver_push import DriverEvent, DriverPushHub
+from driver_search import create_driver_search
+from driver_sync import DriverStateSync
+from driver_tracking import END, DriverTracker
+from event_bus import (
+    DriverNotified, DriverPricingChanged, OfferClosed, PricingConfigChanged, RequestClosed, UserChanged, create_event_bus
+)
+from geo import DistanceUnit, haversine, haversine_many
+from location_history import LocationHistory, epoch_ms, from_epoch_ms, track_miles
+from location_ingest import LocationIngestor
+from offer_expiry import OfferExpiryScheduler
+from pagination import KEYSET_SORT, InvalidCursor, encode_cursor, keyset_filter
+from password_hasher import PasswordHasher, PasswordHasherBusy
+from pricing_cache import PricingCache
+from response_cache import CachedResponse, ResponseCache, etag_matches
+from routing import RoutingEngine
+from transitions import (
+    DRIVER_ABORT_MISSION, DRIVER_START_MISSION, OFFER_ACCEPT, OFFER_REJECT, REQUEST_ACCEPT, REQUEST_ACCEPT_OFFER,
+    REQUEST_EXPIRE_OFFER, REQUEST_REASSIGN, REQUEST_REJECT_COUNTER, REQUEST_RELEASE, REQUEST_REOPEN_OFFER,
+    apply_transition
+)
+from user_cache import UserCache
 
 
 ROOT_DIR = Path(__file__).parent
@@ -25,12 +58,149 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# In-process spatial index of dispatchable drivers, warmed on startup
+driver_index = DriverIndex(cell_size_deg=float(os.environ.get("DRIVER_INDEX_CELL_DEG", "0.25")))
+
+# Every GPS ping, delta-encoded into one document per driver per time bucket
+location_history = LocationHistory(
+    db,
+    bucket_seconds=int(os.environ.get("LOCATION_HISTORY_BUCKET_SECONDS", "3600")),
+    flush_interval=float(os.environ.get("LOCATION_HISTORY_FLUSH_SECONDS", "30")),
+    retention_days=float(os.environ.get("LOCATION_HISTORY_RETENTION_DAYS", "90")),
+    thin_after_days=float(os.environ.get("LOCATION_HISTORY_THIN_AFTER_DAYS", "7")),
+    thin_seconds=int(os.environ.get("LOCATION_HISTORY_THIN_SECONDS", "30"))
+)
+
+# Driver GPS pings are coalesced in memory and flushed to Mongo in bulk
+location_ingestor = LocationIngestor(
+    db,
+    flush_interval=float(os.environ.get("LOCATION_FLUSH_INTERVAL_SECONDS", "1.0")),
+    max_batch=int(os.environ.get("LOCATION_FLUSH_MAX_BATCH", "500")),
+    max_pending=int(os.environ.get("LOCATION_MAX_PENDING", "50000")),
+    history=location_history
+)
+
+# Assigned driver's position streamed to everyone watching a request, one channel per request
+driver_tracker = DriverTracker(min_interval=float(os.environ.get("TRACKING_MIN_INTERVAL_SECONDS", "2")))
+TRACKING_KEEPALIVE_SECONDS = 15
+
+# Dispatchable drivers, kept current across workers by a change stream on
+# users/driver_profiles ("polling" reloads instead, for standalone Mongo)
+driver_state = DriverStateSync(
+    db,
+    driver_index,
+    overlay=location_ingestor.overlay,
+    poll_interval=float(os.environ.get("DRIVER_STATE_POLL_SECONDS", "5")),
+    mode=os.environ.get("DRIVER_STATE_SYNC", "auto"),
+    on_move=driver_tracker.publish,
+    on_change=lambda user_id: response_cache.invalidate(("driver_profile", user_id))
+)
+
+# Connected driver sockets for job/offer push events
+driver_push = DriverPushHub()
+
+# Advances requests whose offer_expires_at passes without an answer
+offer_expiry = OfferExpiryScheduler(on_expire=lambda tow_request_id: expire_offer(tow_request_id))
+
+# Driver proximity engine: "index" (in-process grid) or "geonear" (Mongo 2dsphere)
+DRIVER_SEARCH_ENGINE = os.environ.get("DRIVER_SEARCH_ENGINE", "index")
+driver_search = create_driver_search(DRIVER_SEARCH_ENGINE, db, driver_index)
+
+# Picks the driver each new offer goes to, honoring tow company auto_assign_policy
+dispatch = DispatchEngine(
+    driver_search,
+    refresh_interval=float(os.environ.get("DISPATCH_POLICY_REFRESH_SECONDS", "60"))
+)
+# Drivers ranked per tow request up front; rejections and expiries walk this list
+DISPATCH_CANDIDATES = int(os.environ.get("DISPATCH_CANDIDATES", "20"))
+
+# Periodic min-cost matching of unassigned requests; 0 keeps greedy dispatch at creation time
+BATCH_DISPATCH_INTERVAL_SECONDS = float(os.environ.get("BATCH_DISPATCH_INTERVAL_SECONDS", "0"))
+batch_dispatcher = BatchDispatcher(
+    db,
+    driver_search,
+    dispatch,
+    quote=lambda request, driver_id: calculate_tow_price(
+        request["pickup_lat"], request["pickup_lng"], request["dropoff_lat"], request["dropoff_lng"], driver_id
+    ),
+    on_assigned=lambda request, candidate, price: offer_batch_assignment(request, candidate, price),
+    interval=BATCH_DISPATCH_INTERVAL_SECONDS,
+    max_requests=int(os.environ.get("BATCH_DISPATCH_MAX_REQUESTS", "50"))
+) if BATCH_DISPATCH_INTERVAL_SECONDS > 0 else None
+
+# Road distance/duration for quotes: A* over ROAD_GRAPH_PATH with an LRU of snapped
+# origin/destination cells; straight-line miles at the fallback speed without a graph
+ROAD_GRAPH_PATH = os.environ.get("ROAD_GRAPH_PATH")
+routing = RoutingEngine(
+    cache_size=int(os.environ.get("ROUTE_CACHE_SIZE", "100000")),
+    cell_deg=float(os.environ.get("ROUTE_CACHE_CELL_DEG", "0.005")),
+    fallback_speed_mph=float(os.environ.get("ROUTE_FALLBACK_SPEED_MPH", "30"))
+)
+
+# Pricing config and per-driver rates, invalidated by the pricing endpoints
+pricing_cache = PricingCache(db, ttl_seconds=float(os.environ.get("PRICING_CACHE_TTL_SECONDS", "60")))
+
 # Security
 SECRET_KEY = os.environ.get("SECRET_KEY", "towfleets-secret-key-change-in-production-2024")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
+# Tokens for ?token= on socket/stream URLs, which end up in access logs: short-lived and unusable as bearer tokens
+STREAM_TOKEN_PURPOSE = "stream"
+STREAM_TOKEN_EXPIRE_SECONDS = int(os.environ.get("STREAM_TOKEN_EXPIRE_SECONDS", "60"))
+# "lookup": tokens carry the user id only and every request resolves the stored user (cached);
+# "claims": tokens also carry role/approval/epoch so authenticating skips the lookup (opt-in)
+AUTH_TOKEN_FORMAT = os.environ.get("AUTH_TOKEN_FORMAT", "lookup")
+auth_epochs = AuthEpochs(db, refresh_interval=float(os.environ.get("AUTH_EPOCH_REFRESH_SECONDS", "30")))
+
+# GET /api/tow-requests page sizes
+TOW_REQUESTS_PAGE_SIZE = int(os.environ.get("TOW_REQUESTS_PAGE_SIZE", "100"))
+TOW_REQUESTS_MAX_PAGE_SIZE = 1000
+
+# Longest window one GET /api/drivers/{id}/location-history call may span
+LOCATION_HISTORY_MAX_HOURS = 24
+
+# Batch quotes are priced and streamed back this many legs at a time
+QUOTE_STREAM_CHUNK = int(os.environ.get("QUOTE_STREAM_CHUNK", "50"))
+
+# Authenticated users by id, so each API call doesn't cost a users lookup
+user_cache = UserCache(
+    max_entries=int(os.environ.get("USER_CACHE_MAX_ENTRIES", "10000")),
+    ttl_seconds=float(os.environ.get("USER_CACHE_TTL_SECONDS", "60"))
+)
+
+# Serialized bodies and ETags of the polled GET endpoints; writers invalidate their entries
+response_cache = ResponseCache(
+    max_entries=int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "10000")),
+    ttl_seconds=float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", "30"))
+)
+
+# Principals of recently verified claims tokens, so repeat calls skip the signature check
+claims_cache = UserCache(
+    max_entries=int(os.environ.get("CLAIMS_CACHE_MAX_ENTRIES", "10000")),
+    ttl_seconds=float(os.environ.get("CLAIMS_CACHE_TTL_SECONDS", "300"))
+)
+
+# Cache invalidations and driver pushes, replayed on every worker when EVENT_BUS_URL
+# points at Redis; without it events only reach this process
+event_bus = create_event_bus(os.environ.get("EVENT_BUS_URL"))
+event_bus.subscribe(PricingConfigChanged, lambda event: pricing_cache.invalidate_config())
+event_bus.subscribe(PricingConfigChanged, lambda event: response_cache.invalidate(("pricing_config",)))
+event_bus.subscribe(DriverPricingChanged, lambda event: pricing_cache.invalidate_driver(event.driver_user_id))
+event_bus.subscribe(DriverPricingChanged, lambda event: response_cache.invalidate(("driver_pricing", event.driver_user_id)))
+event_bus.subscribe(UserChanged, lambda event: user_cache.invalidate(event.user_id))
+event_bus.subscribe(UserChanged, lambda event: auth_epochs.apply(event.user_id, event.auth_epoch))
+event_bus.subscribe(OfferClosed, lambda event: offer_expiry.cancel(event.tow_request_id))
+event_bus.subscribe(RequestClosed, lambda event: driver_tracker.close(event.tow_request_id))
+event_bus.subscribe(DriverNotified, lambda event: driver_push.publish(
+    event.driver_id, event.event, event.tow_request_id, **event.data
+))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hasher = PasswordHasher(
+    pwd_context,
+    max_workers=int(os.environ.get("PASSWORD_HASH_WORKERS", "4")),
+    max_queue=int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", "256"))
+)
 security = HTTPBearer()
 
 # Create the main app without a prefix
@@ -127,6 +297,11 @@ class Token(BaseModel):
     user: User
 
 
+class StreamToken(BaseModel):
+    stream_token: str
+    expires_in: int  # Seconds
+
+
 class TowRequest(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     client_id: str
@@ -150,12 +325,37 @@ class TowRequest(BaseModel):
     driver_location_lat: Optional[float] = None
     driver_location_lng: Optional[float] = None
     notes: Optional[str] = None
-    negotiation_status: str = "awaiting_driver"  # awaiting_driver, negotiating, price_agreed, expired
+    negotiation_status: str = "awaiting_driver"  # awaiting_dispatch, awaiting_driver, negotiating, price_agreed, expired
     offer_expires_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
+class TowRequestSummary(BaseModel):
+    """Listing view of a tow request (view=summary)"""
+    id: str
+    client_id: str
+    pickup_address: str
+    dropoff_address: str
+    status: TowRequestStatus
+    negotiation_status: str
+    current_driver_id: Optional[str] = None
+    assigned_driver_id: Optional[str] = None
+    distance_miles: Optional[float] = None
+    calculated_price: Optional[float] = None
+    final_agreed_price: Optional[float] = None
+    created_at: datetime
+
+
+class UserSummary(BaseModel):
+    """Listing view of a user (view=summary)"""
+    id: str
+    email: EmailStr
+    full_name: str
+    role: UserRole
+    created_at: datetime
+
+
 class TowRequestCreate(BaseModel):
     pickup_address: str
     pickup_lat: float
@@ -185,6 +385,18 @@ class PricingConfigUpdate(BaseModel):
     pickup_fee: Optional[float] = None
 
 
+class QuoteLeg(BaseModel):
+    pickup_lat: float
+    pickup_lng: float
+    dropoff_lat: float
+    dropoff_lng: float
+    reference: Optional[str] = None  # Caller's identifier (e.g. VIN), echoed back
+
+
+class BatchQuoteRequest(BaseModel):
+    quotes: List[QuoteLeg] = Field(..., min_length=1, max_length=500)
+
+
 class TowRequestUpdate(BaseModel):
     status: Optional[TowRequestStatus] = None
     assigned_driver_id: Optional[str] = None
@@ -238,109 +450,109 @@ class TowCompanyProfile(BaseModel):
 
 
 # Helper functions
-def calculate_distance(lat1, lng1, lat2, lng2):
-    """Calculate distance between two coordinates using Haversine formula (in km)"""
-    R = 6371  # Earth's radius in kilometers
-    
-    lat1_rad = math.radians(lat1)
-    lng1_rad = math.radians(lng1)
-    lat2_rad = math.radians(lat2)
-    lng2_rad = math.radians(lng2)
-    
-    dlat = lat2_rad - lat1_rad
-    dlng = lng2_rad - lng1_rad
-    
-    a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlng/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    
-    return R * c  # Distance in kilometers
+def projection_for(model) -> Dict[str, int]:
+    """Mongo projection fetching only the fields a response model declares"""
+    return {"_id": 0, **{field: 1 for field in model.model_fields}}
 
 
-def calculate_distance(lat1, lng1, lat2, lng2):
-    """Calculate distance between two coordinates using Haversine formula (in km)"""
-    R = 6371  # Earth's radius in kilometers
-    
-    lat1_rad = math.radians(lat1)
-    lng1_rad = math.radians(lng1)
-    lat2_rad = math.radians(lat2)
-    lng2_rad = math.radians(lng2)
-    
-    dlat = lat2_rad - lat1_rad
-    dlng = lng2_rad - lng1_rad
-    
-    a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlng/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    
-    distance_km = R * c
-    distance_miles = distance_km * 0.621371  # Convert to miles
-    return distance_miles
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def cached_json_response(http_request: Request, entry: CachedResponse) -> Response:
+    """Serve a cached body, or a bare 304 when the client already holds this version"""
+    headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(http_request.headers.get("if-none-match"), entry.etag):
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+def summary_response(documents) -> Response:
+    """Projected documents are already summary-shaped; skip per-document model validation"""
+    return Response(content=json.dumps(documents, default=_json_default), media_type="application/json")
 
 
 async def calculate_tow_price(pickup_lat, pickup_lng, dropoff_lat, dropoff_lng, driver_user_id=None):
     """Calculate tow price based on distance and driver/admin pricing"""
     
-    # Calculate distance in miles
-    distance_miles = calculate_distance(pickup_lat, pickup_lng, dropoff_lat, dropoff_lng)
+    # Road distance and drive time; a cache miss runs the graph search off the event loop
+    route = routing.cached(pickup_lat, pickup_lng, dropoff_lat, dropoff_lng)
+    if route is None:
+        route = await asyncio.to_thread(routing.route, pickup_lat, pickup_lng, dropoff_lat, dropoff_lng)
     
-    # Get pricing configuration
-    if driver_user_id:
-        # Try to get driver's custom pricing first
-        driver_pricing = await db.driver_pricing.find_one({"driver_user_id": driver_user_id})
-        
-        if driver_pricing and not driver_pricing.get("is_using_base_pricing", True):
-            price_per_mile = driver_pricing["price_per_mile"]
-            pickup_fee = driver_pricing["pickup_fee"]
-        else:
-            # Use base admin pricing
-            pricing_config = await db.pricing_config.find_one({}, sort=[("created_at", -1)])
-            if pricing_config:
-                price_per_mile = pricing_config["price_per_mile"]
-                pickup_fee = pricing_config["pickup_fee"]
-            else:
-                # Default pricing if no config exists
-                price_per_mile = 2.50
-                pickup_fee = 25.00
-    else:
-        # Use base admin pricing for general calculations
-        pricing_config = await db.pricing_config.find_one({}, sort=[("created_at", -1)])
-        if pricing_config:
-            price_per_mile = pricing_config["price_per_mile"]
-            pickup_fee = pricing_config["pickup_fee"]
-        else:
-            price_per_mile = 2.50
-            pickup_fee = 25.00
+    # Driver's custom pricing if set, otherwise admin base pricing (cached)
+    rates = await pricing_cache.rates_for(driver_user_id)
+    price_per_mile = rates["price_per_mile"]
+    price_per_hour = rates["price_per_hour"]
+    pickup_fee = rates["pickup_fee"]
     
-    # Calculate total price: pickup fee + (distance * price per mile)
-    total_price = pickup_fee + (distance_miles * price_per_mile)
+    # Calculate total price: pickup fee + (distance * price per mile) + (drive time * price per hour),
+    # where drive time is only charged when it comes from a road route rather than a straight-line guess
+    total_price = pickup_fee + (route.distance_miles * price_per_mile) + (route.billable_hours * price_per_hour)
     
     return {
-        "distance_miles": round(distance_miles, 2),
+        "distance_miles": round(route.distance_miles, 2),
+        "duration_hours": round(route.duration_hours, 2),
         "price_per_mile": price_per_mile,
+        "price_per_hour": price_per_hour,
         "pickup_fee": pickup_fee,
         "total_price": round(total_price, 2)
     }
 
 
-async def find_nearest_available_driver(pickup_lat, pickup_lng):
-    """Find the nearest available driver"""
-    available_drivers = await find_nearby_available_drivers(pickup_lat, pickup_lng, max_distance_km=80)
-    
-    if available_drivers:
-        return available_drivers[0]  # Return closest driver
-    return None
+async def notify_driver(driver_id, event, tow_request_id, **data):
+    """Push an event to a driver's sockets, on whichever worker holds them"""
+    if driver_id:
+        await event_bus.publish(DriverNotified(driver_id, event, tow_request_id, data))
+
+
+async def rank_candidate_drivers(pickup_lat, pickup_lng):
+    """Drivers allowed to take a job at this pickup, in the order offers should go out"""
+    return await dispatch.candidates(pickup_lat, pickup_lng, max_radius_km=80, limit=DISPATCH_CANDIDATES)
+
+
+def listed_candidate(user_id, request):
+    """Revalidate a listed driver against the live index; None once they stopped being dispatchable"""
+    entry = driver_index.get(user_id)
+    if not entry or not dispatch.auto_dispatchable(entry.profile):
+        return None
+    distance = haversine(entry.lat, entry.lng, request["pickup_lat"], request["pickup_lng"], DistanceUnit.KM)
+    return {"driver": entry.driver, "profile": entry.profile, "distance_km": round(distance, 2)}
+
+
+LOST_RACE = object()  # move_to_next_driver: the request was accepted, released or moved on by another caller
 
 
 async def move_to_next_driver(tow_request_id):
-    """Move tow request to the next available driver"""
+    """Move tow request to the next driver on its candidate list; None when nobody is left to offer it to"""
     request = await db.tow_requests.find_one({"id": tow_request_id})
     if not request:
-        return None
-    
-    # Find next available driver
-    next_driver = await find_nearest_available_driver(
-        request["pickup_lat"], 
-        request["pickup_lng"]
-    )
+        return LOST_RACE
+    
+    previous_driver_id = request.get("current_driver_id")
+    candidate_ids = request.get("candidate_driver_ids") or []
+    cursor = request.get("candidate_cursor", len(candidate_ids))
+    
+    # Drivers before the cursor were already offered the job, so nobody gets it twice
+    next_driver = None
+    while next_driver is None and cursor < len(candidate_ids):
+        next_driver = listed_candidate(candidate_ids[cursor], request)
+        cursor += 1
+    
+    if next_driver is None:
+        # List exhausted: rank again, leaving out every driver already offered the job
+        offered = set(candidate_ids) | {previous_driver_id}
+        fresh = [
+            candidate for candidate in await rank_candidate_drivers(request["pickup_lat"], request["pickup_lng"])
+            if candidate["driver"]["id"] not in offered
+        ]
+        if fresh:
+            next_driver = fresh[0]
+            candidate_ids = candidate_ids + [candidate["driver"]["id"] for candidate in fresh]
+            cursor = candidate_ids.index(next_driver["driver"]["id"]) + 1
     
     if next_driver:
         # Calculate price for this driver
@@ -353,16 +565,33 @@ async def move_to_next_driver(tow_request_id):
         )
         
         # Update request with new driver and calculated price
-        await db.tow_requests.update_one(
-            {"id": tow_request_id},
-            {"$set": {
-                "current_driver_id": next_driver["driver"]["id"],
-                "calculated_price": price_calc["total_price"],
-                "distance_miles": price_calc["distance_miles"],
-                "negotiation_status": "awaiting_driver",
-                "offer_expires_at": datetime.now(timezone.utc) + timedelta(minutes=5),
-                "updated_at": datetime.now(timezone.utc)
-            }}
+        offer_expires_at = datetime.now(timezone.utc) + timedelta(minutes=5)
+        reassigned = await apply_transition(
+            db,
+            REQUEST_REASSIGN,
+            {"id": tow_request_id, "current_driver_id": previous_driver_id},
+            current_driver_id=next_driver["driver"]["id"],
+            candidate_driver_ids=candidate_ids,
+            candidate_cursor=cursor,
+            calculated_price=price_calc["total_price"],
+            distance_miles=price_calc["distance_miles"],
+            estimated_duration_hours=price_calc["duration_hours"],
+            offer_expires_at=offer_expires_at,
+            updated_at=datetime.now(timezone.utc)
+        )
+        if not reassigned:
+            return LOST_RACE  # Accepted, cancelled or moved on while the next driver was being picked
+        dispatch.offered(next_driver)
+        offer_expiry.schedule(tow_request_id, offer_expires_at)
+        
+        if previous_driver_id and previous_driver_id != next_driver["driver"]["id"]:
+            await notify_driver(previous_driver_id, DriverEvent.EXPIRY, tow_request_id)
+        await notify_driver(
+            next_driver["driver"]["id"],
+            DriverEvent.ASSIGNMENT,
+            tow_request_id,
+            calculated_price=price_calc["total_price"],
+            distance_km=next_driver["distance_km"]
         )
         
         return next_driver
@@ -370,50 +599,88 @@ async def move_to_next_driver(tow_request_id):
     return None
 
 
-async def find_nearby_available_drivers(pickup_lat, pickup_lng, max_distance_km=50):
-    """Find available drivers within specified distance"""
-    available_drivers = []
+async def offer_batch_assignment(request, candidate, price):
+    """Notify a driver of an offer written by the batch dispatcher"""
+    dispatch.offered(candidate)
+    offer_expiry.schedule(request["id"], request["offer_expires_at"])
+    await notify_driver(
+        candidate["driver"]["id"],
+        DriverEvent.ASSIGNMENT,
+        request["id"],
+        calculated_price=price["total_price"],
+        distance_km=candidate["distance_km"]
+    )
+
+
+async def expire_offer(tow_request_id):
+    """Offer window closed without agreement: expire open offers and move to the next driver"""
+    now = datetime.now(timezone.utc)
     
-    # Get all drivers who are available and approved
-    drivers = await db.users.find({
-        "role": "driver",
-        "is_approved": True,
-        "is_active": True
-    }).to_list(1000)
+    # Claim the expiry atomically so only one worker acts on it
+    request = await apply_transition(
+        db,
+        REQUEST_EXPIRE_OFFER,
+        {"id": tow_request_id, "offer_expires_at": {"$lte": now}},
+        updated_at=now
+    )
+    if not request:
+        return None  # Accepted, rejected or reassigned in the meantime
     
-    for driver in drivers:
-        # Get driver profile to check status and location
-        profile = await db.driver_profiles.find_one({"user_id": driver["id"]})
-        
-        if (profile and 
-            profile.get("status") == "available" and 
-            profile.get("current_location_lat") and 
-            profile.get("current_location_lng")):
-            
-            distance = calculate_distance(
-                pickup_lat, pickup_lng,
-                profile["current_location_lat"], 
-                profile["current_location_lng"]
-            )
-            
-            if distance <= max_distance_km:
-                available_drivers.append({
-                    "driver": driver,
-                    "profile": profile,
-                    "distance_km": round(distance, 2)
-                })
+    try:
+        await db.price_offers.update_many(
+            {"tow_request_id": tow_request_id, "status": "pending"},
+            {"$set": {"status": "expired"}}
+        )
+        next_driver = await move_to_next_driver(tow_request_id)
+    except Exception:
+        # Without a release the request would stay expired, pinned to this driver and without a timer;
+        # released, the batch dispatcher (or a re-rank) picks it up again
+        logger.exception(f"Moving expired request {tow_request_id} to the next driver failed, releasing it")
+        next_driver = None
+    
+    if next_driver is LOST_RACE:
+        return None
+    if not next_driver:
+        released = await apply_transition(
+            db,
+            REQUEST_RELEASE,
+            {"id": tow_request_id, "current_driver_id": request.get("current_driver_id")},
+            updated_at=datetime.now(timezone.utc)
+        )
+        if released:
+            await notify_driver(request.get("current_driver_id"), DriverEvent.EXPIRY, tow_request_id)
     
-    # Sort by distance (closest first)
-    available_drivers.sort(key=lambda x: x["distance_km"])
-    return available_drivers
+    return next_driver
 
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def fetch_latest_offers(tow_request_ids):
+    """Most recent price offer per tow request, keyed by request id"""
+    if not tow_request_ids:
+        return {}
+    
+    # Sorting on the (tow_request_id, created_at desc) index lets $group/$first read one entry per request
+    latest = await db.price_offers.aggregate([
+        {"$match": {"tow_request_id": {"$in": tow_request_ids}}},
+        {"$sort": {"tow_request_id": 1, "created_at": -1}},
+        {"$group": {"_id": "$tow_request_id", "offer": {"$first": "$$ROOT"}}},
+        {"$project": {"offer._id": 0}}
+    ]).to_list(None)
+    
+    return {row["_id"]: row["offer"] for row in latest}
 
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def verify_password(plain_password, hashed_password):
+    try:
+        return await password_hasher.verify(plain_password, hashed_password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
+
+
+async def get_password_hash(password):
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -427,25 +694,87 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def token_claims(user: Dict[str, Any]) -> Dict[str, Any]:
+    """Token payload for a user document; with AUTH_TOKEN_FORMAT=claims it describes the principal too"""
+    claims = {"sub": user["id"]}
+    if AUTH_TOKEN_FORMAT == "claims":
+        claims.update({
+            "role": user["role"],
+            "email": user["email"],
+            "name": user["full_name"],
+            "approved": user.get("is_approved", True),
+            "active": user.get("is_active", True),
+            "epoch": auth_epochs.current(user["id"]),
+        })
+    return claims
+
+
+def user_from_claims(payload: Dict[str, Any]) -> Optional[User]:
+    """The principal a claims token describes, if its epoch is still current"""
+    if AUTH_TOKEN_FORMAT != "claims" or "epoch" not in payload:
+        return None
+    if not auth_epochs.trusts(payload["sub"], payload["epoch"]):
+        return None
+    # Signed by us and the epoch is current: skip model validation
+    return User.model_construct(
+        id=payload["sub"],
+        email=payload["email"],
+        full_name=payload["name"],
+        role=UserRole(payload["role"]),
+        is_approved=payload["approved"],
+        is_active=payload["active"],
+    )
+
+
+async def get_user_from_token(token: str, use_claims: bool = True, purpose: Optional[str] = None) -> User:
+    """The user a token authenticates; purpose-bound tokens only pass where that purpose is asked for"""
+    if use_claims and purpose is None:
+        verified = claims_cache.get(token)
+        if verified is not None:
+            epoch, expires_at, claimed_user = verified
+            if expires_at > time.time() and auth_epochs.trusts(claimed_user.id, epoch):
+                return claimed_user
+            claims_cache.invalidate(token)
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
-        if user_id is None:
+        if user_id is None or payload.get("purpose") != purpose:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
+    if use_claims and purpose is None:
+        claimed_user = user_from_claims(payload)
+        if claimed_user is not None:
+            claims_cache.put(token, (payload["epoch"], payload["exp"], claimed_user))
+            return claimed_user
+    
+    cached_user = user_cache.get(user_id)
+    if cached_user is not None:
+        return cached_user
+    
     user = await db.users.find_one({"id": user_id})
     if user is None:
         raise credentials_exception
-    return User(**user)
+    
+    current_user = User(**user)
+    user_cache.put(user_id, current_user)
+    return current_user
+
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await get_user_from_token(credentials.credentials)
+
+
+async def get_current_user_record(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Like get_current_user, but always the full stored user (claims omit phone and timestamps)"""
+    return await get_user_from_token(credentials.credentials, use_claims=False)
 
 
 # Authentication endpoints
@@ -457,7 +786,7 @@ async def register(user_data: UserCreate):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Hash password
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash(user_data.password)
     
     # Create user dict with hashed password
     user_dict = user_data.dict(exclude={"password"})
@@ -506,7 +835,7 @@ async def login(user_data: UserLogin):
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    if not verify_password(user_data.password, user["hashed_password"]):
+    if not await verify_password(user_data.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -521,7 +850,7 @@ async def login(user_data: UserLogin):
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user["id"]}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
     
     return Token(
@@ -532,10 +861,78 @@ async def login(user_data: UserLogin):
 
 
 @api_router.get("/auth/me", response_model=User)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: User = Depends(get_current_user_record)):
     return current_user
 
 
+@api_router.post("/auth/stream-token", response_model=StreamToken)
+async def create_stream_token(current_user: User = Depends(get_current_user)):
+    """Short-lived token for the ?token= of /ws/driver and /tow-requests/{id}/track; fetch a new one per connection"""
+    stream_token = create_access_token(
+        data={"sub": current_user.id, "purpose": STREAM_TOKEN_PURPOSE},
+        expires_delta=timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS)
+    )
+    return StreamToken(stream_token=stream_token, expires_in=STREAM_TOKEN_EXPIRE_SECONDS)
+
+
+# Quote endpoints
+@api_router.post("/quotes/batch")
+async def batch_quotes(
+    batch: BatchQuoteRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Price many pickup/dropoff pairs at once, streamed back as NDJSON"""
+    if current_user.role not in [UserRole.CLIENT, UserRole.DEALER]:
+        raise HTTPException(status_code=403, detail="Only clients and dealers can request quotes")
+    
+    legs = batch.quotes
+    
+    # Single driver snapshot: the index is not touched by anything else until we await
+    nearest = [driver_index.nearest(leg.pickup_lat, leg.pickup_lng, k=1, max_radius_km=80) for leg in legs]
+    driver_ids = [matches[0][0].user_id if matches else None for matches in nearest]
+    driver_distances = [round(matches[0][1], 2) if matches else None for matches in nearest]
+    
+    # Single pricing fetch: base config once, then each distinct driver's rates
+    rates_by_driver = {None: await pricing_cache.rates_for(None)}
+    for driver_id in set(driver_ids) - {None}:
+        rates_by_driver[driver_id] = await pricing_cache.rates_for(driver_id)
+    
+    async def quote_lines():
+        for start in range(0, len(legs), QUOTE_STREAM_CHUNK):
+            chunk = legs[start:start + QUOTE_STREAM_CHUNK]
+            chunk_drivers = driver_ids[start:start + QUOTE_STREAM_CHUNK]
+            
+            # Graph searches for uncached legs run off the event loop
+            distances_miles, durations_hours, billable_hours = await asyncio.to_thread(
+                routing.routes,
+                [leg.pickup_lat for leg in chunk],
+                [leg.pickup_lng for leg in chunk],
+                [leg.dropoff_lat for leg in chunk],
+                [leg.dropoff_lng for leg in chunk]
+            )
+            price_per_mile = np.array([rates_by_driver[d]["price_per_mile"] for d in chunk_drivers])
+            price_per_hour = np.array([rates_by_driver[d]["price_per_hour"] for d in chunk_drivers])
+            pickup_fee = np.array([rates_by_driver[d]["pickup_fee"] for d in chunk_drivers])
+            total_price = pickup_fee + distances_miles * price_per_mile + billable_hours * price_per_hour
+            
+            for offset, leg in enumerate(chunk):
+                i = start + offset
+                yield json.dumps({
+                    "index": i,
+                    "reference": leg.reference,
+                    "distance_miles": round(float(distances_miles[offset]), 2),
+                    "duration_hours": round(float(durations_hours[offset]), 2),
+                    "price_per_mile": float(price_per_mile[offset]),
+                    "price_per_hour": float(price_per_hour[offset]),
+                    "pickup_fee": float(pickup_fee[offset]),
+                    "total_price": round(float(total_price[offset]), 2),
+                    "driver_id": driver_ids[i],
+                    "driver_distance_km": driver_distances[i]
+                }) + "\n"
+    
+    return StreamingResponse(quote_lines(), media_type="application/x-ndjson")
+
+
 # Tow Request endpoints
 @api_router.post("/tow-requests", response_model=TowRequest)
 async def create_tow_request(
@@ -545,11 +942,10 @@ async def create_tow_request(
     if current_user.role not in [UserRole.CLIENT, UserRole.DEALER]:
         raise HTTPException(status_code=403, detail="Only clients and dealers can create tow requests")
     
-    # Calculate distance and find nearest driver
-    nearest_driver = await find_nearest_available_driver(
-        request_data.pickup_lat, 
-        request_data.pickup_lng
-    )
+    # Rank candidate drivers once; the first gets the offer, rejections and expiries move down the list.
+    # With batch dispatch on, the first offer waits for the next matching round instead.
+    candidates = await rank_candidate_drivers(request_data.pickup_lat, request_data.pickup_lng)
+    nearest_driver = candidates[0] if candidates and not batch_dispatcher else None
     
     # Calculate price based on nearest driver or admin pricing
     driver_id = nearest_driver["driver"]["id"] if nearest_driver else None
@@ -565,13 +961,33 @@ async def create_tow_request(
     request_dict = request_data.dict()
     request_dict["client_id"] = current_user.id
     request_dict["distance_miles"] = price_calc["distance_miles"]
+    request_dict["estimated_duration_hours"] = price_calc["duration_hours"]
     request_dict["calculated_price"] = price_calc["total_price"]
     request_dict["current_driver_id"] = driver_id
-    request_dict["negotiation_status"] = "awaiting_driver" if driver_id else "no_drivers_available"
+    if driver_id:
+        request_dict["negotiation_status"] = "awaiting_driver"
+    else:
+        request_dict["negotiation_status"] = "awaiting_dispatch" if batch_dispatcher else "no_drivers_available"
     request_dict["offer_expires_at"] = datetime.now(timezone.utc) + timedelta(minutes=5) if driver_id else None
     
     tow_request = TowRequest(**request_dict)
-    await db.tow_requests.insert_one(tow_request.dict())
+    # The candidate list is stored on the document only, it is never part of a response
+    await db.tow_requests.insert_one({
+        **tow_request.dict(),
+        "candidate_driver_ids": [candidate["driver"]["id"] for candidate in candidates],
+        "candidate_cursor": 1 if driver_id else 0
+    })
+    
+    if driver_id:
+        dispatch.offered(nearest_driver)
+        offer_expiry.schedule(tow_request.id, tow_request.offer_expires_at)
+        await notify_driver(
+            driver_id,
+            DriverEvent.ASSIGNMENT,
+            tow_request.id,
+            calculated_price=tow_request.calculated_price,
+            distance_km=nearest_driver["distance_km"]
+        )
     
     return tow_request
 
@@ -621,7 +1037,18 @@ async def make_price_offer(
     if offer_type == "client_offer":
         update_data["proposed_price"] = offer_data.amount
     
-    await db.tow_requests.update_one({"id": request_id}, {"$set": update_data})
+    # latest_offer_at lets accept-offer pin the offer it read; $max keeps it on the newest of concurrent offers
+    await db.tow_requests.update_one(
+        {"id": request_id},
+        {"$set": update_data, "$max": {"latest_offer_at": offer.created_at}}
+    )
+    
+    await notify_driver(
+        request["current_driver_id"],
+        DriverEvent.OFFER if offer_type == "client_offer" else DriverEvent.COUNTER_OFFER,
+        request_id,
+        amount=offer.amount
+    )
     
     return offer
 
@@ -659,27 +1086,52 @@ async def accept_price_offer(
     else:
         raise HTTPException(status_code=403, detail="Not authorized to accept this offer")
     
-    # Accept the offer and assign the job
-    await db.price_offers.update_one(
-        {"id": latest_offer["id"]}, 
-        {"$set": {"status": "accepted"}}
+    if latest_offer["status"] != "pending":
+        raise HTTPException(status_code=409, detail="Offer is no longer open")
+    
+    driver_id = request["current_driver_id"]
+    
+    # Claim the driver, then the request, then the offer; whichever claim loses undoes the ones before it
+    if not await apply_transition(db, DRIVER_START_MISSION, {"user_id": driver_id}):
+        raise HTTPException(status_code=409, detail="Driver is no longer available")
+    
+    # Pinning latest_offer_at makes the claim lose to a newer offer (None: request predates the field)
+    claimed = await apply_transition(
+        db,
+        REQUEST_ACCEPT_OFFER,
+        {
+            "id": request_id,
+            "current_driver_id": driver_id,
+            "latest_offer_at": {"$in": [latest_offer["created_at"], None]}
+        },
+        assigned_driver_id=driver_id,
+        final_agreed_price=latest_offer["amount"],
+        offer_expires_at=None,
+        updated_at=datetime.now(timezone.utc)
     )
+    if not claimed:
+        await apply_transition(db, DRIVER_ABORT_MISSION, {"user_id": driver_id})
+        raise HTTPException(status_code=409, detail="Offer is no longer open")
+    
+    if not await apply_transition(db, OFFER_ACCEPT, {"id": latest_offer["id"]}):
+        await apply_transition(
+            db,
+            REQUEST_REOPEN_OFFER,
+            {"id": request_id, "assigned_driver_id": driver_id},
+            offer_expires_at=request.get("offer_expires_at"),
+            updated_at=datetime.now(timezone.utc)
+        )
+        await apply_transition(db, DRIVER_ABORT_MISSION, {"user_id": driver_id})
+        raise HTTPException(status_code=409, detail="Offer is no longer open")
     
-    await db.tow_requests.update_one(
-        {"id": request_id},
-        {"$set": {
-            "status": TowRequestStatus.ACCEPTED,
-            "assigned_driver_id": request["current_driver_id"],
-            "final_agreed_price": latest_offer["amount"],
-            "negotiation_status": "price_agreed",
-            "updated_at": datetime.now(timezone.utc)
-        }}
-    )
+    await event_bus.publish(OfferClosed(request_id))
+    driver_state.remove(driver_id)
     
-    # Update driver status
-    await db.driver_profiles.update_one(
-        {"user_id": request["current_driver_id"]},
-        {"$set": {"status": DriverStatus.ON_MISSION}}
+    await notify_driver(
+        driver_id,
+        DriverEvent.OFFER_ACCEPTED,
+        request_id,
+        agreed_price=latest_offer["amount"]
     )
     
     return {"message": "Offer accepted, tow request assigned", "agreed_price": latest_offer["amount"]}
@@ -696,74 +1148,88 @@ async def reject_price_offer(
     if not request:
         raise HTTPException(status_code=404, detail="Tow request not found")
     
+    driver_rejects = current_user.role == UserRole.DRIVER and request["current_driver_id"] == current_user.id
+    client_rejects = (current_user.role in [UserRole.CLIENT, UserRole.DEALER] and
+                      request["client_id"] == current_user.id)
+    if not (driver_rejects or client_rejects):
+        raise HTTPException(status_code=403, detail="Not authorized to reject this offer")
+    
+    if request["status"] != TowRequestStatus.PENDING:
+        raise HTTPException(status_code=400, detail="Request is not pending")
+    
     # Get latest offer
     latest_offer = await db.price_offers.find_one(
         {"tow_request_id": request_id}, 
         sort=[("created_at", -1)]
     )
     
-    if latest_offer:
-        await db.price_offers.update_one(
-            {"id": latest_offer["id"]}, 
-            {"$set": {"status": "rejected"}}
-        )
-    
     # If driver rejects, move to next available driver
-    if (current_user.role == UserRole.DRIVER and 
-        request["current_driver_id"] == current_user.id):
-        
+    if driver_rejects:
         next_driver = await move_to_next_driver(request_id)
+        if next_driver is LOST_RACE:
+            raise HTTPException(status_code=409, detail="Offer is no longer open")
+        
+        if not next_driver:
+            # No more drivers available
+            released = await apply_transition(
+                db,
+                REQUEST_RELEASE,
+                {"id": request_id, "current_driver_id": current_user.id},
+                updated_at=datetime.now(timezone.utc)
+            )
+            if not released:
+                raise HTTPException(status_code=409, detail="Offer is no longer open")
+            await event_bus.publish(OfferClosed(request_id))
+        
+        # The request moved on first, so the offer is only rejected once nobody else acted on it
+        if latest_offer:
+            await apply_transition(db, OFFER_REJECT, {"id": latest_offer["id"]})
         
         if next_driver:
             return {
                 "message": "Offer rejected, moved to next driver", 
                 "next_driver_distance": f"{next_driver['distance_km']} km"
             }
-        else:
-            # No more drivers available
-            await db.tow_requests.update_one(
-                {"id": request_id},
-                {"$set": {
-                    "negotiation_status": "no_drivers_available",
-                    "current_driver_id": None,
-                    "updated_at": datetime.now(timezone.utc)
-                }}
-            )
-            return {"message": "No more drivers available"}
+        return {"message": "No more drivers available"}
     
     # If client rejects driver's counter-offer, driver can make another offer
-    elif (current_user.role in [UserRole.CLIENT, UserRole.DEALER] and 
-          request["client_id"] == current_user.id):
-        
-        await db.tow_requests.update_one(
-            {"id": request_id},
-            {"$set": {
-                "negotiation_status": "awaiting_driver",
-                "updated_at": datetime.now(timezone.utc)
-            }}
-        )
-        return {"message": "Counter-offer rejected, awaiting new driver offer"}
-    
-    else:
-        raise HTTPException(status_code=403, detail="Not authorized to reject this offer")
+    rejected = await apply_transition(
+        db,
+        REQUEST_REJECT_COUNTER,
+        {"id": request_id, "current_driver_id": request["current_driver_id"]},
+        updated_at=datetime.now(timezone.utc)
+    )
+    if not rejected:
+        raise HTTPException(status_code=409, detail="Offer is no longer open")
+    if latest_offer:
+        await apply_transition(db, OFFER_REJECT, {"id": latest_offer["id"]})
+    await notify_driver(request["current_driver_id"], DriverEvent.OFFER_REJECTED, request_id)
+    return {"message": "Counter-offer rejected, awaiting new driver offer"}
 
 
 # Driver Pricing Management
 @api_router.get("/drivers/pricing", response_model=DriverPricing)
-async def get_driver_pricing(current_user: User = Depends(get_current_user)):
+async def get_driver_pricing(http_request: Request, current_user: User = Depends(get_current_user)):
     """Get driver's current pricing configuration"""
     if current_user.role != UserRole.DRIVER:
         raise HTTPException(status_code=403, detail="Only drivers can access pricing")
     
-    pricing = await db.driver_pricing.find_one({"driver_user_id": current_user.id})
-    
-    if not pricing:
-        # Create default pricing for new driver
-        default_pricing = DriverPricing(driver_user_id=current_user.id)
-        await db.driver_pricing.insert_one(default_pricing.dict())
-        return default_pricing
+    entry = response_cache.get(("driver_pricing", current_user.id))
+    if entry is None:
+        pricing = await db.driver_pricing.find_one({"driver_user_id": current_user.id})
+        
+        if not pricing:
+            # Create default pricing for new driver
+            pricing = DriverPricing(driver_user_id=current_user.id)
+            await db.driver_pricing.insert_one(pricing.dict())
+        else:
+            pricing = DriverPricing(**pricing)
+        
+        entry = response_cache.put(
+            ("driver_pricing", current_user.id), pricing.json().encode(), version=pricing.updated_at
+        )
     
-    return DriverPricing(**pricing)
+    return cached_json_response(http_request, entry)
 
 
 @api_router.put("/drivers/pricing", response_model=DriverPricing)
@@ -784,6 +1250,7 @@ async def update_driver_pricing(
         # Create new pricing
         new_pricing = DriverPricing(driver_user_id=current_user.id, **update_dict)
         await db.driver_pricing.insert_one(new_pricing.dict())
+        await event_bus.publish(DriverPricingChanged(current_user.id))
         return new_pricing
     else:
         # Update existing
@@ -792,25 +1259,32 @@ async def update_driver_pricing(
             {"$set": update_dict}
         )
         updated_pricing = await db.driver_pricing.find_one({"driver_user_id": current_user.id})
+        await event_bus.publish(DriverPricingChanged(current_user.id))
         return DriverPricing(**updated_pricing)
 
 
 # Admin Pricing Management  
 @api_router.get("/admin/pricing-config", response_model=PricingConfig)
-async def get_pricing_config(current_user: User = Depends(get_current_user)):
+async def get_pricing_config(http_request: Request, current_user: User = Depends(get_current_user)):
     """Get current admin pricing configuration"""
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    config = await db.pricing_config.find_one({}, sort=[("created_at", -1)])
-    
-    if not config:
-        # Create default config
-        default_config = PricingConfig(updated_by_admin_id=current_user.id)
-        await db.pricing_config.insert_one(default_config.dict())
-        return default_config
+    entry = response_cache.get(("pricing_config",))
+    if entry is None:
+        config = await db.pricing_config.find_one({}, sort=[("created_at", -1)])
+        
+        if not config:
+            # Create default config
+            config = PricingConfig(updated_by_admin_id=current_user.id)
+            await db.pricing_config.insert_one(config.dict())
+        else:
+            config = PricingConfig(**config)
+        
+        # Every update inserts a new config document, so its id is the version
+        entry = response_cache.put(("pricing_config",), config.json().encode(), version=config.id)
     
-    return PricingConfig(**config)
+    return cached_json_response(http_request, entry)
 
 
 @api_router.put("/admin/pricing-config", response_model=PricingConfig)
@@ -830,11 +1304,14 @@ async def update_pricing_config(
     existing = await db.pricing_config.find_one({}, sort=[("created_at", -1)])
     
     if existing:
-        new_config = PricingConfig(**existing, **update_dict)
+        # Carry over current rates; the new version gets its own id and created_at
+        carried = {k: v for k, v in existing.items() if k not in ("_id", "id", "created_at")}
+        new_config = PricingConfig(**{**carried, **update_dict})
     else:
         new_config = PricingConfig(**update_dict)
     
     await db.pricing_config.insert_one(new_config.dict())
+    await event_bus.publish(PricingConfigChanged())
     return new_config
 
 
@@ -867,25 +1344,34 @@ async def get_request_offers(
 @api_router.get("/tow-requests/nearby", response_model=List[Dict])
 async def get_nearby_tow_requests(
     current_user: User = Depends(get_current_user),
-    max_distance: Optional[float] = 50.0
+    max_distance: Optional[float] = 50.0,
+    view: str = Query("full", pattern="^(full|summary)$")
 ):
     """Get tow requests assigned to current driver or awaiting response"""
     if current_user.role != UserRole.DRIVER:
         raise HTTPException(status_code=403, detail="Only drivers can access nearby requests")
     
-    # Get driver's current location
-    driver_profile = await db.driver_profiles.find_one({"user_id": current_user.id})
+    # Get driver's current location (including pings not yet flushed)
+    driver_profile = location_ingestor.overlay(await db.driver_profiles.find_one({"user_id": current_user.id}))
     if not driver_profile or not driver_profile.get("current_location_lat"):
         return []  # No location set
     
+    summary = view == "summary"
+    request_projection = projection_for(TowRequestSummary) if summary else None
+    if summary:
+        # Pickup coordinates are needed for the distance below
+        request_projection.update({"pickup_lat": 1, "pickup_lng": 1})
+    
     # Check if driver is available
     if driver_profile.get("status") != "available":
         # If driver is on mission, show only their assigned requests
         assigned_requests = await db.tow_requests.find({
             "assigned_driver_id": current_user.id,
             "status": {"$in": ["accepted", "on_mission"]}
-        }).to_list(100)
+        }, request_projection).to_list(100)
         
+        if summary:
+            return summary_response(assigned_requests)
         return [TowRequest(**request).dict() for request in assigned_requests]
     
     # For available drivers, show requests currently assigned to them
@@ -893,68 +1379,129 @@ async def get_nearby_tow_requests(
         "current_driver_id": current_user.id,
         "status": "pending",
         "negotiation_status": {"$in": ["awaiting_driver", "negotiating"]}
-    }).to_list(100)
+    }, request_projection).to_list(100)
     
     # Add distance and offer information
+    distances = haversine_many(
+        driver_profile["current_location_lat"],
+        driver_profile["current_location_lng"],
+        [request["pickup_lat"] for request in current_requests],
+        [request["pickup_lng"] for request in current_requests],
+        DistanceUnit.MILES
+    )
+    
+    # Latest offer for every request in one round trip
+    latest_offers = await fetch_latest_offers([request["id"] for request in current_requests])
+    
     enhanced_requests = []
-    for request in current_requests:
-        distance = calculate_distance(
-            driver_profile["current_location_lat"],
-            driver_profile["current_location_lng"], 
-            request["pickup_lat"],
-            request["pickup_lng"]
-        ) * 0.621371  # Convert km to miles
-        
-        # Get latest offer if any
-        latest_offer = await db.price_offers.find_one(
-            {"tow_request_id": request["id"]},
-            sort=[("created_at", -1)]
-        )
+    for request, distance in zip(current_requests, distances):
+        latest_offer = latest_offers.get(request["id"])
         
-        request_with_details = TowRequest(**request).dict()
-        request_with_details["distance_miles"] = round(distance, 2)
-        request_with_details["latest_offer"] = PriceOffer(**latest_offer).dict() if latest_offer else None
+        if summary:
+            request_with_details = request
+            request_with_details["latest_offer"] = (
+                {k: latest_offer[k] for k in ("amount", "offer_type", "status", "created_at")}
+                if latest_offer else None
+            )
+        else:
+            request_with_details = TowRequest(**request).dict()
+            request_with_details["latest_offer"] = PriceOffer(**latest_offer).dict() if latest_offer else None
+        request_with_details["distance_miles"] = round(float(distance), 2)
         
         enhanced_requests.append(request_with_details)
     
+    if summary:
+        return summary_response(enhanced_requests)
     return enhanced_requests
 
 
 @api_router.get("/tow-requests", response_model=List[TowRequest])
-async def get_tow_requests(current_user: User = Depends(get_current_user)):
+async def get_tow_requests(
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    limit: int = Query(TOW_REQUESTS_PAGE_SIZE, ge=1, le=TOW_REQUESTS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    view: str = Query("full", pattern="^(full|summary)$")
+):
+    """Newest first, one page at a time (next page cursor in X-Next-Cursor), or everything as NDJSON with stream=true"""
     if current_user.role == UserRole.CLIENT:
         # Clients see their own requests
-        requests = await db.tow_requests.find({"client_id": current_user.id}).to_list(1000)
+        query = {"client_id": current_user.id}
     elif current_user.role == UserRole.DRIVER:
         # Drivers see requests assigned to them or available requests
-        requests = await db.tow_requests.find({
+        query = {
             "$or": [
                 {"assigned_driver_id": current_user.id},
                 {"status": TowRequestStatus.PENDING}
             ]
-        }).to_list(1000)
+        }
     elif current_user.role in [UserRole.TOW_COMPANY, UserRole.ADMIN]:
         # Tow companies and admins see all requests
-        requests = await db.tow_requests.find().to_list(1000)
+        query = {}
     else:
-        requests = []
+        return []
     
+    try:
+        query = keyset_filter(query, cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    summary = view == "summary"
+    projection = projection_for(TowRequestSummary) if summary else None
+    
+    if stream:
+        async def request_lines():
+            async for request in db.tow_requests.find(query, projection, batch_size=limit).sort(KEYSET_SORT):
+                if summary:
+                    yield json.dumps(request, default=_json_default) + "\n"
+                else:
+                    yield TowRequest(**request).json() + "\n"
+        
+        return StreamingResponse(request_lines(), media_type="application/x-ndjson")
+    
+    # One extra document tells us whether there is a next page
+    requests = await db.tow_requests.find(query, projection).sort(KEYSET_SORT).limit(limit + 1).to_list(limit + 1)
+    next_cursor = None
+    if len(requests) > limit:
+        requests = requests[:limit]
+        next_cursor = encode_cursor(requests[-1])
+    
+    if summary:
+        result = summary_response(requests)
+        if next_cursor:
+            result.headers["X-Next-Cursor"] = next_cursor
+        return result
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [TowRequest(**request) for request in requests]
 
 
 @api_router.get("/tow-requests/{request_id}", response_model=TowRequest)
-async def get_tow_request(request_id: str, current_user: User = Depends(get_current_user)):
-    request = await db.tow_requests.find_one({"id": request_id})
-    if not request:
+async def get_tow_request(request_id: str, http_request: Request, current_user: User = Depends(get_current_user)):
+    # Every write bumps updated_at, so a small projected read tells whether the cached body is current
+    version = await db.tow_requests.find_one({"id": request_id}, {"_id": 0, "client_id": 1, "updated_at": 1})
+    if not version:
         raise HTTPException(status_code=404, detail="Tow request not found")
     
-    tow_request = TowRequest(**request)
-    
     # Authorization check
-    if (current_user.role == UserRole.CLIENT and tow_request.client_id != current_user.id):
+    if (current_user.role == UserRole.CLIENT and version["client_id"] != current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized to view this request")
     
-    return tow_request
+    entry = response_cache.get(("tow_request", request_id, version.get("updated_at")))
+    if entry is None:
+        request = await db.tow_requests.find_one({"id": request_id})
+        if not request:
+            raise HTTPException(status_code=404, detail="Tow request not found")
+        # Keyed by the version actually read, in case a write landed in between
+        entry = response_cache.put(
+            ("tow_request", request_id, request.get("updated_at")),
+            TowRequest(**request).json().encode(),
+            version=request.get("updated_at")
+        )
+    
+    return cached_json_response(http_request, entry)
 
 
 @api_router.put("/tow-requests/{request_id}", response_model=TowRequest)
@@ -983,11 +1530,55 @@ async def update_tow_request(
     update_dict["updated_at"] = datetime.now(timezone.utc)
     
     await db.tow_requests.update_one({"id": request_id}, {"$set": update_dict})
+    if update_data.status in [TowRequestStatus.COMPLETED, TowRequestStatus.CANCELLED]:
+        await event_bus.publish(RequestClosed(request_id))
     
     updated_request = await db.tow_requests.find_one({"id": request_id})
     return TowRequest(**updated_request)
 
 
+@api_router.get("/tow-requests/{request_id}/track")
+async def track_tow_request(request_id: str, token: str):
+    """Server-sent events with the assigned driver's position; EventSource can't set headers, so a stream token comes as ?token="""
+    current_user = await get_user_from_token(token, use_claims=False, purpose=STREAM_TOKEN_PURPOSE)
+    request = await db.tow_requests.find_one(
+        {"id": request_id}, {"_id": 0, "client_id": 1, "assigned_driver_id": 1, "status": 1}
+    )
+    if not request:
+        raise HTTPException(status_code=404, detail="Tow request not found")
+    if current_user.role != UserRole.ADMIN and current_user.id not in (request["client_id"], request.get("assigned_driver_id")):
+        raise HTTPException(status_code=403, detail="Not authorized to track this request")
+    if request["status"] not in [TowRequestStatus.ACCEPTED, TowRequestStatus.ON_MISSION] or not request.get("assigned_driver_id"):
+        raise HTTPException(status_code=400, detail="Only accepted requests with an assigned driver can be tracked")
+    
+    driver_id = request["assigned_driver_id"]
+    profile = location_ingestor.overlay(await db.driver_profiles.find_one(
+        {"user_id": driver_id}, {"_id": 0, "user_id": 1, "current_location_lat": 1, "current_location_lng": 1}
+    ))
+    position = {"lat": profile.get("current_location_lat"), "lng": profile.get("current_location_lng")} if profile else None
+    queue = driver_tracker.subscribe(request_id, driver_id, position)
+    
+    async def events():
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=TRACKING_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+                if message is END:
+                    return
+        finally:
+            driver_tracker.unsubscribe(request_id, queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @api_router.post("/tow-requests/{request_id}/accept")
 async def accept_tow_request(request_id: str, current_user: User = Depends(get_current_user)):
     if current_user.role not in [UserRole.DRIVER, UserRole.TOW_COMPANY]:
@@ -1000,63 +1591,67 @@ async def accept_tow_request(request_id: str, current_user: User = Depends(get_c
     if request["status"] != TowRequestStatus.PENDING:
         raise HTTPException(status_code=400, detail="Request is not pending")
     
-    # For drivers, check if they are available and close enough
+    # Drivers claim themselves first (available -> on_mission) so one driver cannot win two requests at once
     if current_user.role == UserRole.DRIVER:
-        driver_profile = await db.driver_profiles.find_one({"user_id": current_user.id})
-        
+        driver_profile = await apply_transition(db, DRIVER_START_MISSION, {"user_id": current_user.id})
         if not driver_profile:
-            raise HTTPException(status_code=400, detail="Driver profile not found")
-        
-        if driver_profile.get("status") != "available":
+            if not await db.driver_profiles.find_one({"user_id": current_user.id}, {"_id": 1}):
+                raise HTTPException(status_code=400, detail="Driver profile not found")
             raise HTTPException(status_code=400, detail="Driver must be available to accept requests")
+        driver_profile = location_ingestor.overlay(driver_profile)
         
         # Check distance (optional validation)
         if (driver_profile.get("current_location_lat") and 
             driver_profile.get("current_location_lng")):
-            distance = calculate_distance(
+            distance = haversine(
                 driver_profile["current_location_lat"],
                 driver_profile["current_location_lng"],
                 request["pickup_lat"],
-                request["pickup_lng"]
+                request["pickup_lng"],
+                DistanceUnit.KM
             )
             
             if distance > 100:  # Max 100km
+                await apply_transition(db, DRIVER_ABORT_MISSION, {"user_id": current_user.id})
                 raise HTTPException(status_code=400, detail="Request too far from your location")
     
-    update_data = {
-        "status": TowRequestStatus.ACCEPTED,
-        "updated_at": datetime.now(timezone.utc)
-    }
-    
+    update_data = {"updated_at": datetime.now(timezone.utc), "offer_expires_at": None}
     if current_user.role == UserRole.DRIVER:
         update_data["assigned_driver_id"] = current_user.id
-        
-        # Update driver status to on_mission
-        await db.driver_profiles.update_one(
-            {"user_id": current_user.id},
-            {"$set": {"status": DriverStatus.ON_MISSION}}
-        )
-        
     elif current_user.role == UserRole.TOW_COMPANY:
         update_data["accepted_by_company_id"] = current_user.id
     
-    await db.tow_requests.update_one({"id": request_id}, {"$set": update_data})
+    # Only one concurrent accept finds the request still pending
+    updated_request = await apply_transition(db, REQUEST_ACCEPT, {"id": request_id}, **update_data)
+    if not updated_request:
+        if current_user.role == UserRole.DRIVER:
+            await apply_transition(db, DRIVER_ABORT_MISSION, {"user_id": current_user.id})
+        raise HTTPException(status_code=409, detail="Request was already accepted")
+    
+    await event_bus.publish(OfferClosed(request_id))
+    if current_user.role == UserRole.DRIVER:
+        driver_state.remove(current_user.id)
     
-    updated_request = await db.tow_requests.find_one({"id": request_id})
     return TowRequest(**updated_request)
 
 
 # Driver Profile endpoints
 @api_router.get("/drivers/profile", response_model=DriverProfile)
-async def get_driver_profile(current_user: User = Depends(get_current_user)):
+async def get_driver_profile(http_request: Request, current_user: User = Depends(get_current_user)):
     if current_user.role != UserRole.DRIVER:
         raise HTTPException(status_code=403, detail="Only drivers can access this endpoint")
     
-    profile = await db.driver_profiles.find_one({"user_id": current_user.id})
-    if not profile:
-        raise HTTPException(status_code=404, detail="Driver profile not found")
+    # Dropped by driver_state on every status or eligibility change of this driver; position pings
+    # don't drop it, so the position in a cached profile can lag by up to RESPONSE_CACHE_TTL_SECONDS
+    entry = response_cache.get(("driver_profile", current_user.id))
+    if entry is None:
+        profile = await db.driver_profiles.find_one({"user_id": current_user.id})
+        if not profile:
+            raise HTTPException(status_code=404, detail="Driver profile not found")
+        body = DriverProfile(**location_ingestor.overlay(profile)).json().encode()
+        entry = response_cache.put(("driver_profile", current_user.id), body)
     
-    return DriverProfile(**profile)
+    return cached_json_response(http_request, entry)
 
 
 @api_router.put("/drivers/location")
@@ -1068,14 +1663,40 @@ async def update_driver_location(
     if current_user.role != UserRole.DRIVER:
         raise HTTPException(status_code=403, detail="Only drivers can update location")
     
-    await db.driver_profiles.update_one(
-        {"user_id": current_user.id},
-        {"$set": {"current_location_lat": lat, "current_location_lng": lng}}
-    )
+    if not location_ingestor.submit(current_user.id, lat, lng):
+        raise HTTPException(status_code=503, detail="Location service busy, please retry")
+    driver_state.move(current_user.id, lat, lng)
     
     return {"message": "Location updated successfully"}
 
 
+@api_router.get("/drivers/{driver_id}/location-history")
+async def get_driver_location_history(
+    driver_id: str,
+    since: datetime,
+    until: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """A driver's recorded track for trip replay and mileage checks; admins or the driver only"""
+    if current_user.role != UserRole.ADMIN and current_user.id != driver_id:
+        raise HTTPException(status_code=403, detail="Not authorized to view this driver's history")
+    
+    until = until or datetime.now(timezone.utc)
+    if epoch_ms(until) < epoch_ms(since):
+        raise HTTPException(status_code=400, detail="until must not be before since")
+    if epoch_ms(until) - epoch_ms(since) > LOCATION_HISTORY_MAX_HOURS * 3600 * 1000:
+        raise HTTPException(status_code=400, detail=f"Window is limited to {LOCATION_HISTORY_MAX_HOURS} hours")
+    
+    points = await location_history.track(driver_id, since, until)
+    return {
+        "driver_id": driver_id,
+        "since": since,
+        "until": until,
+        "distance_miles": round(track_miles(points), 2),
+        "points": [{"at": from_epoch_ms(at_ms), "lat": lat, "lng": lng} for at_ms, lat, lng in points]
+    }
+
+
 @api_router.put("/drivers/status")
 async def update_driver_status(
     status: DriverStatus,
@@ -1084,14 +1705,40 @@ async def update_driver_status(
     if current_user.role != UserRole.DRIVER:
         raise HTTPException(status_code=403, detail="Only drivers can update status")
     
-    await db.driver_profiles.update_one(
+    profile = await db.driver_profiles.find_one_and_update(
         {"user_id": current_user.id},
-        {"$set": {"status": status}}
+        {"$set": {"status": status}},
+        return_document=ReturnDocument.AFTER
     )
+    driver_state.sync(current_user.dict(), profile, current_user.id)
     
     return {"message": "Status updated successfully"}
 
 
+@api_router.websocket("/ws/driver")
+async def driver_push_socket(websocket: WebSocket, token: str):
+    """Push channel for drivers; browsers can't set headers on sockets, so a stream token comes as ?token="""
+    try:
+        user = await get_user_from_token(token, use_claims=False, purpose=STREAM_TOKEN_PURPOSE)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    if user.role != UserRole.DRIVER:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await driver_push.connect(user.id, websocket)
+    try:
+        while True:
+            # Clients only send keepalives; events flow server -> client
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        driver_push.disconnect(user.id, websocket)
+
+
 # Admin Panel HTML Route
 @app.get("/admin-panel", response_class=HTMLResponse)
 async def admin_panel():
@@ -1303,15 +1950,21 @@ async def admin_panel():
 
 # Admin endpoints
 @api_router.get("/admin/pending-approvals")
-async def get_pending_approvals(current_user: User = Depends(get_current_user)):
+async def get_pending_approvals(
+    current_user: User = Depends(get_current_user),
+    view: str = Query("full", pattern="^(full|summary)$")
+):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin access required")
     
+    summary = view == "summary"
     pending_users = await db.users.find({
         "is_approved": False,
         "role": {"$in": [UserRole.TOW_COMPANY, UserRole.DRIVER]}
-    }).to_list(1000)
+    }, projection_for(UserSummary if summary else User)).to_list(1000)
     
+    if summary:
+        return summary_response(pending_users)
     return [User(**user) for user in pending_users]
 
 
@@ -1320,14 +1973,53 @@ async def approve_user(user_id: str, current_user: User = Depends(get_current_us
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    await db.users.update_one(
+    user = await db.users.find_one_and_update(
         {"id": user_id},
-        {"$set": {"is_approved": True, "updated_at": datetime.now(timezone.utc)}}
+        {"$set": {"is_approved": True, "updated_at": datetime.now(timezone.utc)}},
+        return_document=ReturnDocument.AFTER
     )
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Claims issued before this are stale; those tokens fall back to the user lookup
+    epoch = await auth_epochs.bump(user_id)
+    await event_bus.publish(UserChanged(user_id, epoch))
+    
+    # Newly approved drivers may already be online
+    if user.get("role") == UserRole.DRIVER:
+        profile = await db.driver_profiles.find_one({"user_id": user_id})
+        driver_state.sync(user, profile, user_id)
     
     return {"message": "User approved successfully"}
 
 
+@api_router.get("/admin/metrics")
+async def get_metrics(current_user: User = Depends(get_current_user)):
+    """In-process cache and pipeline counters for this worker"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return {
+        "user_cache": user_cache.stats(),
+        "auth_epochs": auth_epochs.stats(),
+        "claims_cache": claims_cache.stats(),
+        "pricing_cache": pricing_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "location_ingest": location_ingestor.stats(),
+        "location_history": location_history.stats(),
+        "driver_push": driver_push.stats(),
+        "driver_tracking": driver_tracker.stats(),
+        "event_bus": event_bus.stats(),
+        "offer_expiry": offer_expiry.stats(),
+        "dispatch": dispatch.stats(),
+        "batch_dispatch": batch_dispatcher.stats() if batch_dispatcher else None,
+        "driver_index": {"drivers": len(driver_index)},
+        "driver_state": driver_state.stats(),
+        "routing": routing.stats()
+    }
+
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -1337,6 +2029,7 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Configure logging
@@ -1346,6 +2039,62 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def provision_indexes():
+    failed = await ensure_indexes(db)
+    if failed:
+        logger.error(f"Missing indexes, run 'python db_indexes.py' for details: {', '.join(failed)}")
+
+
+@app.on_event("startup")
+async def load_auth_epochs():
+    try:
+        bumped = await auth_epochs.load()
+        logger.info(f"Auth epochs loaded for {bumped} users")
+    except PyMongoError:
+        logger.exception("Could not load auth epochs; token claims are ignored until the next reload")
+    auth_epochs.start()
+
+
+@app.on_event("startup")
+async def load_road_graph():
+    if ROAD_GRAPH_PATH:
+        await asyncio.to_thread(routing.load, ROAD_GRAPH_PATH)
+    else:
+        logger.info(f"No ROAD_GRAPH_PATH; quotes use straight-line miles at {routing.fallback_speed_mph} mph")
+
+
+@app.on_event("startup")
+async def warm_driver_search():
+    event_bus.start()
+    loaded = await driver_state.load()
+    logger.info(f"Driver state warmed with {loaded} drivers, {len(driver_index)} dispatchable")
+    driver_state.start()
+    await driver_search.prepare()
+    logger.info(f"Driver search engine: {driver_search.name}")
+    companies = await dispatch.load(db)
+    logger.info(f"Dispatch policies loaded for {companies} tow companies")
+    dispatch.start(db)
+    if batch_dispatcher:
+        batch_dispatcher.start()
+        logger.info(f"Batch dispatch every {BATCH_DISPATCH_INTERVAL_SECONDS}s")
+    location_ingestor.start()
+    location_history.start()
+    scheduled = await offer_expiry.load(db)
+    offer_expiry.start()
+    logger.info(f"Offer expiry scheduler watching {scheduled} open offers")
+
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if batch_dispatcher:
+        await batch_dispatcher.stop()
+    await offer_expiry.stop()
+    await dispatch.stop()
+    await event_bus.stop()
+    await auth_epochs.stop()
+    await driver_state.stop()
+    await location_ingestor.stop()
+    await location_history.stop()
+    password_hasher.shutdown()
     client.close()
\ No newline at end of file
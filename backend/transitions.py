@@ -0,0 +1,67 @@
+"""Guarded state transitions for tow requests, offers and driver profiles.
+
+Each transition is one conditional find_one_and_update: the filter pins the
+state the caller expects to move from, so when two callers race only one of
+them matches and the others get None back instead of overwriting the
+winner.
+"""
+from typing import Any, Dict, NamedTuple, Optional
+
+from pymongo import ReturnDocument
+
+
+class Transition(NamedTuple):
+    collection: str
+    expected: Dict[str, Any]  # Guard: the state the document must still be in
+    changes: Dict[str, Any]  # Fields every application of the transition sets
+
+
+REQUEST_ACCEPT_OFFER = Transition(
+    "tow_requests",
+    {"status": "pending", "negotiation_status": "negotiating"},
+    {"status": "accepted", "negotiation_status": "price_agreed"},
+)
+REQUEST_ACCEPT = Transition(
+    "tow_requests",
+    {"status": "pending"},
+    {"status": "accepted"},
+)
+REQUEST_REOPEN_OFFER = Transition(
+    "tow_requests",
+    {"status": "accepted", "negotiation_status": "price_agreed"},
+    {"status": "pending", "negotiation_status": "negotiating", "assigned_driver_id": None, "final_agreed_price": None},
+)
+REQUEST_REJECT_COUNTER = Transition(
+    "tow_requests",
+    {"status": "pending", "negotiation_status": "negotiating"},
+    {"negotiation_status": "awaiting_driver"},
+)
+REQUEST_EXPIRE_OFFER = Transition(
+    "tow_requests",
+    {"status": "pending", "negotiation_status": {"$in": ["awaiting_driver", "negotiating"]}},
+    {"negotiation_status": "expired", "offer_expires_at": None},
+)
+# Reassign and release must also match the driver being moved off, or they could undo a newer assignment
+REQUEST_REASSIGN = Transition(
+    "tow_requests",
+    {"status": "pending"},
+    {"negotiation_status": "awaiting_driver"},
+)
+REQUEST_RELEASE = Transition(
+    "tow_requests",
+    {"status": "pending"},
+    {"negotiation_status": "no_drivers_available", "current_driver_id": None},
+)
+OFFER_ACCEPT = Transition("price_offers", {"status": "pending"}, {"status": "accepted"})
+OFFER_REJECT = Transition("price_offers", {"status": "pending"}, {"status": "rejected"})
+DRIVER_START_MISSION = Transition("driver_profiles", {"status": "available"}, {"status": "on_mission"})
+DRIVER_ABORT_MISSION = Transition("driver_profiles", {"status": "on_mission"}, {"status": "available"})
+
+
+async def apply_transition(db, transition: Transition, match: Dict[str, Any], **changes: Any) -> Optional[Dict[str, Any]]:
+    """Apply a transition to the document matching match; None if it was no longer in the expected state"""
+    return await db[transition.collection].find_one_and_update(
+        {**match, **transition.expected},
+        {"$set": {**transition.changes, **changes}},
+        return_document=ReturnDocument.AFTER,
+    )
@@ -1,6 +1,7 @@
 import requests
 import sys
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, Any, Optional
 
@@ -263,6 +264,68 @@ class TowFleetAPITester:
             else:
                 self.log_test("Get Pending Approvals", False, f"Error: {response}")
 
+    def test_concurrent_accept(self):
+        """Test that concurrent accepts of one tow request produce exactly one winner"""
+        print("\n🔍 Testing Concurrent Acceptance...")
+        
+        if 'admin' not in self.tokens or 'client' not in self.tokens:
+            self.log_test("Concurrent Accept", False, "Admin and client tokens required")
+            return
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        company_tokens = []
+        for i in range(5):
+            company = {"email": f"company{i}_{timestamp}@test.com", "password": "TestPass123!",
+                       "full_name": f"Test Company {i}", "role": "tow_company", "phone": f"555000000{i}"}
+            success, response = self.make_request('POST', 'auth/register', company, expected_status=200)
+            if not success:
+                continue
+            self.make_request('POST', f"admin/approve-user/{response.get('id')}",
+                              token=self.tokens['admin'], expected_status=200)
+            success, response = self.make_request('POST', 'auth/login',
+                                                  {"email": company['email'], "password": company['password']},
+                                                  expected_status=200)
+            if success and 'access_token' in response:
+                company_tokens.append(response['access_token'])
+        
+        if len(company_tokens) < 2:
+            self.log_test("Concurrent Accept", False, f"Only {len(company_tokens)} tow companies logged in")
+            return
+        
+        request_data = {
+            "pickup_address": "789 Race St, Test City",
+            "pickup_lat": 40.7128,
+            "pickup_lng": -74.0060,
+            "dropoff_address": "456 Oak Ave, Test City",
+            "dropoff_lat": 40.7589,
+            "dropoff_lng": -73.9851,
+            "vehicle_info": "2018 Ford Focus"
+        }
+        success, response = self.make_request('POST', 'tow-requests', request_data,
+                                              token=self.tokens['client'], expected_status=200)
+        if not success or 'id' not in response:
+            self.log_test("Concurrent Accept", False, f"Error creating request: {response}")
+            return
+        request_id = response['id']
+        
+        def accept(token):
+            success, response = self.make_request('POST', f'tow-requests/{request_id}/accept',
+                                                  token=token, expected_status=200)
+            return success
+        
+        with ThreadPoolExecutor(max_workers=len(company_tokens)) as pool:
+            results = list(pool.map(accept, company_tokens))
+        
+        winners = sum(results)
+        success, response = self.make_request('GET', f'tow-requests/{request_id}',
+                                              token=self.tokens['client'], expected_status=200)
+        winner_recorded = success and response.get('status') == 'accepted' and response.get('accepted_by_company_id')
+        
+        if winners == 1 and winner_recorded:
+            self.log_test("Concurrent Accept", True, f"1 of {len(results)} concurrent accepts won")
+        else:
+            self.log_test("Concurrent Accept", False, f"{winners} of {len(results)} accepts won, request: {response}")
+
     def test_unauthorized_access(self):
         """Test unauthorized access scenarios"""
         print("\n🔍 Testing Unauthorized Access...")
@@ -297,6 +360,7 @@ class TowFleetAPITester:
             self.test_update_tow_request_status()
             self.test_driver_profile_endpoints()
             self.test_admin_endpoints()
+            self.test_concurrent_accept()
             self.test_unauthorized_access()
             
         except Exception as e:
@@ -23,12 +23,42 @@ const NearbyRequests = () => {
   useEffect(() => {
     if (user?.role === 'driver') {
       getCurrentLocation();
-      // Auto-refresh every 30 seconds
-      const interval = setInterval(fetchNearbyRequests, 30000);
-      return () => clearInterval(interval);
+      // Refresh only when the server pushes a job or offer event
+      return subscribeToDriverEvents();
     }
   }, [user]);
 
+  const subscribeToDriverEvents = () => {
+    const token = localStorage.getItem('token');
+    const wsUrl = `${api.defaults.baseURL.replace(/^http/, 'ws')}/ws/driver?token=${encodeURIComponent(token)}`;
+    let socket = null;
+    let retryTimer = null;
+    let retryDelay = 1000;
+    let closed = false;
+
+    const connect = () => {
+      socket = new WebSocket(wsUrl);
+      socket.onopen = () => {
+        retryDelay = 1000;
+        // Catch up on anything published while we were disconnected
+        fetchNearbyRequests();
+      };
+      socket.onmessage = () => fetchNearbyRequests();
+      socket.onclose = () => {
+        if (closed) return;
+        retryTimer = setTimeout(connect, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, 30000);
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (socket) socket.close();
+    };
+  };
+
   const getCurrentLocation = () => {
     if (navigator.geolocation) {
       navigator.geolocation.getCurrentPosition(
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: scalar haversine loop vs the vectorized geo.haversine_many
+Uso: python scripts/bench_distance.py
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from geo import DistanceUnit, haversine, haversine_many  # noqa: E402
+
+SIZES = [1_000, 10_000, 100_000]
+REPEAT = 5
+
+
+def best_of(fn):
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    random.seed(42)
+    origin_lat, origin_lng = 25.7617, -80.1918  # Miami
+
+    print(f"{'drivers':>10} {'scalar (ms)':>12} {'vectorized (ms)':>16} {'speedup':>8}")
+    for size in SIZES:
+        lats = [origin_lat + random.uniform(-1, 1) for _ in range(size)]
+        lngs = [origin_lng + random.uniform(-1, 1) for _ in range(size)]
+
+        scalar = best_of(lambda: [
+            haversine(origin_lat, origin_lng, lat, lng, DistanceUnit.KM) for lat, lng in zip(lats, lngs)
+        ])
+        vectorized = best_of(lambda: haversine_many(origin_lat, origin_lng, lats, lngs, DistanceUnit.KM))
+
+        print(f"{size:>10} {scalar * 1000:>12.2f} {vectorized * 1000:>16.2f} {scalar / vectorized:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark: full TowRequest listing vs view=summary (payload size and serialization time)
+Uso: python scripts/bench_views.py [documents]
+"""
+
+import json
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from server import TowRequest, TowRequestSummary, _json_default, projection_for  # noqa: E402
+
+REPEAT = 5
+
+
+def make_document(i):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return {
+        "id": str(uuid.uuid4()),
+        "client_id": str(uuid.uuid4()),
+        "pickup_address": f"{100 + i} Biscayne Blvd, Miami, FL 33132",
+        "pickup_lat": 25.7617,
+        "pickup_lng": -80.1918,
+        "dropoff_address": f"{200 + i} Ocean Dr, Miami Beach, FL 33139",
+        "dropoff_lat": 25.7907,
+        "dropoff_lng": -80.1300,
+        "distance_miles": 4.2,
+        "estimated_duration_hours": None,
+        "vehicle_info": "2019 Toyota Camry, silver, front-end damage, does not start",
+        "proposed_price": 80.0,
+        "calculated_price": 35.5,
+        "final_agreed_price": None,
+        "current_driver_id": str(uuid.uuid4()),
+        "vehicle_photos": [f"https://example.com/photos/{uuid.uuid4()}.jpg" for _ in range(3)],
+        "status": "pending",
+        "assigned_driver_id": None,
+        "accepted_by_company_id": None,
+        "driver_location_lat": None,
+        "driver_location_lng": None,
+        "notes": "Customer waiting at the parking garage entrance, level 2. Call on arrival.",
+        "negotiation_status": "awaiting_driver",
+        "offer_expires_at": now,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def best_of(fn):
+    best = float("inf")
+    result = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    documents = [make_document(i) for i in range(count)]
+    summary_fields = [field for field in projection_for(TowRequestSummary) if field != "_id"]
+    # What Mongo hands back for the summary projection
+    projected = [{field: doc[field] for field in summary_fields} for doc in documents]
+
+    def full():
+        # Current path: validate every document, then serialize the models
+        models = [TowRequest(**doc) for doc in documents]
+        return json.dumps([model.model_dump(mode="json") for model in models])
+
+    def summary():
+        return json.dumps(projected, default=_json_default)
+
+    full_time, full_body = best_of(full)
+    summary_time, summary_body = best_of(summary)
+
+    print(f"{count} tow requests")
+    print(f"{'view':>8} {'bytes':>12} {'serialize (ms)':>16}")
+    print(f"{'full':>8} {len(full_body):>12} {full_time * 1000:>16.2f}")
+    print(f"{'summary':>8} {len(summary_body):>12} {summary_time * 1000:>16.2f}")
+    print(f"payload {len(full_body) / len(summary_body):.1f}x smaller, serialization {full_time / summary_time:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Load test: event-loop latency during a login storm, inline bcrypt vs PasswordHasher
+Uso: python scripts/load_login.py [concurrent_logins]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from passlib.context import CryptContext  # noqa: E402
+
+from password_hasher import PasswordHasher  # noqa: E402
+
+TICK_SECONDS = 0.005  # What a location ping handler would like to get
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+HASHED = pwd_context.hash("TestPass123!")
+
+
+async def measure_loop_lag(stop: asyncio.Event, samples: list):
+    """Records how late each timer tick fires while logins run"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        samples.append((time.perf_counter() - start - TICK_SECONDS) * 1000)
+
+
+async def inline_verify():
+    return pwd_context.verify("TestPass123!", HASHED)
+
+
+async def run(label: str, verify, logins: int):
+    stop = asyncio.Event()
+    samples = []
+    ticker = asyncio.create_task(measure_loop_lag(stop, samples))
+    await asyncio.sleep(TICK_SECONDS * 4)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(verify() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await ticker
+
+    samples.sort()
+    p99 = samples[int(len(samples) * 0.99) - 1] if samples else 0.0
+    print(f"{label:>16}: {logins} logins in {elapsed:.2f}s | loop lag median "
+          f"{statistics.median(samples) if samples else 0:.1f}ms p99 {p99:.1f}ms max {max(samples, default=0):.1f}ms "
+          f"({len(samples)} ticks)")
+
+
+async def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    hasher = PasswordHasher(pwd_context, max_workers=4)
+
+    await run("inline bcrypt", inline_verify, logins)
+    await run("PasswordHasher", lambda: hasher.verify("TestPass123!", HASHED), logins)
+    print(f"hasher stats: {hasher.stats()}")
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,37 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from auth_epochs import AuthEpochs
+
+
+def test_nothing_is_trusted_before_the_first_load():
+    async def scenario():
+        epochs = AuthEpochs(AsyncMongoMockClient()["auth"])
+        before = epochs.trusts("u1", 0)
+        await epochs.load()
+        return before, epochs.trusts("u1", 0)
+
+    assert asyncio.run(scenario()) == (False, True)
+
+
+def test_bump_makes_older_claims_stale_on_every_worker():
+    async def scenario():
+        db = AsyncMongoMockClient()["auth"]
+        worker_a, worker_b = AuthEpochs(db), AuthEpochs(db)
+        await worker_a.load()
+        await worker_b.load()
+
+        epoch = await worker_a.bump("u1")
+        missed = worker_b.trusts("u1", 0)  # Before the UserChanged event or the next reload
+        await worker_b.load()
+        return epoch, missed, worker_a.trusts("u1", 0), worker_b.trusts("u1", 0), worker_b.trusts("u1", epoch)
+
+    assert asyncio.run(scenario()) == (1, True, False, False, True)
+
+
+def test_epochs_never_move_backwards():
+    epochs = AuthEpochs(db=None)
+    epochs.apply("u1", 3)
+    epochs.apply("u1", 2)
+    assert epochs.current("u1") == 3
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime, timezone
+
+from mongomock_motor import AsyncMongoMockClient
+
+from batch_dispatch import BatchDispatcher, compare_assignments, feasible, greedy_assignment, hungarian
+from dispatch import DispatchEngine
+from driver_index import DriverIndex
+from driver_search import IndexDriverSearch
+
+
+def test_hungarian_beats_greedy_on_the_same_requests():
+    cost = [[1, 5], [2, 100]]
+    batch = feasible(cost, hungarian(cost))
+    greedy = greedy_assignment(cost)
+    assert batch == [(0, 1), (1, 0)]
+    assert greedy == [(0, 0), (1, 1)]
+    assert compare_assignments(cost, batch, greedy) == (2, 7, 101)
+
+
+def test_comparison_skips_requests_only_one_side_matched():
+    # One driver: greedy gives it to the first request, the matching to the cheaper one
+    cost = [[5], [1]]
+    batch = feasible(cost, hungarian(cost))
+    greedy = greedy_assignment(cost)
+    assert batch == [(1, 0)] and greedy == [(0, 0)]
+    assert compare_assignments(cost, batch, greedy) == (0, 0, 0)
+
+
+def test_round_goes_through_the_search_engine():
+    async def scenario():
+        db = AsyncMongoMockClient()["batch"]
+        index = DriverIndex()
+        for user_id, lng in (("near", 0.06), ("far", 0.0)):
+            index.sync(
+                {"id": user_id, "role": "driver", "is_approved": True, "is_active": True},
+                {"user_id": user_id, "status": "available", "current_location_lat": 0.0, "current_location_lng": lng},
+            )
+        for request_id, lng, minute in (("first", 0.05, 1), ("second", 0.10, 2)):
+            await db.tow_requests.insert_one({
+                "id": request_id, "status": "pending", "current_driver_id": None,
+                "negotiation_status": "awaiting_dispatch", "pickup_lat": 0.0, "pickup_lng": lng,
+                "dropoff_lat": 0.0, "dropoff_lng": 0.2,
+                "created_at": datetime(2026, 3, 1, 10, minute, tzinfo=timezone.utc),
+            })
+
+        search = IndexDriverSearch(index)
+        assigned = []
+
+        async def quote(request, driver_id):
+            return {"total_price": 100.0, "distance_miles": 10.0, "duration_hours": 0.5}
+
+        async def on_assigned(request, candidate, price):
+            assigned.append((request["id"], candidate["driver"]["id"]))
+
+        dispatcher = BatchDispatcher(db, search, DispatchEngine(search), quote, on_assigned)
+        won = await dispatcher.run_once()
+        stored = await db.tow_requests.find({}, {"_id": 0, "id": 1, "current_driver_id": 1}).to_list(None)
+        return won, assigned, stored, dispatcher.stats()
+
+    won, assigned, stored, stats = asyncio.run(scenario())
+    assert won == 2
+    assert sorted(assigned) == [("first", "far"), ("second", "near")]
+    assert {doc["id"]: doc["current_driver_id"] for doc in stored} == {"first": "far", "second": "near"}
+    assert stats["compared_requests"] == 2 and stats["deadhead_miles_saved"] > 0
+    assert stats["planned"] == stats["greedy_assigned"] == 2
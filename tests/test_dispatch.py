@@ -0,0 +1,65 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from dispatch import DispatchEngine, DispatchPolicy, RotationQueue
+
+
+def candidate(user_id, company_id=None, distance_km=1.0):
+    return {
+        "driver": {"id": user_id},
+        "profile": {"user_id": user_id, "tow_company_id": company_id},
+        "distance_km": distance_km,
+    }
+
+
+def test_rotation_queue_orders_by_last_turn():
+    queue = RotationQueue()
+    queue.served("a", 1)
+    queue.served("b", 2)
+    queue.served("a", 3)  # Leaves a stale (1, "a") entry behind
+    assert list(queue.order(["a", "b", "c"])) == ["c", "b", "a"]
+    assert list(queue.order(["a"])) == ["a"]
+
+
+def test_rotation_queue_compacts_stale_entries():
+    queue = RotationQueue()
+    for turn in range(1, 200):
+        queue.served("a" if turn % 2 else "b", turn)
+    assert len(queue._heap) <= 2 * len(queue) + 16
+    assert list(queue.order(["a", "b"])) == ["b", "a"]
+
+
+def test_rotation_company_slots_go_to_longest_waiting_driver():
+    engine = DispatchEngine(search=None)
+    engine.set_company_policy({"id": "co", "auto_assign_policy": DispatchPolicy.ROTATION})
+    ranked = [candidate("near", "co", 1), candidate("solo", None, 2), candidate("far", "co", 3)]
+
+    first = [item["driver"]["id"] for item in engine.rank(ranked)]
+    engine.offered(candidate(first[0], "co"))
+    second = [item["driver"]["id"] for item in engine.rank(ranked)]
+
+    assert first == ["far", "solo", "near"]
+    assert second == ["near", "solo", "far"]
+    assert [item["driver"]["id"] for item in engine.rank(ranked, limit=2)] == ["near", "solo"]
+
+
+def test_reload_keeps_rotation_turns_and_drops_removed_companies():
+    async def scenario():
+        db = AsyncMongoMockClient()["dispatch"]
+        await db.tow_company_profiles.insert_many([
+            {"id": "co", "user_id": "co-user", "auto_assign_policy": DispatchPolicy.ROTATION},
+            {"id": "gone", "user_id": "gone-user", "auto_assign_policy": DispatchPolicy.NEAREST},
+        ])
+        engine = DispatchEngine(search=None)
+        await engine.load(db)
+        engine.offered(candidate("a", "co"))
+
+        await db.tow_company_profiles.delete_one({"id": "gone"})
+        await db.tow_company_profiles.update_one({"id": "co"}, {"$set": {"note": "edited"}})
+        await engine.load(db)
+        return engine
+
+    engine = asyncio.run(scenario())
+    assert engine.policy_for("gone") == DispatchPolicy.MANUAL
+    assert len(engine.rotation_queue("co")) == 1
@@ -0,0 +1,49 @@
+from driver_index import DriverIndex
+
+
+def driver(user_id, status="available", lat=25.76, lng=-80.19, **profile_fields):
+    user = {"id": user_id, "role": "driver", "is_approved": True, "is_active": True}
+    profile = {"user_id": user_id, "status": status, "current_location_lat": lat, "current_location_lng": lng,
+               **profile_fields}
+    return user, profile
+
+
+def test_positions_and_status_live_in_the_table():
+    index = DriverIndex()
+    index.sync(*driver("near", lat=25.761))
+    index.sync(*driver("far", lat=26.5))
+    index.sync(*driver("busy", status="on_mission"))
+
+    assert [entry.user_id for entry, _ in index.within(25.76, -80.19, 20)] == ["near"]
+    assert "busy" not in index and index.table.row("busy")["status"] == "on_mission"
+
+    # A move to another cell is read from the table arrays
+    index.move("far", 25.762, -80.19)
+    assert [entry.user_id for entry, _ in index.within(25.76, -80.19, 20)] == ["near", "far"]
+    assert index.table.row("far")["lat"] == 25.762
+    assert index.get("far").profile["current_location_lat"] == 25.762
+
+
+def test_remove_keeps_the_row_and_forget_frees_it():
+    index = DriverIndex()
+    index.sync(*driver("a", force_assigned_only=True))
+    index.sync(*driver("b", lat=None, lng=None))
+    assert index.counts() == {
+        "offline": 0, "available": 2, "on_mission": 0, "dispatchable": 0, "drivers": 2,
+        "indexed": 1, "awaiting_location": 1,
+    }
+    assert index.table.row("a")["force_assigned_only"] is True
+
+    index.remove("a", "on_mission")
+    assert index.within(25.76, -80.19, 20) == []
+    assert index.table.row("a")["status"] == "on_mission"
+
+    # The first ping of an eligible driver indexes it
+    assert index.move("b", 25.76, -80.19)
+    assert [entry.user_id for entry, _ in index.within(25.76, -80.19, 1)] == ["b"]
+    assert index.counts()["dispatchable"] == 1
+
+    index.forget("a")
+    index.sync({"id": "b", "role": "client"}, None, "b")
+    assert len(index.table) == 0 and len(index) == 0
+    assert index.within(25.76, -80.19, 20) == []
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from driver_index import DriverIndex
+from driver_search import GeoNearDriverSearch, IndexDriverSearch, create_driver_search
+
+
+def driver(user_id, lat, lng, **user_fields):
+    user = {"id": user_id, "role": "driver", "is_approved": True, "is_active": True, **user_fields}
+    profile = {"user_id": user_id, "status": "available", "current_location_lat": lat, "current_location_lng": lng}
+    return user, profile
+
+
+def test_index_search_orders_by_distance():
+    index = DriverIndex()
+    for user, profile in (driver("far", 25.80, -80.19), driver("near", 25.762, -80.19)):
+        index.sync(user, profile)
+    search = IndexDriverSearch(index)
+
+    results = asyncio.run(search.within(25.761, -80.19, 10))
+    assert [result["driver"]["id"] for result in results] == ["near", "far"]
+    assert asyncio.run(search.nearest(25.761, -80.19, 10))["driver"]["id"] == "near"
+
+
+def test_geonear_pipeline_shape():
+    stages = GeoNearDriverSearch(db=None).pipeline(25.76, -80.19, 12, limit=5)
+    geo_near = stages[0]["$geoNear"]
+    assert geo_near["near"] == {"type": "Point", "coordinates": [-80.19, 25.76]}
+    assert geo_near["maxDistance"] == 12000
+    assert geo_near["query"] == {"status": "available"}
+    assert {"$limit": 5} in stages
+
+
+def test_geonear_stages_after_the_distance_sort():
+    """mongomock has no $geoNear: feed its output (distance_m, closest first) into the remaining stages"""
+    async def scenario():
+        db = AsyncMongoMockClient()["search"]
+        unflagged_user, unflagged_profile = driver("unflagged", 25.765, -80.19)
+        del unflagged_user["is_approved"], unflagged_user["is_active"]
+        drivers = [
+            driver("near", 25.762, -80.19),
+            driver("unapproved", 25.763, -80.19, is_approved=False),
+            driver("inactive", 25.764, -80.19, is_active=False),
+            (unflagged_user, unflagged_profile),  # Older users without the flags count as approved and active
+            driver("far", 25.80, -80.19),
+        ]
+        index = DriverIndex()
+        for rank, (user, profile) in enumerate(drivers):
+            index.sync(user, profile)
+            await db.users.insert_one({**user, "hashed_password": "x"})
+            await db.driver_profiles.insert_one({**profile, "distance_m": 100.0 * (rank + 1)})
+
+        stages = GeoNearDriverSearch(db).pipeline(25.761, -80.19, 10)[1:]
+        docs = await db.driver_profiles.aggregate([{"$sort": {"distance_m": 1}}] + stages).to_list(None)
+        return docs, await IndexDriverSearch(index).within(25.761, -80.19, 10)
+
+    docs, indexed = asyncio.run(scenario())
+    assert [doc["driver"]["id"] for doc in docs] == ["near", "unflagged", "far"]
+    assert [result["driver"]["id"] for result in indexed] == ["near", "unflagged", "far"]
+    assert all("_id" not in doc and "hashed_password" not in doc["driver"] for doc in docs)
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError, match="bogus"):
+        create_driver_search("bogus", None, DriverIndex())
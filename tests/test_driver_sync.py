@@ -0,0 +1,137 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from driver_index import DriverIndex
+from driver_sync import DriverStateSync
+
+
+def driver(user_id, status="available", lat=25.76, lng=-80.19):
+    user = {"id": user_id, "role": "driver", "is_approved": True, "is_active": True}
+    profile = {"user_id": user_id, "status": status, "current_location_lat": lat, "current_location_lng": lng}
+    return user, profile
+
+
+async def seeded(*user_ids):
+    db = AsyncMongoMockClient()["driver_sync"]
+    for user_id in user_ids:
+        user, profile = driver(user_id)
+        await db.users.insert_one(user)
+        await db.driver_profiles.insert_one(profile)
+    return db
+
+
+class Recorder:
+    def __init__(self):
+        self.moves = []
+        self.changes = []
+
+    def state(self, db):
+        return DriverStateSync(
+            db, DriverIndex(), mode="polling",
+            on_move=lambda user_id, lat, lng: self.moves.append((user_id, lat)),
+            on_change=self.changes.append,
+        )
+
+
+class _HookedCursor:
+    def __init__(self, cursor, hook):
+        self.cursor = cursor
+        self.hook = hook
+
+    async def to_list(self, length):
+        documents = await self.cursor.to_list(length)
+        self.hook()
+        return documents
+
+
+class _HookedDb:
+    """Runs hook right after the profiles read, i.e. while DriverStateSync.load is mid-reload"""
+
+    def __init__(self, db, hook):
+        self.db = db
+        self.hook = hook
+
+    def __getattr__(self, name):
+        collection = getattr(self.db, name)
+        if name != "driver_profiles":
+            return collection
+        hooked = self
+
+        class Profiles:
+            def find(self, *args, **kwargs):
+                return _HookedCursor(collection.find(*args, **kwargs), hooked.hook)
+
+        return Profiles()
+
+
+def test_reload_without_changes_touches_nothing():
+    async def scenario():
+        recorder = Recorder()
+        state = recorder.state(await seeded("a", "b"))
+        await state.load()
+        recorder.changes.clear()
+        await state.load()
+        return state, recorder
+
+    state, recorder = asyncio.run(scenario())
+    assert recorder.changes == []
+    assert len(state.index) == 2
+    assert state.stats()["drivers"] == 2
+
+
+def test_reload_applies_location_as_a_move():
+    async def scenario():
+        recorder = Recorder()
+        db = await seeded("a")
+        state = recorder.state(db)
+        await state.load()
+        recorder.changes.clear()
+        await db.driver_profiles.update_one({"user_id": "a"}, {"$set": {"current_location_lat": 25.9}})
+        await state.load()
+        return state, recorder
+
+    state, recorder = asyncio.run(scenario())
+    assert recorder.moves == [("a", 25.9)]
+    assert recorder.changes == []  # A position change leaves cached profile responses alone
+    assert state.index.get("a").lat == 25.9
+
+
+def test_reload_picks_up_status_and_deletes():
+    async def scenario():
+        db = await seeded("a", "b")
+        state = Recorder().state(db)
+        await state.load()
+        await db.driver_profiles.update_one({"user_id": "a"}, {"$set": {"status": "offline"}})
+        await db.users.delete_one({"id": "b"})
+        await state.load()
+        return state
+
+    state = asyncio.run(scenario())
+    assert "a" not in state.index
+    assert "b" not in state.index
+    assert state.stats()["drivers"] == 1
+
+
+def test_local_write_during_reload_wins():
+    async def scenario():
+        db = await seeded("a", "b")
+        state = Recorder().state(db)
+        await state.load()
+        await db.driver_profiles.update_one({"user_id": "a"}, {"$set": {"status": "offline"}})
+
+        # "a" goes back on duty and "b" takes a job while the reload is between its reads and its apply
+        user, profile = driver("a")
+        state.db = _HookedDb(db, lambda: (state.sync(user, profile, "a"), state.remove("b")))
+        await state.load()
+        during = ("a" in state.index, "b" in state.index)
+
+        state.db = db
+        await db.driver_profiles.update_one({"user_id": "b"}, {"$set": {"status": "on_mission"}})
+        await db.driver_profiles.update_one({"user_id": "a"}, {"$set": {"status": "available"}})
+        await state.load()
+        return during, ("a" in state.index, "b" in state.index)
+
+    during, after = asyncio.run(scenario())
+    assert during == (True, False)
+    assert after == (True, False)
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from event_bus import (
+    DriverNotified, InMemoryEventBus, LocalPubSub, PricingConfigChanged, RedisEventBus, UserChanged,
+    create_event_bus, decode_event, encode_event
+)
+
+
+def test_events_round_trip_over_the_wire():
+    event = DriverNotified("driver-1", "offer", "request-1", {"amount": 80.0})
+    assert decode_event(encode_event(event, "worker-a")) == ("worker-a", event)
+    assert decode_event('{"type": "Unknown", "fields": {}}') is None
+
+
+def test_in_memory_bus_runs_sync_and_async_handlers():
+    async def scenario():
+        bus = InMemoryEventBus()
+        seen = []
+
+        async def async_handler(event):
+            seen.append(("async", event.user_id))
+
+        bus.subscribe(UserChanged, lambda event: seen.append(("sync", event.user_id)))
+        bus.subscribe(UserChanged, async_handler)
+        bus.subscribe(UserChanged, lambda event: 1 / 0)
+        await bus.publish(UserChanged("u1"))
+        return seen, bus.stats()
+
+    seen, stats = asyncio.run(scenario())
+    assert seen == [("sync", "u1"), ("async", "u1")]
+    assert stats["handler_errors"] == 1
+
+
+async def _connected_buses(count):
+    broker = LocalPubSub()
+    buses = [RedisEventBus(client=broker) for _ in range(count)]
+    for bus in buses:
+        bus.start()
+    while len(broker._subscribers.get(buses[0].channel, ())) < count:
+        await asyncio.sleep(0)
+    return buses
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_events_reach_every_worker_once():
+    async def scenario():
+        buses = await _connected_buses(3)
+        seen = {index: [] for index in range(3)}
+        for index, bus in enumerate(buses):
+            bus.subscribe(PricingConfigChanged, lambda event, index=index: seen[index].append(event))
+            bus.subscribe(UserChanged, lambda event, index=index: seen[index].append(event))
+
+        await buses[0].publish(UserChanged("u1", 4))
+        await _settle()
+        await buses[1].publish(PricingConfigChanged())
+        await _settle()
+        stats = [bus.stats() for bus in buses]
+        for bus in buses:
+            await bus.stop()
+        return seen, stats
+
+    seen, stats = asyncio.run(scenario())
+    # The publisher dispatches locally and skips its own echo, so nobody handles an event twice
+    assert all(events == [UserChanged("u1", 4), PricingConfigChanged()] for events in seen.values())
+    assert [worker["received"] for worker in stats] == [1, 1, 2]
+
+
+def test_stopped_worker_no_longer_receives():
+    async def scenario():
+        first, second = await _connected_buses(2)
+        seen = []
+        second.subscribe(UserChanged, seen.append)
+        await second.stop()
+        await first.publish(UserChanged("u1"))
+        await _settle()
+        await first.stop()
+        return seen
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_send_failure_keeps_local_delivery():
+    class BrokenClient(LocalPubSub):
+        async def publish(self, channel, message):
+            raise ConnectionError("redis down")
+
+    async def scenario():
+        bus = RedisEventBus(client=BrokenClient())
+        seen = []
+        bus.subscribe(UserChanged, seen.append)
+        await bus.publish(UserChanged("u1"))
+        return seen, bus.stats()["send_failures"]
+
+    assert asyncio.run(scenario()) == ([UserChanged("u1")], 1)
+
+
+def test_create_event_bus():
+    assert isinstance(create_event_bus(None), InMemoryEventBus)
+    with pytest.raises(ValueError):
+        create_event_bus("amqp://localhost")
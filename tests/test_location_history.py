@@ -0,0 +1,102 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from mongomock_motor import AsyncMongoMockClient
+
+from location_history import (
+    LocationHistory, _unzigzag, _zigzag, decode_points, encode_points, epoch_ms, from_epoch_ms, thin
+)
+
+
+START = datetime(2026, 3, 1, 10, 0, tzinfo=timezone.utc)
+START_MS = epoch_ms(START)
+
+
+def test_zigzag_round_trip():
+    for value in (0, 1, -1, 63, -64, 64, -65, 2 ** 31, -(2 ** 31), 2 ** 45):
+        assert _unzigzag(_zigzag(value)) == value
+    assert [_zigzag(value) for value in (0, -1, 1, -2, 2)] == [0, 1, 2, 3, 4]
+
+
+def test_encode_decode_round_trip_with_negative_deltas():
+    points = [
+        (START_MS, 25.76123, -80.19187),
+        (START_MS + 1000, 25.76001, -80.19400),  # Both coordinates decrease
+        (START_MS + 1000, 25.76001, -80.19400),  # Zero deltas
+        (START_MS + 3_599_999, -33.86882, 151.20930),  # Large jumps need multi-byte varints
+    ]
+    data = encode_points(points, START_MS)
+    assert decode_points(data, START_MS) == points
+    assert len(data) < 3 * 4 * len(points)
+
+
+def test_decode_of_concatenated_chunks():
+    first = [(START_MS + 10, 25.7, -80.1)]
+    second = [(START_MS + 20, 25.8, -80.2)]
+    # A chunk is self-contained: it decodes from the bucket origin on its own
+    assert decode_points(encode_points(first, START_MS), START_MS) + \
+        decode_points(encode_points(second, START_MS), START_MS) == first + second
+
+
+def test_thin_keeps_gaps_and_last_point():
+    points = [(at_ms, 25.7, -80.1) for at_ms in (0, 1000, 5000, 29_000, 30_000, 31_000, 45_000)]
+    assert [point[0] for point in thin(points, 30_000)] == [0, 30_000, 45_000]
+    assert thin([], 30_000) == []
+
+
+def test_flush_splits_points_at_bucket_boundaries():
+    async def scenario():
+        db = AsyncMongoMockClient()["history"]
+        history = LocationHistory(db, bucket_seconds=3600)
+        boundary = START.timestamp() + 3600
+        for at in (boundary - 2, boundary - 1, boundary, boundary + 1):
+            history.record("driver", 25.7, -80.1, at)
+        written = await history.flush()
+        buckets = await db.location_history.find({}, {"_id": 0}).sort("bucket_start", 1).to_list(None)
+        track = await history.track("driver", START, START + timedelta(hours=2))
+        return written, buckets, track
+
+    written, buckets, track = asyncio.run(scenario())
+    assert written == 4
+    assert [bucket["count"] for bucket in buckets] == [2, 2]
+    assert [epoch_ms(bucket["bucket_start"]) for bucket in buckets] == [START_MS, START_MS + 3_600_000]
+    assert [point[0] for point in track] == [START_MS + 3_600_000 + offset for offset in (-2000, -1000, 0, 1000)]
+
+
+def test_compaction_merges_thins_and_expires():
+    async def scenario():
+        db = AsyncMongoMockClient()["history"]
+        history = LocationHistory(db, bucket_seconds=3600, retention_days=90, thin_after_days=7, thin_seconds=30)
+        now = START + timedelta(days=10)
+
+        def pings(base, seconds):
+            for offset in seconds:
+                history.record("driver", 25.7 + offset / 1e5, -80.1, base.timestamp() + offset)
+
+        pings(START, range(0, 120, 5))  # 10 days old: thinned to one point per 30 s
+        await history.flush()
+        pings(START, range(120, 180, 5))  # A second chunk in the same bucket
+        await history.flush()
+        recent = now - timedelta(hours=3)
+        pings(recent, range(0, 60, 5))  # Closed but recent: merged, not thinned
+        await history.flush()
+        await db.location_history.insert_one({
+            "driver_user_id": "driver", "bucket_start": START - timedelta(days=100),
+            "bucket_end": START - timedelta(days=100) + timedelta(hours=1), "chunks": [], "count": 0,
+        })
+
+        result = await history.compact(now)
+        again = await history.compact(now)
+        buckets = await db.location_history.find({}, {"_id": 0}).sort("bucket_start", 1).to_list(None)
+        old_track = await history.track("driver", START, START + timedelta(hours=1))
+        recent_track = await history.track("driver", recent, recent + timedelta(hours=1))
+        return result, again, buckets, old_track, recent_track
+
+    result, again, buckets, old_track, recent_track = asyncio.run(scenario())
+    assert result == {"compacted": 2, "deleted": 1}
+    assert again == {"compacted": 0, "deleted": 0}
+    assert [len(bucket["chunks"]) for bucket in buckets] == [1, 1]
+    assert [bucket["resolution_seconds"] for bucket in buckets] == [30, 0]
+    assert [point[0] - START_MS for point in old_track] == [0, 30_000, 60_000, 90_000, 120_000, 150_000, 175_000]
+    assert len(recent_track) == 12
+    assert from_epoch_ms(old_track[0][0]) == START
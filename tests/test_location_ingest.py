@@ -0,0 +1,62 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import PyMongoError
+
+from location_ingest import LocationIngestor
+
+
+def profile(lat, lng):
+    return {"user_id": "driver", "current_location_lat": lat, "current_location_lng": lng}
+
+
+def test_overlay_stops_once_the_ping_is_flushed():
+    async def scenario():
+        db = AsyncMongoMockClient()["ingest"]
+        await db.driver_profiles.insert_one(profile(25.0, -80.0))
+        ingestor = LocationIngestor(db)
+        ingestor.submit("driver", 25.5, -80.5)
+        before = ingestor.overlay(profile(25.0, -80.0))
+        written = await ingestor.flush()
+        # Another worker's newer ping reached Mongo after our flush
+        await db.driver_profiles.update_one({"user_id": "driver"}, {"$set": {"current_location_lat": 26.0}})
+        stored = await db.driver_profiles.find_one({"user_id": "driver"}, {"_id": 0})
+        return before, written, ingestor.latest("driver"), ingestor.overlay(stored)
+
+    before, written, latest, after = asyncio.run(scenario())
+    assert (before["current_location_lat"], before["current_location_lng"]) == (25.5, -80.5)
+    assert written == 1
+    assert latest is None
+    assert after["current_location_lat"] == 26.0
+
+
+class FailingProfiles:
+    def __init__(self, ingestor_ref):
+        self.ingestor_ref = ingestor_ref
+        self.seen_while_writing = None
+
+    async def bulk_write(self, operations, ordered=True):
+        self.seen_while_writing = self.ingestor_ref[0].latest("driver")
+        raise PyMongoError("down")
+
+
+class FailingDb:
+    def __init__(self, ingestor_ref):
+        self.driver_profiles = FailingProfiles(ingestor_ref)
+
+
+def test_overlay_covers_the_batch_in_flight_and_failed_flushes():
+    async def scenario():
+        ingestor_ref = []
+        db = FailingDb(ingestor_ref)
+        ingestor = LocationIngestor(db)
+        ingestor_ref.append(ingestor)
+        ingestor.submit("driver", 25.5, -80.5)
+        written = await ingestor.flush()
+        return written, db.driver_profiles.seen_while_writing, ingestor.latest("driver"), ingestor.stats()
+
+    written, seen_while_writing, latest, stats = asyncio.run(scenario())
+    assert written == 0
+    assert seen_while_writing == (25.5, -80.5)
+    assert latest == (25.5, -80.5)  # Requeued, so still not in Mongo
+    assert stats["flush_failures"] == 1 and stats["pending"] == 1
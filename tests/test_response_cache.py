@@ -0,0 +1,42 @@
+from response_cache import ResponseCache, etag_matches, make_etag
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_versioned_etags_ignore_the_body():
+    assert make_etag(("doc", 1), version="v1", body=b"a") == make_etag(("doc", 1), version="v1", body=b"b")
+    assert make_etag(("doc", 1), body=b"a") != make_etag(("doc", 1), body=b"b")
+
+
+def test_if_none_match():
+    etag = make_etag("key", body=b"body")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+
+def test_entries_expire_invalidate_and_evict():
+    clock = Clock()
+    cache = ResponseCache(max_entries=2, ttl_seconds=10, clock=clock)
+    entry = cache.put("a", b"1")
+    assert cache.get("a") == entry
+
+    clock.now = 10
+    assert cache.get("a") is None
+
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    cache.invalidate("a")
+    cache.put("c", b"3")
+    cache.put("d", b"4")
+    assert cache.get("b") is None
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from routing import RoadGraph, RoutingEngine
+
+
+def grid_graph(size=10, step_deg=0.01, seconds=60.0):
+    """size x size grid of two-way roads near Miami, step_deg apart"""
+    lats, lngs, edges = [], [], []
+    for row in range(size):
+        for col in range(size):
+            lats.append(25.7 + row * step_deg)
+            lngs.append(-80.3 + col * step_deg)
+    for row in range(size):
+        for col in range(size):
+            node = row * size + col
+            for neighbor in ((node + 1) if col + 1 < size else None, (node + size) if row + 1 < size else None):
+                if neighbor is not None:
+                    edges.append((node, neighbor, 1000.0, seconds))
+                    edges.append((neighbor, node, 1000.0, seconds))
+    return RoadGraph(lats, lngs, edges)
+
+
+def test_straight_line_routes_bill_no_hours():
+    engine = RoutingEngine()
+    route = engine.cached(25.70, -80.30, 25.78, -80.22)
+    assert route.source == "haversine"
+    assert route.duration_hours > 0
+    assert route.billable_hours == 0
+
+    miles, hours, billable = engine.routes([25.70], [-80.30], [25.78], [-80.22])
+    assert miles[0] == route.distance_miles
+    assert billable[0] == 0
+
+
+def test_road_routes_bill_drive_time():
+    engine = RoutingEngine(grid_graph())
+    route = engine.route(25.70, -80.30, 25.78, -80.22)
+    assert route.source == "road"
+    assert route.billable_hours == route.duration_hours > 0
+    assert engine.cached(25.70, -80.30, 25.78, -80.22) == route
+
+
+def test_concurrent_routing_keeps_cache_consistent():
+    engine = RoutingEngine(grid_graph(), cache_size=16, cell_deg=0.001)
+    legs = [(25.70, -80.30, 25.70 + (i % 40) * 0.002, -80.21) for i in range(400)]
+    with ThreadPoolExecutor(8) as pool:
+        routes = list(pool.map(lambda leg: engine.route(*leg), legs))
+    assert all(route.source == "road" for route in routes)
+    assert engine.stats()["cached_routes"] <= 16
+    assert engine.hits + engine.misses == len(legs)
@@ -0,0 +1,166 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from mongomock_motor import AsyncMongoMockClient
+
+from transitions import (
+    OFFER_ACCEPT, OFFER_REJECT, REQUEST_ACCEPT_OFFER, REQUEST_EXPIRE_OFFER, REQUEST_REASSIGN, REQUEST_RELEASE,
+    REQUEST_REOPEN_OFFER, apply_transition
+)
+
+
+OFFER_AT = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def negotiating_request(**fields):
+    db = AsyncMongoMockClient()["transitions"]
+    await db.tow_requests.insert_one({
+        "id": "r1",
+        "status": "pending",
+        "negotiation_status": "negotiating",
+        "current_driver_id": "driver-a",
+        "latest_offer_at": OFFER_AT,
+        "offer_expires_at": OFFER_AT + timedelta(minutes=5),
+        **fields,
+    })
+    await db.price_offers.insert_one({"id": "o1", "tow_request_id": "r1", "status": "pending", "created_at": OFFER_AT})
+    return db
+
+
+def accept_offer(db, offer_at=OFFER_AT):
+    return apply_transition(
+        db,
+        REQUEST_ACCEPT_OFFER,
+        {"id": "r1", "current_driver_id": "driver-a", "latest_offer_at": {"$in": [offer_at, None]}},
+        assigned_driver_id="driver-a",
+    )
+
+
+def reassign(db, previous, driver):
+    return apply_transition(db, REQUEST_REASSIGN, {"id": "r1", "current_driver_id": previous}, current_driver_id=driver)
+
+
+def release(db, previous):
+    return apply_transition(db, REQUEST_RELEASE, {"id": "r1", "current_driver_id": previous})
+
+
+def expire(db, now):
+    return apply_transition(db, REQUEST_EXPIRE_OFFER, {"id": "r1", "offer_expires_at": {"$lte": now}})
+
+
+def test_concurrent_accept_offer_has_one_winner():
+    async def scenario():
+        db = await negotiating_request()
+        results = await asyncio.gather(*(accept_offer(db) for _ in range(5)))
+        request = await db.tow_requests.find_one({"id": "r1"})
+        return results, request
+
+    results, request = run(scenario())
+    assert sum(result is not None for result in results) == 1
+    assert request["status"] == "accepted"
+    assert request["negotiation_status"] == "price_agreed"
+    assert request["assigned_driver_id"] == "driver-a"
+
+
+def test_accept_offer_loses_to_newer_offer():
+    async def scenario():
+        db = await negotiating_request()
+        newer = OFFER_AT + timedelta(seconds=1)
+        await db.tow_requests.update_one({"id": "r1"}, {"$max": {"latest_offer_at": newer}})
+        stale = await accept_offer(db)
+        current = await accept_offer(db, newer)
+        return stale, current
+
+    stale, current = run(scenario())
+    assert stale is None
+    assert current is not None
+
+
+def test_accept_offer_without_pinned_offer_field():
+    async def scenario():
+        db = await negotiating_request(latest_offer_at=None)
+        return await accept_offer(db)
+
+    assert run(scenario()) is not None
+
+
+def test_reopen_undoes_accept_offer():
+    async def scenario():
+        db = await negotiating_request()
+        await accept_offer(db)
+        await apply_transition(db, OFFER_REJECT, {"id": "o1"})
+        offer = await apply_transition(db, OFFER_ACCEPT, {"id": "o1"})
+        reopened = await apply_transition(db, REQUEST_REOPEN_OFFER, {"id": "r1", "assigned_driver_id": "driver-a"})
+        return offer, reopened
+
+    offer, reopened = run(scenario())
+    assert offer is None
+    assert reopened["status"] == "pending"
+    assert reopened["negotiation_status"] == "negotiating"
+    assert reopened["assigned_driver_id"] is None
+
+
+def test_expiry_after_reject_moved_on_does_not_fire():
+    async def scenario():
+        db = await negotiating_request()
+        moved = await reassign(db, "driver-a", "driver-b")
+        await db.tow_requests.update_one({"id": "r1"}, {"$set": {"offer_expires_at": OFFER_AT + timedelta(minutes=10)}})
+        expired = await expire(db, OFFER_AT + timedelta(minutes=6))
+        return moved, expired
+
+    moved, expired = run(scenario())
+    assert moved["current_driver_id"] == "driver-b"
+    assert expired is None
+
+
+def test_reject_after_expiry_moved_on_loses():
+    async def scenario():
+        db = await negotiating_request()
+        expired = await expire(db, OFFER_AT + timedelta(minutes=6))
+        by_expiry, by_reject = await asyncio.gather(
+            reassign(db, "driver-a", "driver-b"),
+            reassign(db, "driver-a", "driver-c"),
+        )
+        request = await db.tow_requests.find_one({"id": "r1"})
+        return expired, by_expiry, by_reject, request
+
+    expired, by_expiry, by_reject, request = run(scenario())
+    assert expired["negotiation_status"] == "expired"
+    assert by_expiry is not None
+    assert by_reject is None
+    assert request["current_driver_id"] == "driver-b"
+    assert request["negotiation_status"] == "awaiting_driver"
+
+
+def test_release_does_not_undo_reassignment():
+    async def scenario():
+        db = await negotiating_request()
+        await reassign(db, "driver-a", "driver-b")
+        released = await release(db, "driver-a")
+        request = await db.tow_requests.find_one({"id": "r1"})
+        return released, request
+
+    released, request = run(scenario())
+    assert released is None
+    assert request["current_driver_id"] == "driver-b"
+    assert request["negotiation_status"] == "awaiting_driver"
+
+
+def test_release_then_stale_reassign_loses():
+    async def scenario():
+        db = await negotiating_request()
+        released, second_release = await asyncio.gather(release(db, "driver-a"), release(db, "driver-a"))
+        reassigned = await reassign(db, "driver-a", "driver-b")
+        request = await db.tow_requests.find_one({"id": "r1"})
+        return released, second_release, reassigned, request
+
+    released, second_release, reassigned, request = run(scenario())
+    assert released is not None
+    assert second_release is None
+    assert reassigned is None
+    assert request["current_driver_id"] is None
+    assert request["negotiation_status"] == "no_drivers_available"